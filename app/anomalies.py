@@ -0,0 +1,159 @@
+import os
+import math
+import bisect
+from app.finance_data import monthly_amount
+from app.search_index import SessionIndexes, item_amount, tokenize
+
+_indexes = None
+
+EXPENSE_SECTIONS = ("monthly_expenses", "annual_expenses", "installments")
+
+# Amounts within this fraction of each other (plus half a cent) count as
+# the same bill. Blocks are this wide on a log scale, so two such amounts
+# always fall in the same block or in neighbouring ones.
+DUPLICATE_TOLERANCE = 0.01
+_BLOCK_WIDTH = math.log1p(DUPLICATE_TOLERANCE)
+
+# An expense is an outlier when its monthly amount is more than
+# OUTLIER_SIGMAS standard deviations above the mean of the other expenses
+# of its category, given at least OUTLIER_MIN_COUNT of them.
+OUTLIER_SIGMAS = 3.0
+OUTLIER_MIN_COUNT = 5
+
+
+def name_key(name: str) -> str:
+    """A name without case, accents, punctuation or extra spaces."""
+    return " ".join(tokenize(name))
+
+
+def _block(amount: float) -> int | None:
+    return math.floor(math.log(amount) / _BLOCK_WIDTH) if amount > 0 else None
+
+
+def same_amount(a: float, b: float) -> bool:
+    return abs(a - b) <= DUPLICATE_TOLERANCE * max(abs(a), abs(b)) + 0.005
+
+
+def is_outlier(amount: float, stats: dict | None) -> bool:
+    """Whether amount stands out among the rest of its category.
+
+    stats are the category's running count, sum and sum of squares, which
+    include amount itself: it is left out, so one spike cannot inflate the
+    deviation it is measured against.
+    """
+    if not stats or stats["count"] - 1 < OUTLIER_MIN_COUNT:
+        return False
+    others = stats["count"] - 1
+    mean = (stats["sum"] - amount) / others
+    variance = max(0.0, (stats["sum_sq"] - amount * amount) / others - mean * mean)
+    return amount > mean + OUTLIER_SIGMAS * math.sqrt(variance) and variance > 0
+
+
+class ExpenseIndex:
+    """Blocking index over one session's expenses, for duplicates and outliers.
+
+    Expenses are hashed into blocks by name, category and amount, so the
+    candidate duplicates of an expense are the few in its block and the two
+    neighbouring ones, not every other expense. Each expense keeps the set
+    of its duplicates, updated on add and remove. Per category, monthly
+    amounts are kept sorted, so outliers are read off the top.
+    """
+
+    def __init__(self, stamp: str = ""):
+        self.stamp = stamp
+        # id -> (section, item, block key, monthly amount)
+        self.entries: dict[str, tuple[str, dict, tuple, float]] = {}
+        self.blocks: dict[tuple, set[str]] = {}
+        self.duplicates: dict[str, set[str]] = {}
+        self.amounts: dict[str, list[tuple[float, str]]] = {}
+
+    @classmethod
+    def build(cls, data: dict, stamp: str = "") -> "ExpenseIndex":
+        index = cls(stamp)
+        for section in EXPENSE_SECTIONS:
+            for item in data.get(section, []):
+                index._enter(section, item)
+        for amounts in index.amounts.values():
+            amounts.sort()
+        return index
+
+    def _enter(self, section: str, item: dict) -> tuple[tuple, float]:
+        item = dict(item)
+        category = item.get("category", "Outros")
+        amount = item_amount(section, item)
+        key = (name_key(item.get("name", "")), category, _block(amount))
+        monthly = monthly_amount(section, item)
+        self.entries[item["id"]] = (section, item, key, monthly)
+        found = self.duplicates.setdefault(item["id"], set())
+        for other in self._candidates(key):
+            if same_amount(amount, item_amount(*self.entries[other][:2])):
+                found.add(other)
+                self.duplicates[other].add(item["id"])
+        self.blocks.setdefault(key, set()).add(item["id"])
+        self.amounts.setdefault(category, []).append((monthly, item["id"]))
+        return key, monthly
+
+    def _candidates(self, key: tuple):
+        name, category, block = key
+        if block is None:
+            yield from self.blocks.get(key, ())
+            return
+        for neighbour in (block - 1, block, block + 1):
+            yield from self.blocks.get((name, category, neighbour), ())
+
+    def add(self, section: str, item: dict) -> set[str]:
+        """Index an expense; returns the ids of its likely duplicates."""
+        if section not in EXPENSE_SECTIONS:
+            return set()
+        if item["id"] in self.entries:
+            self.remove(item["id"])
+        _, monthly = self._enter(section, item)
+        amounts = self.amounts[item.get("category", "Outros")]
+        # _enter appended it; move it to its place.
+        amounts.pop()
+        bisect.insort(amounts, (monthly, item["id"]))
+        return self.duplicates[item["id"]]
+
+    def remove(self, item_id: str):
+        entry = self.entries.pop(item_id, None)
+        if entry is None:
+            return
+        _, item, key, monthly = entry
+        self.blocks[key].discard(item_id)
+        if not self.blocks[key]:
+            del self.blocks[key]
+        for other in self.duplicates.pop(item_id):
+            self.duplicates[other].discard(item_id)
+        amounts = self.amounts[key[1]]
+        del amounts[bisect.bisect_left(amounts, (monthly, item_id))]
+
+    def duplicate_items(self, limit: int = 50) -> list[tuple[str, dict, int]]:
+        """(section, item, how many duplicates) of expenses that have some."""
+        found = []
+        for item_id, others in self.duplicates.items():
+            if others:
+                found.append((*self.entries[item_id][:2], len(others)))
+                if len(found) == limit:
+                    break
+        return found
+
+    def outliers(self, stats: dict, limit: int = 50) -> list[tuple[str, dict]]:
+        """Outlying expenses, largest first within each category.
+
+        Only the top of each category's amounts is read: below the first
+        expense that does not stand out, none will.
+        """
+        found = []
+        for category, amounts in self.amounts.items():
+            for monthly, item_id in reversed(amounts):
+                if len(found) == limit or not is_outlier(monthly, stats.get(category)):
+                    break
+                found.append(self.entries[item_id][:2])
+        return found
+
+
+def get_expense_indexes() -> SessionIndexes:
+    global _indexes
+    if _indexes is None:
+        _indexes = SessionIndexes(int(os.getenv("EXPENSE_INDEX_SESSIONS", "1000")))
+    return _indexes
@@ -4,6 +4,14 @@ from app.states.auth_state import AuthState
 from app.states.finance_state import FinanceState
 from app.components.auth import login_page, user_header
 from app.components.dashboard import dashboard_grid
+from app.components.search import search_panel
+from app.components.alerts import alerts_panel
+from app.components.categories import categories_panel
+from app.rollover import rollover_enabled
+from app.scheduler import rollover_loop
+from app.delta_batching import install_delta_batching
+from app.session_eviction import install_session_eviction
+from app.mongo_profiler import install_mongo_metrics
 from app.components.forms import (
     income_form,
     monthly_expense_form,
@@ -16,6 +24,7 @@ from app.components.lists import (
     monthly_expense_list,
     annual_expense_list,
     installment_list,
+    lazy_section,
 )
 
 
@@ -55,16 +64,29 @@ def dashboard_content() -> rx.Component:
                     class_name="mb-8",
                 ),
                 dashboard_grid(),
+                alerts_panel(),
+                search_panel(),
+                categories_panel(),
                 rx.el.div(
-                    section_container(income_form(), income_list(), "bg-green-50/30"),
                     section_container(
-                        monthly_expense_form(), monthly_expense_list(), "bg-red-50/30"
+                        income_form(),
+                        lazy_section("monthly_income", income_list()),
+                        "bg-green-50/30",
                     ),
                     section_container(
-                        annual_expense_form(), annual_expense_list(), "bg-orange-50/30"
+                        monthly_expense_form(),
+                        lazy_section("monthly_expenses", monthly_expense_list()),
+                        "bg-red-50/30",
                     ),
                     section_container(
-                        installment_form(), installment_list(), "bg-blue-50/30"
+                        annual_expense_form(),
+                        lazy_section("annual_expenses", annual_expense_list()),
+                        "bg-orange-50/30",
+                    ),
+                    section_container(
+                        installment_form(),
+                        lazy_section("installments", installment_list()),
+                        "bg-blue-50/30",
                     ),
                     class_name="grid grid-cols-1 gap-8",
                 ),
@@ -96,4 +118,9 @@ app = rx.App(
         ),
     ],
 )
-app.add_page(index, route="/", on_load=FinanceState.load_data)
\ No newline at end of file
+app.add_page(index, route="/", on_load=FinanceState.load_data)
+install_delta_batching(app)
+install_session_eviction(app)
+install_mongo_metrics(app)
+if rollover_enabled():
+    app.register_lifespan_task(rollover_loop)
\ No newline at end of file
@@ -0,0 +1,147 @@
+CATEGORY_DEFINITIONS = {
+    "Moradia": {
+        "icon": "home",
+        "hex": "#3b82f6",
+        "color_cls": "bg-blue-100 text-blue-700 border-blue-200",
+    },
+    "Transporte": {
+        "icon": "car",
+        "hex": "#6366f1",
+        "color_cls": "bg-indigo-100 text-indigo-700 border-indigo-200",
+    },
+    "Alimentação": {
+        "icon": "utensils",
+        "hex": "#22c55e",
+        "color_cls": "bg-green-100 text-green-700 border-green-200",
+    },
+    "Saúde": {
+        "icon": "heart-pulse",
+        "hex": "#ef4444",
+        "color_cls": "bg-red-100 text-red-700 border-red-200",
+    },
+    "Educação": {
+        "icon": "graduation-cap",
+        "hex": "#eab308",
+        "color_cls": "bg-yellow-100 text-yellow-700 border-yellow-200",
+    },
+    "Lazer": {
+        "icon": "gamepad-2",
+        "hex": "#a855f7",
+        "color_cls": "bg-purple-100 text-purple-700 border-purple-200",
+    },
+    "Comunicação": {
+        "icon": "radio",
+        "hex": "#00ff04",
+        "color_cls": "bg-lime-100 text-lime-700 border-lime-200",
+    },
+    "Despesas pessoais": {
+        "icon": "user",
+        "hex": "#ec4899",
+        "color_cls": "bg-pink-100 text-pink-700 border-pink-200",
+    },
+    "Outros": {
+        "icon": "circle-help",
+        "hex": "#6b7280",
+        "color_cls": "bg-gray-100 text-gray-700 border-gray-200",
+    },
+}
+CATEGORIES = list(CATEGORY_DEFINITIONS.keys())
+
+# Stored items refer to their category by its position (see app/compact.py),
+# so new categories go at the end of CATEGORY_DEFINITIONS and none is removed.
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+CATEGORY_NAMES = dict(enumerate(CATEGORIES))
+
+# Users add subcategories below these (see FinanceStore.add_category); an
+# item's category is then a path, e.g. "Alimentação / Mercado". Items of
+# the built-in categories are paths of one part, so flat data is a tree.
+CATEGORY_SEPARATOR = " / "
+MAX_CATEGORY_DEPTH = 3
+MAX_USER_CATEGORIES = 100
+
+
+def category_parts(category: str) -> list[str]:
+    return category.split(CATEGORY_SEPARATOR)
+
+
+def parent_category(category: str) -> str:
+    """The category above category, or "" for a built-in one."""
+    return category.rpartition(CATEGORY_SEPARATOR)[0]
+
+
+def category_node(category: str) -> str:
+    """Where category's amounts are counted: itself, or "Outros" if its root is unknown."""
+    if category_parts(category)[0] in CATEGORY_DEFINITIONS:
+        return category
+    return "Outros"
+
+
+def root_category(category: str) -> str:
+    return category_parts(category_node(category))[0]
+
+
+def category_label(category: str) -> str:
+    """The last part of the path, as listed under its parent."""
+    return category_parts(category)[-1]
+
+
+def with_parents(category: str) -> list[str]:
+    """category and every category above it, nearest first."""
+    nodes = [category]
+    while CATEGORY_SEPARATOR in nodes[-1]:
+        nodes.append(parent_category(nodes[-1]))
+    return nodes
+
+
+def add_to_tree(tree: dict, category: str, value: float):
+    """Add value to category's node and every node above it: O(depth)."""
+    for node in with_parents(category_node(category)):
+        tree[node] = tree.get(node, 0.0) + value
+
+
+def category_tree(by_category: dict) -> dict:
+    """Totals of every node, from the totals of the categories items are in."""
+    tree = {}
+    for category, value in by_category.items():
+        add_to_tree(tree, category, value)
+    return tree
+
+
+def category_children(tree: dict, node: str) -> list[str]:
+    """The nodes right below node ("" for the built-in categories) in tree."""
+    return [child for child in tree if parent_category(child) == node and child != node]
+
+
+def all_categories(user_categories: list[str]) -> list[str]:
+    """The built-in categories, each followed by the user's categories below it."""
+    below: dict[str, list[str]] = {}
+    for category in sorted(user_categories):
+        below.setdefault(parent_category(category), []).append(category)
+    options = []
+
+    def visit(category: str):
+        options.append(category)
+        for child in below.get(category, []):
+            visit(child)
+
+    for category in CATEGORIES:
+        visit(category)
+    return options
+
+
+def known_category(category: str, options) -> str:
+    """category, or its nearest ancestor among options, or "Outros"."""
+    while category and category not in options:
+        category = parent_category(category)
+    return category or "Outros"
+
+
+def category_shades(category: str, count: int) -> list[str]:
+    """count colours for the slices below category: its root's, lightened."""
+    hex_color = CATEGORY_DEFINITIONS[root_category(category)]["hex"]
+    rgb = [int(hex_color[i : i + 2], 16) for i in (1, 3, 5)]
+    shades = []
+    for n in range(count):
+        mix = 0.6 * n / count
+        shades.append("#" + "".join(f"{round(c + (255 - c) * mix):02x}" for c in rgb))
+    return shades
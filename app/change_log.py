@@ -0,0 +1,62 @@
+import os
+import logging
+from app.finance_data import stored_op, decrypt_op
+
+# Compaction runs on every COMPACT_EVERY-th save of a user.
+COMPACT_EVERY = 100
+
+
+def change_log_keep() -> int:
+    """How many of a user's latest saves stay in the log after compaction.
+
+    A session further behind than this reloads everything instead.
+    """
+    return int(os.getenv("CHANGE_LOG_KEEP", "500"))
+
+
+def covers(seqs: list[int], since: int, version: int) -> bool:
+    """Whether seqs are exactly the saves after since, up to version.
+
+    Writers that do not log (conversions, re-encryption) bump the version
+    too, and leave a gap that makes the reader fall back to a full load.
+    """
+    return seqs == list(range(since + 1, version + 1))
+
+
+def record_changes(collection, email: str, seq: int, ops: list[dict], cipher):
+    """Append the ops of the save that produced version seq.
+
+    Items are encrypted like in the stores. A failure only leaves a gap in
+    the log, so it is logged rather than failing the save.
+    """
+    try:
+        collection.insert_one(
+            {
+                "user_email": email,
+                "seq": seq,
+                "ops": [stored_op(op, cipher) for op in ops],
+            }
+        )
+        if seq % COMPACT_EVERY == 0:
+            compact_changes(collection, email, seq - change_log_keep())
+    except Exception as e:
+        logging.exception(f"Error recording changes for {email}: {e}")
+
+
+def compact_changes(collection, email: str, up_to: int):
+    """Drop a user's records up to seq up_to."""
+    collection.delete_many({"user_email": email, "seq": {"$lte": up_to}})
+
+
+def read_changes(collection, email: str, since: int, version: int, cipher):
+    """The ops saved after since up to version, or None if the log lacks some."""
+    if since > version:
+        return None
+    records = list(
+        collection.find(
+            {"user_email": email, "seq": {"$gt": since, "$lte": version}}
+        ).sort("seq", 1)
+    )
+    if not covers([record["seq"] for record in records], since, version):
+        return None
+    return [decrypt_op(op, cipher) for record in records for op in record["ops"]]
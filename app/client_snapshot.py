@@ -0,0 +1,67 @@
+import os
+import json
+import zlib
+import logging
+from app.finance_data import SECTIONS
+from app.key_cache import get_data_cipher
+
+
+def client_snapshots_enabled() -> bool:
+    """Keep an encrypted copy of the user's data in the browser's storage.
+
+    A return visit renders from that copy at once, and a background sync
+    then checks it against the database.
+    """
+    return os.getenv("CLIENT_SNAPSHOT") == "1"
+
+
+def _max_bytes() -> int:
+    # Browsers allow about 5 MB of localStorage per origin.
+    return int(os.getenv("CLIENT_SNAPSHOT_MAX_BYTES", "1000000"))
+
+
+def _max_age() -> int:
+    return int(os.getenv("CLIENT_SNAPSHOT_MAX_AGE", str(30 * 24 * 3600)))
+
+
+def encode_snapshot(email: str, data: dict) -> str:
+    """The data as an opaque string for the browser, or "" if it cannot be kept.
+
+    The items are compressed and encrypted with the user's data key, whose
+    wrapped form travels along: the browser holds nothing it can read, and
+    only a server with the master key can open it.
+    """
+    cipher = get_data_cipher(data.get("data_key"))
+    if cipher is None:
+        return ""
+    payload = {"email": email, "version": data.get("version", 0)}
+    payload.update({section: data[section] for section in SECTIONS})
+    compressed = zlib.compress(json.dumps(payload, separators=(",", ":")).encode())
+    snapshot = json.dumps(
+        {"key": data["data_key"], "data": cipher.encrypt(compressed).decode()}
+    )
+    return snapshot if len(snapshot) <= _max_bytes() else ""
+
+
+def decode_snapshot(email: str, snapshot: str) -> dict | None:
+    """Data from encode_snapshot, or None if it is not email's or is unreadable.
+
+    A snapshot older than CLIENT_SNAPSHOT_MAX_AGE seconds is not used.
+    """
+    if not snapshot:
+        return None
+    try:
+        envelope = json.loads(snapshot)
+        cipher = get_data_cipher(envelope["key"])
+        payload = json.loads(
+            zlib.decompress(cipher.decrypt(envelope["data"].encode(), ttl=_max_age()))
+        )
+    except Exception as e:
+        logging.info(f"Ignoring unreadable client snapshot: {e}")
+        return None
+    if payload.get("email") != email:
+        return None
+    data = {section: payload.get(section, []) for section in SECTIONS}
+    data["version"] = payload.get("version", 0)
+    data["data_key"] = envelope["key"]
+    return data
@@ -0,0 +1,141 @@
+import os
+import struct
+import logging
+import bson
+from bson.binary import Binary
+from app.categories import CATEGORY_CODES, CATEGORY_NAMES
+from app.recurrence import (
+    FREQUENCY_CODES,
+    FREQUENCY_NAMES,
+    SECTION_FREQUENCIES,
+    with_recurrence,
+)
+from app.encryption import encrypt_raw, decrypt_raw
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Stored field codes. All of an item's amounts are packed into one field;
+# legacy items spell every field out, and never use a one-letter key.
+FIELD_CODES = {
+    "name": "n",
+    "amount": "a",
+    "total_amount": "a",
+    "installment_value": "a",
+    "installments_count": "k",
+    "category": "c",
+    "frequency": "f",
+    "interval_months": "i",
+}
+_CODES = frozenset(FIELD_CODES.values())
+
+# Amounts are packed as doubles before they are encrypted: (amount,), or
+# (total_amount, installment_value) for installments.
+_AMOUNT = struct.Struct("<d")
+_INSTALLMENT_AMOUNTS = struct.Struct("<dd")
+
+
+class CompressionError(Exception):
+    """Raised when compressed sections cannot be written or read."""
+
+
+def compact_encoding() -> bool:
+    """Store items with field codes and binary ciphertext (STORAGE_ENCODING=compact).
+
+    Items stored either way are read back the same, so this can be turned
+    on (or off) at any time: items are rewritten compactly as they are saved.
+    """
+    return os.getenv("STORAGE_ENCODING") == "compact"
+
+
+def section_compression() -> bool:
+    """Store each section of a user_finances document as one zstd blob.
+
+    Set STORAGE_COMPRESSION=zstd; needs the zstandard package. Amounts are
+    ciphertext and do not compress, but names, ids and keys do.
+    """
+    if os.getenv("STORAGE_COMPRESSION") != "zstd":
+        return False
+    if zstandard is None:
+        raise CompressionError("STORAGE_COMPRESSION=zstd needs the zstandard package.")
+    return True
+
+
+def is_compact(stored: dict) -> bool:
+    return not _CODES.isdisjoint(stored)
+
+
+def stored_fields(fields) -> tuple[str, ...]:
+    """The stored keys holding fields, in either encoding, for projections."""
+    codes = [FIELD_CODES[field] for field in fields if field in FIELD_CODES]
+    return tuple(dict.fromkeys([*fields, *codes]))
+
+
+def encode_item(section: str, item: dict, cipher) -> dict:
+    """An item as stored compactly; cipher is the user's data key."""
+    stored = {"id": item["id"], "n": item["name"]}
+    if section == "installments":
+        stored["k"] = item["installments_count"]
+        plaintext = _INSTALLMENT_AMOUNTS.pack(
+            item["total_amount"], item["installment_value"]
+        )
+    else:
+        plaintext = _AMOUNT.pack(item["amount"])
+    stored["a"] = Binary(encrypt_raw(plaintext, cipher))
+    if section != "monthly_income":
+        category = item.get("category", "Outros")
+        stored["c"] = CATEGORY_CODES.get(category, category)
+    frequency = item.get("frequency")
+    # Most items recur as their section does, and are read back that way.
+    if frequency and frequency != SECTION_FREQUENCIES.get(section):
+        stored["f"] = FREQUENCY_CODES[frequency]
+    if "interval_months" in item:
+        stored["i"] = item["interval_months"]
+    return stored
+
+
+def _amounts(stored: dict, layout: struct.Struct, cipher) -> tuple[float, ...]:
+    token = stored.get("a")
+    if token is not None:
+        try:
+            return layout.unpack(decrypt_raw(token, cipher))
+        except Exception as e:
+            # Like decrypt_value: an unreadable amount is shown as zero.
+            logging.exception(f"Error decrypting item '{stored['id']}': {e}")
+    return (0.0,) * (layout.size // _AMOUNT.size)
+
+
+def decode_item(section: str, stored: dict, cipher) -> dict:
+    """The inverse of encode_item, shaped like the legacy DECRYPTORS' items."""
+    item = {"id": stored["id"], "name": stored.get("n", "")}
+    if section == "installments":
+        total, value = _amounts(stored, _INSTALLMENT_AMOUNTS, cipher)
+        item["total_amount"] = total
+        item["installments_count"] = int(stored.get("k", 1))
+        item["installment_value"] = value
+    else:
+        item["amount"] = _amounts(stored, _AMOUNT, cipher)[0]
+    if section != "monthly_income":
+        category = stored.get("c", "Outros")
+        item["category"] = CATEGORY_NAMES.get(category, category)
+    if section in SECTION_FREQUENCIES:
+        item["frequency"] = FREQUENCY_NAMES.get(stored.get("f"), "")
+        item["interval_months"] = stored.get("i")
+        with_recurrence(section, item)
+    return item
+
+
+def compressed_field(section: str) -> str:
+    return f"{section}_z"
+
+
+def compress_section(items: list[dict]) -> Binary:
+    return Binary(zstandard.ZstdCompressor().compress(bson.encode({"items": items})))
+
+
+def decompress_section(blob: bytes) -> list[dict]:
+    if zstandard is None:
+        raise CompressionError("Reading compressed sections needs zstandard.")
+    return bson.decode(zstandard.ZstdDecompressor().decompress(blob))["items"]
@@ -0,0 +1,46 @@
+import reflex as rx
+from app.states.finance_state import FinanceState, ExpenseAlert
+from app.components.lists import category_badge
+from app.components.search import SECTION_LABELS
+
+
+def expense_alert(item: ExpenseAlert) -> rx.Component:
+    return rx.el.div(
+        rx.el.div(
+            rx.icon("triangle-alert", class_name="w-4 h-4 text-amber-500 mr-2"),
+            rx.el.p(item["name"], class_name="font-medium text-gray-800 mr-2"),
+            rx.cond(item["category"] != "", category_badge(item["category"])),
+            class_name="flex items-center",
+        ),
+        rx.el.div(
+            rx.el.span(item["reason"], class_name="text-xs text-amber-700 mr-3"),
+            rx.el.span(
+                rx.match(item["section"], *SECTION_LABELS.items(), ""),
+                class_name="text-xs text-gray-500 mr-3",
+            ),
+            rx.el.span(
+                rx.cond(FinanceState.hide_values, "R$ ****", f"R$ {item['amount']}"),
+                class_name="text-sm font-semibold text-gray-700",
+            ),
+            class_name="flex items-center",
+        ),
+        class_name="flex items-center justify-between p-3 bg-amber-50 rounded-lg border border-amber-100",
+    )
+
+
+def alerts_panel() -> rx.Component:
+    """Likely duplicate expenses and outliers, shown only when there are some."""
+    return rx.cond(
+        FinanceState.expense_alerts.length() > 0,
+        rx.el.div(
+            rx.el.h3(
+                "Alertas",
+                class_name="text-lg font-semibold text-gray-800 mb-4",
+            ),
+            rx.el.div(
+                rx.foreach(FinanceState.expense_alerts, expense_alert),
+                class_name="space-y-2 max-h-96 overflow-y-auto",
+            ),
+            class_name="p-6 mb-8 bg-white rounded-2xl border border-gray-100 shadow-sm",
+        ),
+    )
@@ -50,6 +50,15 @@ def user_header() -> rx.Component:
                 class_name="flex items-center gap-3",
             ),
             rx.el.div(
+                rx.cond(
+                    FinanceState.saving_later,
+                    rx.el.span(
+                        rx.icon("loader-circle", class_name="w-4 h-4 animate-spin"),
+                        "Salvando...",
+                        class_name="flex items-center gap-1.5 text-xs font-medium text-amber-600 mr-3",
+                        title="Alterações aguardando para serem salvas",
+                    ),
+                ),
                 rx.el.button(
                     rx.cond(
                         FinanceState.hide_values,
@@ -0,0 +1,60 @@
+import reflex as rx
+from app.states.finance_state import FinanceState
+from app.components.forms import base_input_field, submit_button
+from app.components.lists import category_badge, delete_button
+
+
+def user_category(category: str) -> rx.Component:
+    return rx.el.div(
+        category_badge(category),
+        delete_button(FinanceState.remove_category(category)),
+        class_name="flex items-center justify-between p-2 bg-gray-50 rounded-lg",
+    )
+
+
+def categories_panel() -> rx.Component:
+    """Where users add their own categories below the built-in ones."""
+    return rx.el.div(
+        rx.el.h3(
+            "Subcategorias",
+            class_name="text-lg font-semibold text-gray-800 mb-4",
+        ),
+        rx.el.div(
+            rx.el.form(
+                rx.el.div(
+                    rx.el.label(
+                        "Dentro de",
+                        class_name="block text-sm font-medium text-gray-700 mb-1",
+                    ),
+                    rx.el.select(
+                        rx.foreach(
+                            FinanceState.parent_options,
+                            lambda cat: rx.el.option(cat, value=cat),
+                        ),
+                        name="parent",
+                        required=True,
+                        class_name="w-full px-3 py-2 bg-white border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-violet-500 focus:border-transparent transition-all text-sm",
+                    ),
+                    class_name="mb-3",
+                ),
+                base_input_field("Nome", "name", "category_name", "ex: Mercado"),
+                submit_button("Criar"),
+                on_submit=FinanceState.add_category,
+                reset_on_submit=True,
+                class_name="w-full md:w-1/3",
+            ),
+            rx.el.div(
+                rx.cond(
+                    FinanceState.user_categories.length() > 0,
+                    rx.foreach(FinanceState.user_categories, user_category),
+                    rx.el.p(
+                        "Nenhuma subcategoria criada.",
+                        class_name="text-sm text-gray-400 italic",
+                    ),
+                ),
+                class_name="w-full md:w-2/3 space-y-2 max-h-64 overflow-y-auto",
+            ),
+            class_name="flex flex-col md:flex-row gap-6",
+        ),
+        class_name="p-6 mb-8 bg-white rounded-2xl border border-gray-100 shadow-sm",
+    )
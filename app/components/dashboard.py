@@ -24,7 +24,11 @@ def pie_chart_legend_item(item: dict) -> rx.Component:
             class_name="w-3 h-3 rounded-full mr-2",
             style={"background_color": item["fill"]},
         ),
-        rx.el.span(item["name"], class_name="text-sm text-gray-600 font-medium flex-1"),
+        rx.el.span(
+            item["label"],
+            rx.cond(item["drillable"], rx.icon("chevron-right", class_name="w-3 h-3")),
+            class_name="flex items-center text-sm text-gray-600 font-medium flex-1",
+        ),
         rx.el.div(
             rx.cond(
                 FinanceState.hide_values,
@@ -38,7 +42,41 @@ def pie_chart_legend_item(item: dict) -> rx.Component:
             ),
             class_name="flex items-center",
         ),
-        class_name="flex items-center mb-2",
+        # Clicking a category with others below it shows those instead.
+        on_click=rx.cond(
+            item["drillable"], FinanceState.drill_category(item["name"]), rx.noop()
+        ),
+        class_name=rx.cond(
+            item["drillable"],
+            "flex items-center mb-2 cursor-pointer hover:bg-gray-50 rounded",
+            "flex items-center mb-2",
+        ),
+    )
+
+
+def pie_breadcrumb() -> rx.Component:
+    """The way back up from the category the pie shows."""
+    return rx.cond(
+        FinanceState.pie_category != "",
+        rx.el.div(
+            rx.el.button(
+                "Todas",
+                on_click=FinanceState.drill_category(""),
+                class_name="hover:text-violet-600",
+            ),
+            rx.foreach(
+                FinanceState.pie_breadcrumb,
+                lambda crumb: rx.fragment(
+                    rx.icon("chevron-right", class_name="w-3 h-3"),
+                    rx.el.button(
+                        crumb["label"],
+                        on_click=FinanceState.drill_category(crumb["name"]),
+                        class_name="hover:text-violet-600",
+                    ),
+                ),
+            ),
+            class_name="flex items-center gap-1 text-sm text-gray-500 -mt-4 mb-4",
+        ),
     )
 
 
@@ -48,6 +86,7 @@ def spending_distribution_chart() -> rx.Component:
             "Distribuição por Categoria",
             class_name="text-lg font-semibold text-gray-800 mb-6",
         ),
+        pie_breadcrumb(),
         rx.el.div(
             rx.el.div(
                 rx.cond(
@@ -57,7 +96,7 @@ def spending_distribution_chart() -> rx.Component:
                         rx.recharts.pie(
                             data=FinanceState.pie_chart_data,
                             data_key="value",
-                            name_key="name",
+                            name_key="label",
                             cx="50%",
                             cy="50%",
                             inner_radius=60,
@@ -94,7 +133,7 @@ def spending_distribution_chart() -> rx.Component:
                         rx.cond(
                             FinanceState.hide_values,
                             "R$ ****",
-                            f"R$ {FinanceState.total_monthly_spending:.2f}",
+                            f"R$ {FinanceState.pie_total:.2f}",
                         ),
                         class_name="text-lg font-bold text-gray-900",
                     ),
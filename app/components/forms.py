@@ -1,25 +1,61 @@
 import reflex as rx
-from app.states.finance_state import FinanceState, CATEGORIES
+from app.states.finance_state import FinanceState
+from app.recurrence import FREQUENCIES
+from app.validation import (
+    AMOUNT_PATTERN,
+    CATEGORY_NAME_PATTERN,
+    COUNT_PATTERN,
+    INTERVAL_PATTERN,
+    MAX_CATEGORY_NAME_LENGTH,
+    MAX_NAME_LENGTH,
+    MESSAGES,
+    NAME_PATTERN,
+)
+
+# The browser checks each field against the server's pattern before the
+# form submits, so invalid input never reaches an event handler.
+FIELD_PATTERNS = {
+    "name": NAME_PATTERN,
+    "amount": AMOUNT_PATTERN,
+    "count": COUNT_PATTERN,
+    "interval": INTERVAL_PATTERN,
+    "category_name": CATEGORY_NAME_PATTERN,
+}
+INPUT_MODES = {
+    "name": "text",
+    "amount": "decimal",
+    "count": "numeric",
+    "interval": "numeric",
+    "category_name": "text",
+}
+MAX_LENGTHS = {
+    "name": MAX_NAME_LENGTH,
+    "category_name": MAX_CATEGORY_NAME_LENGTH,
+}
 
 
 def base_input_field(
     label: str,
     name: str,
-    type_: str = "text",
+    kind: str = "name",
     placeholder: str = "",
     default_value: rx.Var | str = "",
     key: str = "",
+    required: bool = True,
 ) -> rx.Component:
     return rx.el.div(
         rx.el.label(label, class_name="block text-sm font-medium text-gray-700 mb-1"),
         rx.el.input(
-            type=type_,
+            type="text",
             name=name,
             placeholder=placeholder,
             default_value=default_value,
             key=key,
-            step=rx.cond(type_ == "number", "0.01", None),
-            required=True,
+            pattern=FIELD_PATTERNS[kind],
+            title=MESSAGES[kind],
+            input_mode=INPUT_MODES[kind],
+            max_length=MAX_LENGTHS.get(kind),
+            required=required,
             class_name="w-full px-3 py-2 bg-white border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-violet-500 focus:border-transparent transition-all text-sm",
         ),
         class_name="mb-3",
@@ -39,7 +75,7 @@ def category_select_field(default_value: rx.Var | str = "") -> rx.Component:
                 selected=rx.cond(default_value == "", True, False),
             ),
             rx.foreach(
-                CATEGORIES,
+                FinanceState.category_options,
                 lambda cat: rx.el.option(
                     cat, value=cat, selected=rx.cond(cat == default_value, True, False)
                 ),
@@ -52,6 +88,52 @@ def category_select_field(default_value: rx.Var | str = "") -> rx.Component:
     )
 
 
+def recurrence_fields(
+    default_frequency: rx.Var | str,
+    default_interval: rx.Var | str = "1",
+    key: str = "",
+) -> rx.Component:
+    """How often an expense recurs; the interval is only read for custom ones.
+
+    The interval is required, as the server requires it for custom
+    frequencies, and starts at a valid value (an item without one, one
+    month), so other frequencies submit without it being touched.
+    """
+    if isinstance(default_interval, rx.Var):
+        default_interval = rx.cond(default_interval, default_interval, "1")
+    return rx.el.div(
+        rx.el.div(
+            rx.el.label(
+                "Frequência", class_name="block text-sm font-medium text-gray-700 mb-1"
+            ),
+            rx.el.select(
+                *[
+                    rx.el.option(
+                        details["label"],
+                        value=frequency,
+                        selected=rx.cond(
+                            rx.Var.create(default_frequency) == frequency, True, False
+                        ),
+                    )
+                    for frequency, details in FREQUENCIES.items()
+                ],
+                name="frequency",
+                class_name="w-full px-3 py-2 bg-white border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-violet-500 focus:border-transparent transition-all text-sm",
+            ),
+            class_name="mb-3",
+        ),
+        base_input_field(
+            "A cada (meses)",
+            "interval_months",
+            "interval",
+            "Personalizada",
+            default_value=default_interval,
+            key=key,
+        ),
+        class_name="grid grid-cols-2 gap-3",
+    )
+
+
 def submit_button(text: str) -> rx.Component:
     return rx.el.button(
         rx.icon("plus", class_name="w-4 h-4 mr-2"),
@@ -78,14 +160,14 @@ def edit_modal() -> rx.Component:
                             base_input_field(
                                 "Fonte",
                                 "name",
-                                "text",
+                                "name",
                                 default_value=FinanceState.editing_item_data["name"],
                                 key=f"edit_name_{FinanceState.editing_item_index}",
                             ),
                             base_input_field(
                                 "Valor Mensal",
                                 "amount",
-                                "number",
+                                "amount",
                                 default_value=FinanceState.editing_item_data["amount"],
                                 key=f"edit_amount_{FinanceState.editing_item_index}",
                             ),
@@ -98,20 +180,25 @@ def edit_modal() -> rx.Component:
                             base_input_field(
                                 "Nome da Despesa",
                                 "name",
-                                "text",
+                                "name",
                                 default_value=FinanceState.editing_item_data["name"],
                                 key=f"edit_exp_name_{FinanceState.editing_item_index}",
                             ),
                             base_input_field(
                                 "Valor",
                                 "amount",
-                                "number",
+                                "amount",
                                 default_value=FinanceState.editing_item_data["amount"],
                                 key=f"edit_exp_amount_{FinanceState.editing_item_index}",
                             ),
                             category_select_field(
                                 default_value=FinanceState.editing_item_data["category"]
                             ),
+                            recurrence_fields(
+                                FinanceState.editing_item_data["frequency"],
+                                FinanceState.editing_item_data["interval_months"],
+                                key=f"edit_exp_interval_{FinanceState.editing_item_index}",
+                            ),
                         ),
                     ),
                     rx.cond(
@@ -120,14 +207,14 @@ def edit_modal() -> rx.Component:
                             base_input_field(
                                 "Item",
                                 "name",
-                                "text",
+                                "name",
                                 default_value=FinanceState.editing_item_data["name"],
                                 key=f"edit_inst_name_{FinanceState.editing_item_index}",
                             ),
                             base_input_field(
                                 "Valor Total",
                                 "total_amount",
-                                "number",
+                                "amount",
                                 default_value=FinanceState.editing_item_data[
                                     "total_amount"
                                 ],
@@ -136,7 +223,7 @@ def edit_modal() -> rx.Component:
                             base_input_field(
                                 "Número de Parcelas",
                                 "count",
-                                "number",
+                                "count",
                                 default_value=FinanceState.editing_item_data[
                                     "installments_count"
                                 ],
@@ -178,8 +265,8 @@ def income_form() -> rx.Component:
             class_name="text-lg font-semibold text-gray-800 mb-4 flex items-center gap-2",
         ),
         rx.el.form(
-            base_input_field("Fonte", "name", "text", "ex: Salário"),
-            base_input_field("Valor Mensal", "amount", "number", "0.00"),
+            base_input_field("Fonte", "name", "name", "ex: Salário"),
+            base_input_field("Valor Mensal", "amount", "amount", "0,00"),
             submit_button("Adicionar"),
             on_submit=FinanceState.add_income,
             reset_on_submit=True,
@@ -195,9 +282,10 @@ def monthly_expense_form() -> rx.Component:
             class_name="text-lg font-semibold text-gray-800 mb-4 flex items-center gap-2",
         ),
         rx.el.form(
-            base_input_field("Nome da Despesa", "name", "text", "ex: Aluguel"),
-            base_input_field("Valor", "amount", "number", "0.00"),
+            base_input_field("Nome da Despesa", "name", "name", "ex: Aluguel"),
+            base_input_field("Valor", "amount", "amount", "0,00"),
             category_select_field(),
+            recurrence_fields("monthly"),
             submit_button("Adicionar"),
             on_submit=FinanceState.add_monthly_expense,
             reset_on_submit=True,
@@ -213,9 +301,10 @@ def annual_expense_form() -> rx.Component:
             class_name="text-lg font-semibold text-gray-800 mb-4 flex items-center gap-2",
         ),
         rx.el.form(
-            base_input_field("Nome da Despesa", "name", "text", "ex: IPVA"),
-            base_input_field("Valor", "amount", "number", "0.00"),
+            base_input_field("Nome da Despesa", "name", "name", "ex: IPVA"),
+            base_input_field("Valor", "amount", "amount", "0,00"),
             category_select_field(),
+            recurrence_fields("annual"),
             submit_button("Adicionar"),
             on_submit=FinanceState.add_annual_expense,
             reset_on_submit=True,
@@ -231,9 +320,9 @@ def installment_form() -> rx.Component:
             class_name="text-lg font-semibold text-gray-800 mb-4 flex items-center gap-2",
         ),
         rx.el.form(
-            base_input_field("Item", "name", "text", "ex: Notebook"),
-            base_input_field("Valor Total", "total_amount", "number", "0.00"),
-            base_input_field("Número de Parcelas", "count", "number", "12"),
+            base_input_field("Item", "name", "name", "ex: Notebook"),
+            base_input_field("Valor Total", "total_amount", "amount", "0,00"),
+            base_input_field("Número de Parcelas", "count", "count", "12"),
             category_select_field(),
             submit_button("Adicionar"),
             on_submit=FinanceState.add_installment,
@@ -1,10 +1,15 @@
+import json
 import reflex as rx
+from reflex.vars import FunctionStringVar, VarData
+from app.categories import CATEGORY_SEPARATOR
+from app.recurrence import FREQUENCIES
 from app.states.finance_state import (
     FinanceState,
     IncomeItem,
     ExpenseItem,
     InstallmentItem,
     CATEGORY_DEFINITIONS,
+    lazy_sections_enabled,
 )
 
 
@@ -26,27 +31,130 @@ def edit_button(on_click: rx.event.EventType) -> rx.Component:
     )
 
 
+BADGE_CLS = "inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium"
+
+
+class CategoryStyles(rx.Fragment):
+    """Ships the class and icon of every category to the page once.
+
+    The table is module-level code in the compiled page, so each badge
+    costs one lookup in it instead of a case per category for its class
+    and another for its icon, compiled into the page at every badge and
+    run for every row.
+    """
+
+    def add_custom_code(self) -> list[str]:
+        styles = {
+            category: {
+                "className": f"{BADGE_CLS} {details['color_cls']}",
+                "icon": details["icon"],
+            }
+            for category, details in CATEGORY_DEFINITIONS.items()
+        }
+        separator = json.dumps(CATEGORY_SEPARATOR)
+        return [
+            f"const categoryStyles = new Map(Object.entries({json.dumps(styles)}));",
+            # A user's own category is styled like the built-in one it is below.
+            "const categoryStyle = (category) =>"
+            " categoryStyles.get(category)"
+            f" ?? categoryStyles.get(String(category).split({separator})[0])"
+            ' ?? categoryStyles.get("Outros");',
+        ]
+
+
+category_style = FunctionStringVar.create(
+    "categoryStyle", _var_data=VarData(components=(CategoryStyles.create(),))
+)
+
+
+class FrequencyLabels(rx.Fragment):
+    """Ships the label of every frequency to the page once, like CategoryStyles."""
+
+    def add_custom_code(self) -> list[str]:
+        labels = {
+            frequency: details["label"] for frequency, details in FREQUENCIES.items()
+        }
+        return [
+            f"const frequencyLabels = new Map(Object.entries({json.dumps(labels)}));",
+            "const frequencyLabel = (item) => item?.frequency === \"custom\""
+            " ? `A cada ${item.interval_months} ${item.interval_months === 1"
+            ' ? "mês" : "meses"}` : frequencyLabels.get(item?.frequency) ?? "";',
+        ]
+
+
+frequency_label = FunctionStringVar.create(
+    "frequencyLabel", _var_data=VarData(components=(FrequencyLabels.create(),))
+)
+
+
 def category_badge(category: str) -> rx.Component:
-    icon_cases = [
-        (cat, details["icon"]) for cat, details in CATEGORY_DEFINITIONS.items()
-    ]
-    icon_name = rx.match(category, *icon_cases, CATEGORY_DEFINITIONS["Outros"]["icon"])
-    cls_cases = [
-        (
-            cat,
-            f"inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium {details['color_cls']}",
-        )
-        for cat, details in CATEGORY_DEFINITIONS.items()
-    ]
-    default_cls = f"inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium {CATEGORY_DEFINITIONS['Outros']['color_cls']}"
+    style = category_style(category).to(dict)
     return rx.el.span(
-        rx.icon(icon_name, class_name="w-3 h-3 mr-1.5"),
+        rx.icon(style["icon"].to(str), class_name="w-3 h-3 mr-1.5"),
         category,
-        class_name=rx.match(category, *cls_cases, default_cls),
+        class_name=style["className"].to(str),
         title=category,
     )
 
 
+def select_checkbox(item_id: rx.Var) -> rx.Component:
+    return rx.el.input(
+        type="checkbox",
+        checked=FinanceState.selected_ids.contains(item_id),
+        on_change=lambda _: FinanceState.toggle_selected(item_id),
+        class_name="w-4 h-4 mr-3 accent-violet-600 cursor-pointer",
+        title="Selecionar item",
+    )
+
+
+def bulk_toolbar(section: str, move_label: str) -> rx.Component:
+    """Actions on the items ticked in a list, applied and saved at once."""
+    button_cls = "px-3 py-1.5 text-xs font-medium rounded-lg transition-colors"
+    return rx.cond(
+        FinanceState.selected_counts[section] > 0,
+        rx.el.div(
+            rx.el.span(
+                f"{FinanceState.selected_counts[section]} selecionado(s)",
+                class_name="text-xs font-semibold text-violet-700 mr-auto",
+            ),
+            rx.el.button(
+                "Todos",
+                on_click=FinanceState.select_all(section),
+                class_name=f"{button_cls} text-violet-600 hover:bg-violet-100",
+            ),
+            rx.el.select(
+                rx.el.option("Alterar categoria...", value="", disabled=True),
+                rx.foreach(
+                    FinanceState.category_options,
+                    lambda cat: rx.el.option(cat, value=cat),
+                ),
+                value="",
+                on_change=lambda category: FinanceState.bulk_recategorize(
+                    section, category
+                ),
+                class_name="px-2 py-1.5 text-xs bg-white border border-gray-300 rounded-lg",
+            ),
+            rx.el.button(
+                move_label,
+                on_click=FinanceState.bulk_move(section),
+                class_name=f"{button_cls} text-blue-600 hover:bg-blue-100",
+            ),
+            rx.el.button(
+                "Excluir",
+                on_click=FinanceState.bulk_remove(section),
+                class_name=f"{button_cls} text-red-600 hover:bg-red-100",
+            ),
+            rx.el.button(
+                rx.icon("x", class_name="w-3 h-3"),
+                on_click=FinanceState.clear_selection(section),
+                class_name=f"{button_cls} text-gray-500 hover:bg-gray-100",
+                title="Limpar seleção",
+            ),
+            class_name="flex flex-wrap items-center gap-2 p-2 mb-3 bg-violet-50 border border-violet-100 rounded-lg",
+        ),
+    )
+
+
 def empty_state(text: str) -> rx.Component:
     return rx.el.div(
         rx.icon("clipboard-list", class_name="w-8 h-8 text-gray-300 mb-2"),
@@ -55,6 +163,24 @@ def empty_state(text: str) -> rx.Component:
     )
 
 
+def lazy_section(section: str, list_component: rx.Component) -> rx.Component:
+    """In lazy mode, fetch the section when its list mounts, a page at a time."""
+    if not lazy_sections_enabled():
+        return list_component
+    return rx.el.div(
+        list_component,
+        rx.cond(
+            FinanceState.section_has_more[section],
+            rx.el.button(
+                "Carregar mais",
+                on_click=FinanceState.load_more(section),
+                class_name="w-full mt-2 py-2 text-sm font-medium text-violet-600 hover:bg-violet-50 rounded-lg transition-colors",
+            ),
+        ),
+        on_mount=FinanceState.load_section(section),
+    )
+
+
 def income_item(item: IncomeItem, index: int) -> rx.Component:
     return rx.el.div(
         rx.el.div(
@@ -81,15 +207,25 @@ def expense_item(
 ) -> rx.Component:
     return rx.el.div(
         rx.el.div(
+            select_checkbox(item["id"]),
             rx.el.div(
-                rx.el.p(item["name"], class_name="font-medium text-gray-800 mr-2"),
-                category_badge(item.get("category", "Outros")),
-                class_name="flex items-center mb-1",
-            ),
-            rx.el.p(
-                rx.cond(FinanceState.hide_values, "R$ ****", f"R$ {item['amount']}"),
-                class_name="text-sm text-red-600 font-semibold",
+                rx.el.div(
+                    rx.el.p(item["name"], class_name="font-medium text-gray-800 mr-2"),
+                    category_badge(item.get("category", "Outros")),
+                    class_name="flex items-center mb-1",
+                ),
+                rx.el.p(
+                    rx.cond(
+                        FinanceState.hide_values, "R$ ****", f"R$ {item['amount']}"
+                    ),
+                    rx.el.span(
+                        frequency_label(item).to(str),
+                        class_name="ml-2 text-xs font-normal text-gray-500",
+                    ),
+                    class_name="text-sm text-red-600 font-semibold",
+                ),
             ),
+            class_name="flex items-center",
         ),
         rx.el.div(
             edit_button(on_edit),
@@ -161,6 +297,7 @@ def monthly_expense_list() -> rx.Component:
         rx.el.h3(
             "Despesas Fixas", class_name="text-lg font-semibold text-gray-800 mb-4"
         ),
+        bulk_toolbar("monthly_expenses", "Mover para anuais"),
         rx.cond(
             FinanceState.monthly_expenses.length() > 0,
             rx.el.div(
@@ -185,6 +322,7 @@ def annual_expense_list() -> rx.Component:
         rx.el.h3(
             "Despesas Anuais", class_name="text-lg font-semibold text-gray-800 mb-4"
         ),
+        bulk_toolbar("annual_expenses", "Mover para mensais"),
         rx.cond(
             FinanceState.annual_expenses.length() > 0,
             rx.el.div(
@@ -0,0 +1,106 @@
+import reflex as rx
+from app.states.finance_state import FinanceState, SearchResult
+from app.components.lists import category_badge
+
+SECTION_LABELS = {
+    "monthly_income": "Renda",
+    "monthly_expenses": "Despesa fixa",
+    "annual_expenses": "Despesa anual",
+    "installments": "Parcelamento",
+}
+SORT_LABELS = {
+    "amount_desc": "Maior valor",
+    "amount_asc": "Menor valor",
+    "name": "Nome",
+    "category": "Categoria",
+}
+FIELD_CLS = "px-3 py-2 bg-white border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-violet-500 focus:border-transparent text-sm"
+
+
+def search_result(item: SearchResult) -> rx.Component:
+    return rx.el.div(
+        rx.el.div(
+            rx.el.p(item["name"], class_name="font-medium text-gray-800 mr-2"),
+            rx.cond(item["category"] != "", category_badge(item["category"])),
+            class_name="flex items-center",
+        ),
+        rx.el.div(
+            rx.el.span(
+                rx.match(
+                    item["section"],
+                    *SECTION_LABELS.items(),
+                    "",
+                ),
+                class_name="text-xs text-gray-500 mr-3",
+            ),
+            rx.el.span(
+                rx.cond(FinanceState.hide_values, "R$ ****", f"R$ {item['amount']}"),
+                class_name="text-sm font-semibold text-gray-700",
+            ),
+            class_name="flex items-center",
+        ),
+        class_name="flex items-center justify-between p-3 bg-white rounded-lg border border-gray-100",
+    )
+
+
+def search_panel() -> rx.Component:
+    """Search over every item by name and category, with filter and sort."""
+    return rx.el.div(
+        rx.el.div(
+            rx.el.div(
+                rx.icon("search", class_name="w-4 h-4 text-gray-400 mr-2"),
+                rx.debounce_input(
+                    rx.el.input(
+                        placeholder="Buscar itens...",
+                        value=FinanceState.search_query,
+                        on_change=FinanceState.set_search_query,
+                        class_name="w-full text-sm focus:outline-none",
+                    ),
+                    debounce_timeout=150,
+                ),
+                class_name=f"flex items-center flex-1 min-w-[12rem] {FIELD_CLS}",
+            ),
+            rx.el.select(
+                rx.el.option("Todas as categorias", value=""),
+                rx.foreach(
+                    FinanceState.category_options,
+                    lambda cat: rx.el.option(cat, value=cat),
+                ),
+                value=FinanceState.search_category,
+                on_change=FinanceState.set_search_category,
+                class_name=FIELD_CLS,
+            ),
+            rx.el.select(
+                *[
+                    rx.el.option(label, value=sort)
+                    for sort, label in SORT_LABELS.items()
+                ],
+                value=FinanceState.search_sort,
+                on_change=FinanceState.set_search_sort,
+                class_name=FIELD_CLS,
+            ),
+            class_name="flex flex-wrap items-center gap-3",
+        ),
+        rx.cond(
+            (FinanceState.search_query != "") | (FinanceState.search_category != ""),
+            rx.el.div(
+                rx.el.div(
+                    rx.el.span(
+                        f"{FinanceState.search_count} resultado(s)",
+                        class_name="text-sm text-gray-500",
+                    ),
+                    rx.el.button(
+                        "Limpar",
+                        on_click=FinanceState.clear_search,
+                        class_name="text-sm font-medium text-violet-600 hover:underline",
+                    ),
+                    class_name="flex items-center justify-between mt-4 mb-2",
+                ),
+                rx.el.div(
+                    rx.foreach(FinanceState.search_results, search_result),
+                    class_name="space-y-2 max-h-96 overflow-y-auto",
+                ),
+            ),
+        ),
+        class_name="p-6 mb-8 bg-white rounded-2xl border border-gray-100 shadow-sm",
+    )
@@ -1,9 +1,64 @@
 import os
 import logging
-from pymongo import MongoClient
+from types import SimpleNamespace
+from pymongo import DeleteOne, MongoClient, ReplaceOne, UpdateOne
+from app.mongo_profiler import get_command_profiler
 
 _client = None
 _collection = None
+_ledger_collection = None
+_item_collection = None
+_change_collection = None
+_rollover_collection = None
+_category_collection = None
+
+
+def _create_client(mongodb_uri: str):
+    """Create the client for the given URI, allowing local stand-ins for testing."""
+    if mongodb_uri.startswith("mongomock://"):
+        import mongomock
+
+        return mongomock.MongoClient()
+    tls = os.getenv("MONGODB_TLS", "1") != "0"
+    profiler = get_command_profiler()
+    client = MongoClient(
+        mongodb_uri,
+        serverSelectionTimeoutMS=5000,
+        tls=tls,
+        event_listeners=[profiler] if profiler is not None else [],
+    )
+    if profiler is not None:
+        # Slow commands are explained through the client that ran them.
+        profiler.client = client
+    return client
+
+
+def bulk_write(collection, requests: list, ordered: bool = True):
+    """collection.bulk_write, or the same writes one at a time under mongomock.
+
+    mongomock 4.3 cannot run pymongo 4.11+'s bulk operations (they pass it a
+    sort argument it does not know). The result has the counts callers read.
+    """
+    if not type(collection).__module__.startswith("mongomock"):
+        return collection.bulk_write(requests, ordered=ordered)
+    counts = {"matched_count": 0, "modified_count": 0, "deleted_count": 0}
+    counts["upserted_count"] = 0
+    for request in requests:
+        if isinstance(request, DeleteOne):
+            result = collection.delete_one(request._filter)
+            counts["deleted_count"] += result.deleted_count
+            continue
+        if isinstance(request, ReplaceOne):
+            write = collection.replace_one
+        elif isinstance(request, UpdateOne):
+            write = collection.update_one
+        else:
+            raise TypeError(f"Unsupported bulk operation: {request!r}")
+        result = write(request._filter, request._doc, upsert=bool(request._upsert))
+        counts["matched_count"] += result.matched_count
+        counts["modified_count"] += result.modified_count
+        counts["upserted_count"] += result.upserted_id is not None
+    return SimpleNamespace(**counts)
 
 
 def get_db_client():
@@ -14,7 +69,7 @@ def get_db_client():
             logging.warning("MONGODB_URI not set. Database features will not persist.")
             return None
         try:
-            _client = MongoClient(mongodb_uri, serverSelectionTimeoutMS=5000, tls=True)
+            _client = _create_client(mongodb_uri)
             _client.admin.command("ping")
             logging.info("Connected to MongoDB successfully.")
         except Exception as e:
@@ -37,4 +92,96 @@ def get_user_collection():
             return collection
         except Exception as e:
             logging.exception(f"Error getting collection: {e}")
-    return None
\ No newline at end of file
+    return None
+
+
+def get_ledger_collection():
+    """Per-item collection used for server-side aggregation (see app/ledger.py)."""
+    global _ledger_collection
+    if _ledger_collection is not None:
+        return _ledger_collection
+    client = get_db_client()
+    if client:
+        try:
+            db = client.get_database("finance_app")
+            collection = db.get_collection("finance_items")
+            collection.create_index([("user_email", 1), ("kind", 1), ("category", 1)])
+            collection.create_index([("user_email", 1), ("item_id", 1)], unique=True)
+            _ledger_collection = collection
+            return collection
+        except Exception as e:
+            logging.exception(f"Error getting ledger collection: {e}")
+    return None
+
+
+def get_item_collection():
+    """One document per item, for users stored in the items layout."""
+    global _item_collection
+    if _item_collection is not None:
+        return _item_collection
+    client = get_db_client()
+    if client:
+        try:
+            db = client.get_database("finance_app")
+            collection = db.get_collection("user_finance_items")
+            collection.create_index([("user_email", 1), ("kind", 1), ("category", 1)])
+            collection.create_index([("user_email", 1), ("item_id", 1)], unique=True)
+            _item_collection = collection
+            return collection
+        except Exception as e:
+            logging.exception(f"Error getting item collection: {e}")
+    return None
+
+
+def get_change_collection():
+    """Append-only log of each user's saves (see app/change_log.py)."""
+    global _change_collection
+    if _change_collection is not None:
+        return _change_collection
+    client = get_db_client()
+    if client:
+        try:
+            db = client.get_database("finance_app")
+            collection = db.get_collection("finance_changes")
+            collection.create_index([("user_email", 1), ("seq", 1)], unique=True)
+            _change_collection = collection
+            return collection
+        except Exception as e:
+            logging.exception(f"Error getting change collection: {e}")
+    return None
+
+
+def get_rollover_collection():
+    """Each user's closed months (see app/rollover.py)."""
+    global _rollover_collection
+    if _rollover_collection is not None:
+        return _rollover_collection
+    client = get_db_client()
+    if client:
+        try:
+            db = client.get_database("finance_app")
+            collection = db.get_collection("finance_rollovers")
+            collection.create_index([("user_email", 1), ("month", 1)], unique=True)
+            _rollover_collection = collection
+            return collection
+        except Exception as e:
+            logging.exception(f"Error getting rollover collection: {e}")
+    return None
+
+
+def get_category_collection():
+    """Each user's own categories (see app/categories.py)."""
+    global _category_collection
+    if _category_collection is not None:
+        return _category_collection
+    client = get_db_client()
+    if client:
+        try:
+            db = client.get_database("finance_app")
+            collection = db.get_collection("user_categories")
+            collection.create_index("user_email", unique=True)
+            _category_collection = collection
+            return collection
+        except Exception as e:
+            logging.exception(f"Error getting category collection: {e}")
+    return None
@@ -0,0 +1,91 @@
+import os
+import time
+import asyncio
+import logging
+from reflex.state import StateUpdate
+
+
+def delta_batch_seconds() -> float:
+    """How long the updates sent to one tab are merged for; 0 (the default) disables it.
+
+    Set DELTA_BATCH_MS, e.g. to 16 for one frame.
+    """
+    return float(os.getenv("DELTA_BATCH_MS", "0")) / 1000
+
+
+def merge_update(delta: dict, events: list, update: StateUpdate):
+    """Fold update into delta and events: a var's later value replaces its earlier one."""
+    for state_name, subdelta in update.delta.items():
+        delta.setdefault(state_name, {}).update(subdelta)
+    events.extend(update.events)
+
+
+class DeltaBatcher:
+    """Merges the state updates sent to each tab within a frame into one.
+
+    The first update after a quiet frame is sent at once, so a lone event
+    waits for nothing. Updates following it within the frame are merged and
+    sent when the frame ends: a burst of edits sends each list and total
+    once, with the value it ended on. Events (toasts) ride along in order,
+    after the merged delta.
+    """
+
+    def __init__(self, emit, frame: float):
+        self.emit = emit
+        self.frame = frame
+        self.sent = 0
+        self.merged = 0
+        self._last_sent: dict[str, float] = {}
+        self._pending: dict[str, tuple[dict, list]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def emit_update(self, update: StateUpdate, token: str):
+        pending = self._pending.get(token)
+        if pending is not None:
+            merge_update(*pending, update)
+            self.merged += 1
+            return
+        wait = self._last_sent.get(token, float("-inf")) + self.frame - time.monotonic()
+        if wait <= 0:
+            await self._send(update, token)
+            return
+        self._pending[token] = ({}, [])
+        merge_update(*self._pending[token], update)
+        task = asyncio.create_task(self._flush(token, wait))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, token: str, wait: float):
+        await asyncio.sleep(wait)
+        delta, events = self._pending.pop(token)
+        try:
+            await self._send(StateUpdate(delta=delta, events=events), token)
+        except Exception as e:
+            logging.exception(f"Error sending batched update to {token}: {e}")
+
+    async def _send(self, update: StateUpdate, token: str):
+        now = time.monotonic()
+        self._last_sent[token] = now
+        # Forgotten once quiet, so tabs that are gone leave nothing behind.
+        asyncio.get_running_loop().call_later(self.frame, self._forget, token, now)
+        self.sent += 1
+        await self.emit(update, token)
+
+    def _forget(self, token: str, sent_at: float):
+        if self._last_sent.get(token) == sent_at:
+            del self._last_sent[token]
+
+
+def install_delta_batching(app) -> DeltaBatcher | None:
+    """Route the app's state updates through a DeltaBatcher if DELTA_BATCH_MS is set.
+
+    Every update Reflex sends to a tab, from events, background tasks or
+    other workers, goes through EventNamespace.emit_update.
+    """
+    frame = delta_batch_seconds()
+    namespace = app.event_namespace
+    if frame <= 0 or namespace is None:
+        return None
+    batcher = DeltaBatcher(namespace.emit_update, frame)
+    namespace.emit_update = batcher.emit_update
+    return batcher
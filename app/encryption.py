@@ -1,65 +1,199 @@
 import os
+import base64
+import hashlib
 import logging
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 
 _cipher = None
+_keys = None
+_multi = None
+_primary_kid = None
 _using_temp_key = False
 
+# Values encrypted with a per-user data key rather than a master key.
+DATA_KEY_ID = "dek"
 
-def _get_cipher() -> Fernet:
-    global _cipher, _using_temp_key
-    if _cipher is not None:
-        return _cipher
-    key = os.getenv("ENCRYPTION_KEY")
-    if not key:
+
+class EncryptionKeyError(Exception):
+    """Raised when the configured encryption keys cannot be used."""
+
+
+def key_id(key: bytes) -> str:
+    """Short, stable identifier of a key, stored alongside each value."""
+    return hashlib.sha256(key).hexdigest()[:8]
+
+
+def _configured_keys() -> list[tuple[str, bytes]]:
+    """Keys from ENCRYPTION_KEYS ("kid:key,kid:key", primary first) or ENCRYPTION_KEY.
+
+    The key id prefix is optional; without it the id is derived from the key.
+    """
+    raw = os.getenv("ENCRYPTION_KEYS") or os.getenv("ENCRYPTION_KEY") or ""
+    entries = []
+    for entry in raw.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        kid, sep, key = entry.partition(":")
+        if not sep:
+            kid, key = "", entry
+        entries.append((kid or key_id(key.encode()), key.encode()))
+    return entries
+
+
+def _load_keys():
+    global _cipher, _keys, _multi, _primary_kid, _using_temp_key
+    entries = _configured_keys()
+    if not entries:
         if not _using_temp_key:
             logging.warning(
                 "⚠️ ENCRYPTION_KEY not found in environment. Generating temporary key. Data will NOT persist after restart."
             )
         key = Fernet.generate_key()
+        entries = [(key_id(key), key)]
         _using_temp_key = True
-    elif isinstance(key, str):
-        key = key.encode()
-    try:
-        _cipher = Fernet(key)
-    except Exception as e:
-        logging.exception(f"Invalid ENCRYPTION_KEY provided: {e}. Using temporary key.")
-        _cipher = Fernet(Fernet.generate_key())
-        _using_temp_key = True
+    keys = {}
+    for kid, key in entries:
+        try:
+            keys[kid] = Fernet(key)
+        except Exception as e:
+            # Falling back to a temporary key would make every stored value
+            # unreadable, so refuse to encrypt or decrypt anything instead.
+            raise EncryptionKeyError(f"Invalid encryption key '{kid}': {e}") from e
+    _primary_kid = entries[0][0]
+    _cipher = keys[_primary_kid]
+    _multi = MultiFernet(list(keys.values()))
+    _keys = keys
+
+
+def _get_cipher() -> Fernet:
+    """The primary key, used for every new encryption."""
+    if _cipher is None:
+        _load_keys()
     return _cipher
 
 
+def _get_keys() -> dict[str, Fernet]:
+    _get_cipher()
+    return _keys
+
+
+def primary_key_id() -> str:
+    _get_cipher()
+    return _primary_kid
+
+
 def is_using_temp_key() -> bool:
     """Check if the application is using a temporary encryption key."""
-    _get_cipher()
+    try:
+        _get_cipher()
+    except EncryptionKeyError:
+        return False
     return _using_temp_key
 
 
-def encrypt_value(value: float | int) -> str:
-    """Encrypts a numeric value to a string."""
+def _decrypt_token(value: str, data_cipher: Fernet | None = None) -> bytes:
+    """Decrypt "kid:token" with its key, or a legacy bare token with any key."""
+    kid, sep, token = value.partition(":")
+    if not sep:
+        _get_cipher()
+        return _multi.decrypt(value.encode("utf-8"))
+    if kid == DATA_KEY_ID:
+        if data_cipher is None:
+            raise InvalidToken("Value needs the user's data key")
+        return data_cipher.decrypt(token.encode("utf-8"))
+    cipher = _get_keys().get(kid)
+    if cipher is None:
+        raise InvalidToken(f"Unknown encryption key id '{kid}'")
+    return cipher.decrypt(token.encode("utf-8"))
+
+
+def create_data_key() -> str:
+    """Generate a per-user data key, returned wrapped by the primary master key."""
+    token = _get_cipher().encrypt(Fernet.generate_key())
+    return f"{_primary_kid}:{token.decode('utf-8')}"
+
+
+def unwrap_data_key(wrapped: str) -> bytearray:
+    """Unwrap a data key into a mutable buffer, so it can be zeroed later."""
+    return bytearray(_decrypt_token(wrapped))
+
+
+def encrypt_value(value: float | int, data_cipher: Fernet | None = None) -> str:
+    """Encrypts a numeric value to a "kid:token" string.
+
+    With a data_cipher (a user's unwrapped data key) the kid is DATA_KEY_ID.
+    """
     try:
-        cipher = _get_cipher()
+        cipher = data_cipher or _get_cipher()
         str_val = str(value)
         token = cipher.encrypt(str_val.encode())
-        return token.decode("utf-8")
+        kid = DATA_KEY_ID if data_cipher else _primary_kid
+        return f"{kid}:{token.decode('utf-8')}"
+    except EncryptionKeyError:
+        raise
     except Exception as e:
         logging.exception(f"Error encrypting value: {e}")
         return str(value)
 
 
-def decrypt_value(value: str | float | int) -> float:
+def encrypt_raw(plaintext: bytes, data_cipher: Fernet) -> bytes:
+    """The Fernet token for plaintext as raw bytes, without the base64 text.
+
+    Only for data keys: there is no kid, so the reader must know the key.
+    """
+    return base64.urlsafe_b64decode(data_cipher.encrypt(plaintext))
+
+
+def decrypt_raw(token: bytes, data_cipher: Fernet) -> bytes:
+    return data_cipher.decrypt(base64.urlsafe_b64encode(token))
+
+
+def decrypt_value(value: str | float | int, data_cipher: Fernet | None = None) -> float:
     """Decrypts a value back to float."""
     if isinstance(value, (float, int)):
         return float(value)
     try:
-        cipher = _get_cipher()
-        token = value.encode("utf-8")
-        decrypted_bytes = cipher.decrypt(token)
+        decrypted_bytes = _decrypt_token(value, data_cipher)
         decrypted_str = decrypted_bytes.decode("utf-8")
         return float(decrypted_str)
+    except EncryptionKeyError:
+        raise
     except Exception as e:
         try:
             return float(value)
         except ValueError:
             logging.exception(f"Error decrypting value '{value}': {e}")
-            return 0.0
\ No newline at end of file
+            return 0.0
+
+
+def needs_reencryption(value: str | float | int) -> bool:
+    """True unless value is encrypted with the primary key or a data key.
+
+    Data keys are rotated by rewrapping them, not by touching their values.
+    """
+    if not isinstance(value, str):
+        return True
+    kid, sep, _ = value.partition(":")
+    return not sep or kid not in (primary_key_id(), DATA_KEY_ID)
+
+
+def reencrypt_value(value: str | float | int) -> str:
+    """Re-encrypt a stored value with the primary key.
+
+    Unlike decrypt_value this never falls back to 0.0: a value that cannot be
+    decrypted raises InvalidToken, so it is left as it is rather than lost.
+    Plaintext numbers left behind by failed encryptions are encrypted.
+    """
+    if isinstance(value, (float, int)):
+        plaintext = str(value).encode()
+    else:
+        try:
+            plaintext = _decrypt_token(value)
+        except InvalidToken:
+            try:
+                plaintext = str(float(value)).encode()
+            except ValueError:
+                raise InvalidToken(f"Cannot decrypt value '{value}'") from None
+    token = _get_cipher().encrypt(plaintext)
+    return f"{_primary_kid}:{token.decode('utf-8')}"
@@ -0,0 +1,73 @@
+import os
+import json
+import time
+import base64
+import logging
+import reflex_google_auth.state as google_auth_state
+
+FAKE_TOKEN_PREFIX = "fake-token."
+
+_warned = False
+
+
+def fake_tokens_enabled() -> bool:
+    """Fake tokens are only honoured when AUTH_FAKE_TOKENS=1 is set explicitly."""
+    global _warned
+    enabled = os.getenv("AUTH_FAKE_TOKENS") == "1"
+    if enabled and not _warned:
+        logging.warning(
+            "⚠️ AUTH_FAKE_TOKENS is enabled. Google sign-in is bypassed; never use this in production."
+        )
+        _warned = True
+    return enabled
+
+
+def make_fake_token(email: str, ttl: int = 3600, name: str = "") -> str:
+    """Build an unsigned stand-in for a Google ID token, for local load testing."""
+    claims = {
+        "email": email,
+        "email_verified": True,
+        "name": name or email.split("@")[0],
+        "picture": "",
+        "iat": int(time.time()),
+        "exp": int(time.time()) + ttl,
+    }
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode()
+    return FAKE_TOKEN_PREFIX + payload
+
+
+def parse_fake_token(token: str) -> dict | None:
+    """Return the claims of a fake token, or None if it is not one."""
+    if not token or not token.startswith(FAKE_TOKEN_PREFIX):
+        return None
+    try:
+        payload = token[len(FAKE_TOKEN_PREFIX) :]
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode()))
+    except Exception as e:
+        logging.exception(f"Invalid fake token: {e}")
+        return None
+    if not isinstance(claims, dict) or not claims.get("email"):
+        return None
+    return claims
+
+
+def install_fake_token_verifier():
+    """Let GoogleAuthState accept fake tokens when AUTH_FAKE_TOKENS=1.
+
+    GoogleAuthState.tokeninfo calls verify_oauth2_token, so wrapping it there
+    covers tokeninfo, token_is_valid and everything derived from them.
+    """
+    if not fake_tokens_enabled():
+        return
+    verify_google_token = google_auth_state.verify_oauth2_token
+    if getattr(verify_google_token, "accepts_fake_tokens", False):
+        return
+
+    def verify_oauth2_token(id_token, request, audience=None, **kwargs):
+        claims = parse_fake_token(id_token)
+        if claims is not None:
+            return claims
+        return verify_google_token(id_token, request, audience, **kwargs)
+
+    verify_oauth2_token.accepts_fake_tokens = True
+    google_auth_state.verify_oauth2_token = verify_oauth2_token
@@ -0,0 +1,357 @@
+import json
+import uuid
+import hashlib
+from functools import partial
+from app.encryption import encrypt_value, decrypt_value
+from app.key_cache import get_data_cipher
+from app.categories import add_to_tree
+from app.compact import compact_encoding, is_compact, encode_item, decode_item
+from app.recurrence import (
+    SECTION_FREQUENCIES,
+    section_factor,
+    with_recurrence,
+    without_recurrence,
+)
+
+SECTIONS = ("monthly_income", "monthly_expenses", "annual_expenses", "installments")
+ENCRYPTED_FIELDS = ("amount", "total_amount", "installment_value")
+
+
+def empty_data() -> dict:
+    data = {section: [] for section in SECTIONS}
+    data["version"] = 0
+    data["data_key"] = None
+    return data
+
+
+def copy_data(data: dict) -> dict:
+    """Copy the section lists and their items, so callers can mutate freely."""
+    copied = {
+        section: [dict(item) for item in data.get(section, [])] for section in SECTIONS
+    }
+    copied["version"] = data.get("version", 0)
+    copied["data_key"] = data.get("data_key")
+    return copied
+
+
+def new_item_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def legacy_item_id(section: str, item: dict, occurrence: int = 0) -> str:
+    """Stable id for items stored before ids existed.
+
+    Derived from the stored item alone, not its position, so every session
+    derives the same id for it however many items before it were removed
+    since, and merges agree on identity until the next save persists the
+    ids. Identical stored items are told apart by occurrence, counting the
+    earlier ones: being identical, which of them an op applies to does not
+    matter.
+    """
+    content = json.dumps(item, sort_keys=True, default=str)
+    key = f"{section}:{occurrence}:{content}"
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def with_item_ids(section: str, items: list[dict]) -> list[dict]:
+    """The stored items, each without an id given its legacy_item_id."""
+    occurrences = {}
+    identified = []
+    for item in items:
+        if "id" not in item:
+            content = legacy_item_id(section, item)
+            occurrence = occurrences.get(content, 0)
+            occurrences[content] = occurrence + 1
+            item = {**item, "id": legacy_item_id(section, item, occurrence)}
+        identified.append(item)
+    return identified
+
+
+def encrypt_income(item: dict, cipher=None) -> dict:
+    return {
+        "id": item["id"],
+        "name": item["name"],
+        "amount": encrypt_value(item["amount"], cipher),
+    }
+
+
+def encrypt_expense(item: dict, cipher=None) -> dict:
+    stored = {
+        "id": item["id"],
+        "name": item["name"],
+        "amount": encrypt_value(item["amount"], cipher),
+        "category": item.get("category", "Outros"),
+    }
+    # The monthly factor follows from these, and is worked out again on reading.
+    if "frequency" in item:
+        stored["frequency"] = item["frequency"]
+    if "interval_months" in item:
+        stored["interval_months"] = item["interval_months"]
+    return stored
+
+
+def encrypt_installment(item: dict, cipher=None) -> dict:
+    return {
+        "id": item["id"],
+        "name": item["name"],
+        "total_amount": encrypt_value(item["total_amount"], cipher),
+        "installments_count": item["installments_count"],
+        "installment_value": encrypt_value(item["installment_value"], cipher),
+        "category": item.get("category", "Outros"),
+    }
+
+
+def decrypt_income(item: dict, cipher=None) -> dict:
+    return {
+        "id": item["id"],
+        "name": item.get("name", ""),
+        "amount": decrypt_value(item.get("amount", 0), cipher),
+    }
+
+
+def decrypt_expense(item: dict, cipher=None, section: str = "monthly_expenses") -> dict:
+    decrypted = {
+        "id": item["id"],
+        "name": item.get("name", ""),
+        "amount": decrypt_value(item.get("amount", 0), cipher),
+        "category": item.get("category", "Outros"),
+        "frequency": item.get("frequency", ""),
+        "interval_months": item.get("interval_months"),
+    }
+    return with_recurrence(section, decrypted)
+
+
+def decrypt_installment(item: dict, cipher=None) -> dict:
+    return {
+        "id": item["id"],
+        "name": item.get("name", ""),
+        "total_amount": decrypt_value(item.get("total_amount", 0), cipher),
+        "installments_count": int(item.get("installments_count", 1)),
+        "installment_value": decrypt_value(item.get("installment_value", 0), cipher),
+        "category": item.get("category", "Outros"),
+    }
+
+
+ENCRYPTORS = {
+    "monthly_income": encrypt_income,
+    "monthly_expenses": encrypt_expense,
+    "annual_expenses": encrypt_expense,
+    "installments": encrypt_installment,
+}
+
+DECRYPTORS = {
+    "monthly_income": decrypt_income,
+    "monthly_expenses": partial(decrypt_expense, section="monthly_expenses"),
+    "annual_expenses": partial(decrypt_expense, section="annual_expenses"),
+    "installments": decrypt_installment,
+}
+
+
+def encrypt_item(section: str, item: dict, cipher=None) -> dict:
+    """An item as stored in MongoDB: compact if enabled and there is a data key.
+
+    See app/compact.py. The SQLite store keeps JSON, and the ENCRYPTORS.
+    """
+    if cipher is not None and compact_encoding():
+        return encode_item(section, item, cipher)
+    return ENCRYPTORS[section](item, cipher)
+
+
+def decrypt_item(section: str, stored: dict, cipher=None) -> dict:
+    """A stored item decrypted, whichever encoding it was stored in."""
+    if is_compact(stored):
+        return decode_item(section, stored, cipher)
+    return DECRYPTORS[section](stored, cipher)
+
+
+def encrypt_data(data: dict) -> dict:
+    """Encrypt the amounts of every section with the user's data key.
+
+    Data without a data_key (legacy documents) is encrypted with the master key.
+    """
+    cipher = get_data_cipher(data.get("data_key"))
+    # Looked up once, not per item: it reads the environment.
+    compact = cipher is not None and compact_encoding()
+    encrypted = {}
+    for section in SECTIONS:
+        encrypt = partial(encode_item, section) if compact else ENCRYPTORS[section]
+        encrypted[section] = [encrypt(item, cipher) for item in data.get(section, [])]
+    if data.get("data_key"):
+        encrypted["data_key"] = data["data_key"]
+    return encrypted
+
+
+def decrypt_data(doc: dict) -> dict:
+    """Decrypt the sections of a stored user_finances document.
+
+    A document fetched with a projection may hold only some sections, some
+    fields of each item, or a page of each section.
+    """
+    cipher = get_data_cipher(doc.get("data_key"))
+    data = {}
+    for section in SECTIONS:
+        data[section] = [
+            decrypt_item(section, item, cipher)
+            for item in with_item_ids(section, doc.get(section) or [])
+        ]
+    data["version"] = doc.get("version", 0)
+    data["data_key"] = doc.get("data_key")
+    return data
+
+
+def encrypt_op(op: dict, cipher=None) -> dict:
+    """The op with its item encrypted, to be applied to a stored document."""
+    if op["op"] == "remove":
+        return op
+    return {**op, "item": ENCRYPTORS[op["section"]](op["item"], cipher)}
+
+
+def stored_op(op: dict, cipher=None) -> dict:
+    """Like encrypt_op, with the item as MongoDB stores it (see encrypt_item)."""
+    if op["op"] == "remove":
+        return op
+    return {**op, "item": encrypt_item(op["section"], op["item"], cipher)}
+
+
+def decrypt_op(op: dict, cipher=None) -> dict:
+    if op["op"] == "remove":
+        return op
+    return {**op, "item": decrypt_item(op["section"], op["item"], cipher)}
+
+
+def add_op(section: str, item: dict) -> dict:
+    return {"op": "add", "section": section, "item": dict(item)}
+
+
+def update_op(section: str, item: dict) -> dict:
+    return {"op": "update", "section": section, "item": dict(item)}
+
+
+def remove_op(section: str, item_id: str) -> dict:
+    return {"op": "remove", "section": section, "id": item_id}
+
+
+def apply_ops(data: dict, ops: list[dict]) -> dict:
+    """Replay a session's pending changes on top of newer stored data.
+
+    Items are matched by id, so concurrent additions from other sessions are
+    kept. An update to an item someone else removed is dropped.
+    """
+    merged = copy_data(data)
+    for op in ops:
+        items = merged[op["section"]]
+        if op["op"] == "add":
+            if not any(item["id"] == op["item"]["id"] for item in items):
+                items.append(dict(op["item"]))
+        elif op["op"] == "update":
+            for i, item in enumerate(items):
+                if item["id"] == op["item"]["id"]:
+                    items[i] = dict(op["item"])
+                    break
+        elif op["op"] == "remove":
+            merged[op["section"]] = [item for item in items if item["id"] != op["id"]]
+    return merged
+
+
+def bulk_remove_ops(data: dict, section: str, ids) -> list[dict]:
+    ids = set(ids)
+    return [
+        remove_op(section, item["id"]) for item in data[section] if item["id"] in ids
+    ]
+
+
+def bulk_update_ops(data: dict, section: str, ids, fields: dict) -> list[dict]:
+    """Ops setting fields (e.g. the category) on the selected items."""
+    ids = set(ids)
+    return [
+        update_op(section, {**item, **fields})
+        for item in data[section]
+        if item["id"] in ids
+    ]
+
+
+def bulk_move_ops(data: dict, section: str, target: str, ids) -> list[dict]:
+    """Ops moving the selected items to another section, keeping their ids.
+
+    Each remove comes before the add, so stores applying ops in order by id
+    end with the item in the target section. Items moved between recurring
+    sections take the target's frequency: that is what moving them says.
+    """
+    ids = set(ids)
+    ops = []
+    for item in data[section]:
+        if item["id"] in ids:
+            if target in SECTION_FREQUENCIES:
+                item = with_recurrence(target, without_recurrence(item))
+            ops += [remove_op(section, item["id"]), add_op(target, item)]
+    return ops
+
+
+def monthly_amount(section: str, item: dict) -> float:
+    """What an item weighs in a month: its amount times its monthly factor.
+
+    Recurring expenses carry the factor of their frequency (see
+    app/recurrence.py), e.g. a twelfth for annual ones, so this is the same
+    multiplication whatever the mix of frequencies.
+    """
+    if section == "installments":
+        return item["installment_value"]
+    factor = item.get("monthly_factor")
+    return item["amount"] * (section_factor(section) if factor is None else factor)
+
+
+def _add_stats(stats: dict, category: str, value: float, sign: int):
+    """Count, sum and sum of squares of the category's monthly amounts.
+
+    Kept alongside the totals so the mean and variance are known without
+    going over the items again (see app/anomalies.py).
+    """
+    current = stats.get(category) or {"count": 0, "sum": 0.0, "sum_sq": 0.0}
+    stats[category] = {
+        "count": current["count"] + sign,
+        "sum": current["sum"] + sign * value,
+        "sum_sq": current["sum_sq"] + sign * value * value,
+    }
+
+
+def summarize(data: dict) -> dict:
+    """Monthly totals per section and spending per category, in one pass.
+
+    tree holds the spending of every node of the category tree, each
+    subcategory counted in the categories above it too (see
+    app/categories.py), so the pie chart drills down without the items.
+    """
+    totals = {section: 0.0 for section in SECTIONS}
+    by_category = {}
+    stats = {}
+    tree = {}
+    for section in SECTIONS:
+        for item in data.get(section, []):
+            value = monthly_amount(section, item)
+            totals[section] += value
+            if section != "monthly_income":
+                category = item.get("category", "Outros")
+                by_category[category] = by_category.get(category, 0.0) + value
+                _add_stats(stats, category, value, 1)
+                add_to_tree(tree, category, value)
+    return {"totals": totals, "by_category": by_category, "stats": stats, "tree": tree}
+
+
+def adjust_summary(summary: dict, section: str, item: dict, sign: int) -> dict:
+    """A summarize result with one item added (sign 1) or taken out (sign -1).
+
+    Only the item's category and the nodes above it change: O(depth).
+    """
+    amount = monthly_amount(section, item)
+    value = sign * amount
+    totals = dict(summary.get("totals", {}))
+    totals[section] = totals.get(section, 0.0) + value
+    by_category = dict(summary.get("by_category", {}))
+    stats = dict(summary.get("stats", {}))
+    tree = dict(summary.get("tree", {}))
+    if section != "monthly_income":
+        category = item.get("category", "Outros")
+        by_category[category] = by_category.get(category, 0.0) + value
+        _add_stats(stats, category, amount, sign)
+        add_to_tree(tree, category, value)
+    return {"totals": totals, "by_category": by_category, "stats": stats, "tree": tree}
@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+import threading
+from app.database import get_user_collection
+
+_local_bus = None
+
+
+def is_multi_worker() -> bool:
+    return os.getenv("WORKER_MODE", "single") == "multi"
+
+
+def invalidation_bus() -> str:
+    """Either "changestream" (MongoDB change streams) or "local" (in-process)."""
+    return os.getenv("INVALIDATION_BUS", "changestream")
+
+
+class LocalPubSub:
+    """In-process stand-in for the change stream, for tests and benchmarks."""
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def publish(self, email: str):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(email)
+
+
+def get_local_bus() -> LocalPubSub:
+    global _local_bus
+    if _local_bus is None:
+        _local_bus = LocalPubSub()
+    return _local_bus
+
+
+class ChangeStreamListener(threading.Thread):
+    """Watches user_finances and invalidates cached users as they change.
+
+    Only user_email is projected out of each change event. The resume token
+    is kept so a dropped cursor picks up where it left off instead of
+    missing writes; if resuming is impossible the whole cache is cleared.
+    """
+
+    PIPELINE = [
+        {
+            "$match": {
+                "operationType": {"$in": ["insert", "update", "replace", "delete"]}
+            }
+        },
+        {"$project": {"operationType": 1, "fullDocument.user_email": 1}},
+    ]
+
+    def __init__(self, collection, cache, retry_delay: float = 1.0):
+        super().__init__(name="user-finances-invalidation", daemon=True)
+        self.collection = collection
+        self.cache = cache
+        self.retry_delay = retry_delay
+        self.resume_token = None
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _handle(self, change: dict):
+        self.resume_token = change["_id"]
+        email = (change.get("fullDocument") or {}).get("user_email")
+        if email:
+            self.cache.invalidate(email)
+        else:
+            # Deletes carry no document, so the owner is unknown.
+            self.cache.clear()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                with self.collection.watch(
+                    self.PIPELINE,
+                    full_document="updateLookup",
+                    resume_after=self.resume_token,
+                    max_await_time_ms=1000,
+                ) as stream:
+                    while not self._stopped.is_set() and stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self._handle(change)
+            except Exception as e:
+                if self.resume_token is None and not self.is_retryable(e):
+                    self.cache.disable(f"change streams unavailable ({e})")
+                    return
+                logging.exception(f"Change stream interrupted, retrying: {e}")
+                self.cache.clear()
+                time.sleep(self.retry_delay)
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        from pymongo.errors import ConnectionFailure
+
+        return isinstance(error, ConnectionFailure)
+
+
+def start_invalidation(cache):
+    """Subscribe this worker's cache to cross-worker invalidations."""
+    if not is_multi_worker():
+        return
+    if invalidation_bus() == "local":
+        get_local_bus().subscribe(cache.invalidate)
+        return
+    collection = get_user_collection()
+    if collection is None:
+        cache.disable("no database to watch for changes")
+        return
+    ChangeStreamListener(collection, cache).start()
+
+
+def publish_write(email: str):
+    """Announce a write to other workers; change streams do this themselves."""
+    if is_multi_worker() and invalidation_bus() == "local":
+        get_local_bus().publish(email)
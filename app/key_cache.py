@@ -0,0 +1,101 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from cryptography.fernet import Fernet
+from app.encryption import unwrap_data_key
+
+_cache = None
+
+
+class _Entry:
+    __slots__ = ("key", "cipher", "expires_at")
+
+    def __init__(self, key: bytearray, cipher: Fernet, expires_at: float):
+        self.key = key
+        self.cipher = cipher
+        self.expires_at = expires_at
+
+    def zeroize(self):
+        # The raw key lives in a buffer we own and can overwrite. The derived
+        # subkeys inside the Fernet object are immutable bytes: the best we
+        # can do is drop the reference.
+        for i in range(len(self.key)):
+            self.key[i] = 0
+        self.cipher = None
+
+
+class DataKeyCache:
+    """LRU cache of unwrapped per-user data keys, keyed by the wrapped key.
+
+    Unwrapping costs a master-key decryption, so it is done once per user per
+    ttl seconds rather than once per request. At most max_entries keys (a few
+    hundred bytes each) are held, and evicted keys are zeroed.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, wrapped: str) -> Fernet:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(wrapped)
+            if entry is not None:
+                if entry.expires_at > now:
+                    self._entries.move_to_end(wrapped)
+                    self.hits += 1
+                    return entry.cipher
+                del self._entries[wrapped]
+                entry.zeroize()
+                self.expirations += 1
+            self.misses += 1
+        key = unwrap_data_key(wrapped)
+        cipher = Fernet(key)
+        with self._lock:
+            self._entries[wrapped] = _Entry(key, cipher, now + self.ttl)
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                evicted.zeroize()
+                self.evictions += 1
+        return cipher
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                entry.zeroize()
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def get_data_key_cache() -> DataKeyCache:
+    global _cache
+    if _cache is None:
+        _cache = DataKeyCache(
+            int(os.getenv("DATA_KEY_CACHE_SIZE", "10000")),
+            float(os.getenv("DATA_KEY_CACHE_TTL", "300")),
+        )
+    return _cache
+
+
+def get_data_cipher(wrapped: str | None) -> Fernet | None:
+    """The user's data cipher, or None for documents without a data key."""
+    if not wrapped:
+        return None
+    return get_data_key_cache().get(wrapped)
@@ -0,0 +1,169 @@
+import os
+import logging
+from pymongo import DeleteOne, ReplaceOne
+from app.categories import category_tree
+from app.database import bulk_write
+from app.finance_data import SECTIONS, monthly_amount
+
+
+# The only value turning the ledger on: it spells out what the ledger costs.
+LEDGER_OPT_IN = "plaintext-amounts"
+
+_reported = set()
+
+
+def ledger_enabled() -> bool:
+    """Keep the finance_items ledger so totals can be computed by MongoDB.
+
+    THE LEDGER STORES PLAINTEXT AMOUNTS. $sum needs plain numbers, so every
+    entry holds the item's monthly amount unencrypted, next to the user's
+    email and the item's category (but not its name): anyone who can read
+    finance_items, or its backups, can read every user's amounts, which the
+    rest of the database only holds encrypted with the user's data key.
+    Only LEDGER_AGGREGATION=plaintext-amounts turns it on, and a worker
+    logs a warning saying so; restrict finance_items to the application's
+    database role if other roles must not read amounts.
+    """
+    setting = os.getenv("LEDGER_AGGREGATION", "")
+    enabled = setting == LEDGER_OPT_IN
+    if setting and setting not in _reported:
+        _reported.add(setting)
+        if enabled:
+            logging.warning(
+                "LEDGER_AGGREGATION: finance_items stores every item's monthly"
+                " amount in plaintext."
+            )
+        else:
+            logging.error(
+                f"LEDGER_AGGREGATION={setting} ignored: the ledger stores"
+                f" plaintext amounts, set LEDGER_AGGREGATION={LEDGER_OPT_IN}"
+                " to accept that."
+            )
+    return enabled
+
+
+def ledger_entry(email: str, section: str, item: dict) -> dict:
+    entry = {
+        "user_email": email,
+        "item_id": item["id"],
+        "kind": section,
+        "monthly_amount": monthly_amount(section, item),
+    }
+    if section != "monthly_income":
+        entry["category"] = item.get("category", "Outros")
+    return entry
+
+
+# The entry holding the document version a user's entries were built
+# against: the totals are only read while it matches the document's.
+VERSION_ENTRY = "_version"
+
+
+def version_entry(email: str, version: int) -> dict:
+    return {"user_email": email, "item_id": VERSION_ENTRY, "version": version}
+
+
+def ledger_version(collection, email: str) -> int | None:
+    """The document version the user's ledger matches, or None if it has none."""
+    entry = collection.find_one({"user_email": email, "item_id": VERSION_ENTRY})
+    return entry["version"] if entry else None
+
+
+def rebuild_ledger(collection, email: str, data: dict):
+    """Replace all of a user's ledger entries with data's, at data's version."""
+    collection.delete_many({"user_email": email})
+    entries = [
+        ledger_entry(email, section, item)
+        for section in SECTIONS
+        for item in data.get(section, [])
+    ]
+    entries.append(version_entry(email, data.get("version", 0)))
+    collection.insert_many(entries)
+
+
+def ensure_ledger(collection, email: str, data: dict) -> bool:
+    """Rebuild the user's ledger if it is behind data; True if it matches data.
+
+    A ledger ahead of data (another session saved since) is left alone.
+    """
+    version = ledger_version(collection, email)
+    if version == data.get("version", 0):
+        return True
+    if version is not None and version > data.get("version", 0):
+        return False
+    rebuild_ledger(collection, email, data)
+    return True
+
+
+def apply_ledger_ops(collection, email: str, ops: list[dict], version: int):
+    """Apply the ops of the save that made version, with one bulk write.
+
+    The ledger's version moves to version only if it was at the one before,
+    after the entries are written: a ledger that missed a save, or whose
+    update was interrupted, keeps an older version and is rebuilt on the
+    next full load (see ensure_ledger). If it missed one, it is dropped at
+    once, so no session reads its totals meanwhile.
+    """
+    requests = []
+    for op in ops:
+        if op["op"] == "remove":
+            requests.append(DeleteOne({"user_email": email, "item_id": op["id"]}))
+        else:
+            entry = ledger_entry(email, op["section"], op["item"])
+            requests.append(
+                ReplaceOne(
+                    {"user_email": email, "item_id": entry["item_id"]},
+                    entry,
+                    upsert=True,
+                )
+            )
+    if requests:
+        bulk_write(collection, requests, ordered=True)
+    result = collection.update_one(
+        {"user_email": email, "item_id": VERSION_ENTRY, "version": version - 1},
+        {"$set": {"version": version}},
+    )
+    if result.matched_count != 1:
+        collection.delete_many({"user_email": email})
+
+
+def summary_pipeline(email: str) -> list[dict]:
+    return [
+        {"$match": {"user_email": email, "item_id": {"$ne": VERSION_ENTRY}}},
+        {
+            "$group": {
+                "_id": {"kind": "$kind", "category": "$category"},
+                "total": {"$sum": "$monthly_amount"},
+                "count": {"$sum": 1},
+                "sum_sq": {
+                    "$sum": {"$multiply": ["$monthly_amount", "$monthly_amount"]}
+                },
+            }
+        },
+    ]
+
+
+def aggregate_summary(collection, email: str) -> dict:
+    """Same shape as finance_data.summarize, computed by the database."""
+    totals = {section: 0.0 for section in SECTIONS}
+    by_category = {}
+    stats = {}
+    for row in collection.aggregate(summary_pipeline(email)):
+        kind = row["_id"]["kind"]
+        totals[kind] = totals.get(kind, 0.0) + row["total"]
+        category = row["_id"].get("category")
+        if kind != "monthly_income":
+            category = category or "Outros"
+            by_category[category] = by_category.get(category, 0.0) + row["total"]
+            current = stats.get(category) or {"count": 0, "sum": 0.0, "sum_sq": 0.0}
+            stats[category] = {
+                "count": current["count"] + row["count"],
+                "sum": current["sum"] + row["total"],
+                "sum_sq": current["sum_sq"] + row["sum_sq"],
+            }
+    return {
+        "totals": totals,
+        "by_category": by_category,
+        "stats": stats,
+        "tree": category_tree(by_category),
+    }
@@ -0,0 +1,405 @@
+import os
+import hmac
+import json
+import time
+import queue
+import bisect
+import random
+import logging
+import threading
+from collections import OrderedDict, deque
+import bson
+from bson import json_util
+from pymongo import monitoring
+
+_profiler = None
+
+# Upper bounds of the latency buckets, in milliseconds; one more bucket
+# counts everything slower than the last.
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# The driver's own commands, and the explains run here, are not profiled.
+IGNORED_COMMANDS = {
+    "hello",
+    "isMaster",
+    "ismaster",
+    "ping",
+    "buildInfo",
+    "endSessions",
+    "saslStart",
+    "saslContinue",
+    "explain",
+}
+EXPLAINABLE_COMMANDS = {
+    "find",
+    "aggregate",
+    "count",
+    "distinct",
+    "update",
+    "delete",
+    "findAndModify",
+}
+# Fields the driver adds to commands, which explain refuses or does not need.
+SESSION_FIELDS = {"lsid", "txnNumber", "$clusterTime", "$db", "$readPreference"}
+
+# Explains kept, and how often a command of the same shape is explained again.
+MAX_EXPLAINS = 50
+EXPLAIN_EVERY_SECONDS = 60.0
+MAX_QUEUED_EXPLAINS = 8
+MAX_PROFILED_USERS = 10000
+
+
+def mongo_profile_enabled() -> bool:
+    """Time every MongoDB command (MONGO_PROFILE=0 turns it off)."""
+    return os.getenv("MONGO_PROFILE", "1") != "0"
+
+
+def mongo_profile_sample() -> float:
+    """Share of commands whose document bytes are counted per user; 0 (the default) counts none."""
+    return min(1.0, max(0.0, float(os.getenv("MONGO_PROFILE_SAMPLE", "0"))))
+
+
+def mongo_explain_ms() -> float:
+    """Explain commands slower than this (MONGO_EXPLAIN_MS); 0 (the default) explains none."""
+    return float(os.getenv("MONGO_EXPLAIN_MS", "0"))
+
+
+def mongo_metrics_token() -> str:
+    """Bearer token for /metrics/mongo; without one the endpoint is not served."""
+    return os.getenv("MONGO_METRICS_TOKEN", "")
+
+
+def histogram_quantile(counts: list[int], q: float) -> float:
+    """Upper bound of the bucket holding the q quantile, in ms (inf past the last)."""
+    total = sum(counts)
+    if total == 0:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS_MS + (float("inf"),), counts):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float("inf")
+
+
+class LatencyHistogram:
+    """Counts of one command's latencies per bucket, with their sum and maximum."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float, failed: bool = False):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.failures += failed
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+
+def _user_of(filter_doc) -> str | None:
+    email = filter_doc.get("user_email") if isinstance(filter_doc, dict) else None
+    return email if isinstance(email, str) else None
+
+
+def command_user(name: str, command: dict) -> str | None:
+    """The user a command reads or writes, from its filter or documents.
+
+    Every collection is keyed by user_email, so this is the first
+    statement's user_email, when it is one user's.
+    """
+    if name in ("find", "count", "distinct"):
+        return _user_of(command.get("filter", command.get("query")))
+    if name == "findAndModify":
+        return _user_of(command.get("query"))
+    if name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        return _user_of(pipeline[0].get("$match"))
+    statements = {"insert": "documents", "update": "updates", "delete": "deletes"}
+    if name in statements:
+        docs = command.get(statements[name]) or [{}]
+        return _user_of(docs[0] if name == "insert" else docs[0].get("q"))
+    return None
+
+
+def written_documents(name: str, command: dict) -> list:
+    if name == "insert":
+        return list(command.get("documents", []))
+    if name == "update":
+        return [statement.get("u", {}) for statement in command.get("updates", [])]
+    if name == "findAndModify" and isinstance(command.get("update"), dict):
+        return [command["update"]]
+    return []
+
+
+def read_documents(reply: dict) -> list:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return cursor.get("firstBatch") or cursor.get("nextBatch") or []
+    value = reply.get("value")
+    return [value] if isinstance(value, dict) else []
+
+
+def document_bytes(docs: list) -> int:
+    return sum(len(bson.encode(doc)) for doc in docs)
+
+
+def explainable(name: str, command: dict) -> dict:
+    """command as explain takes it: without session fields, one statement at most."""
+    command = {k: v for k, v in command.items() if k not in SESSION_FIELDS}
+    for field in ("updates", "deletes"):
+        if field in command:
+            command[field] = command[field][:1]
+    return command
+
+
+def command_shape(name: str, collection: str, command: dict) -> tuple:
+    """What two commands share if the same plan serves them: the fields they filter on."""
+    if name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        filter_doc = pipeline[0].get("$match", {})
+    elif name in ("update", "delete"):
+        statements = command.get(name + "s") or [{}]
+        filter_doc = statements[0].get("q", {})
+    else:
+        filter_doc = command.get("filter", command.get("query", {}))
+    keys = tuple(sorted(filter_doc)) if isinstance(filter_doc, dict) else ()
+    return name, collection, keys
+
+
+def plan_stages(plan: dict) -> str:
+    """A winning plan as its stages, outermost first, e.g. "FETCH > IXSCAN user_email"."""
+    stages = []
+    while isinstance(plan, dict):
+        stage = plan.get("stage", "?")
+        if "indexName" in plan:
+            stage += f" {plan['indexName']}"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " > ".join(stages)
+
+
+def winning_plan(explain: dict) -> dict:
+    """The winning plan of an explain, for finds and aggregations alike."""
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        for stage in explain.get("stages", []):
+            planner = stage.get("$cursor", {}).get("queryPlanner")
+            if planner is not None:
+                break
+    plan = (planner or {}).get("winningPlan", {})
+    # Slot-based engine plans keep the classic plan tree under queryPlan.
+    return plan.get("queryPlan", plan)
+
+
+class CommandProfiler(monitoring.CommandListener):
+    """Latency histograms of the MongoDB commands this worker runs.
+
+    Registered on the client, it sees every command: the histogram for the
+    command and collection costs a bucket lookup and a few additions under
+    a lock. Sampled commands (sample, 0 to 1) also count the bytes of the
+    documents they read and wrote towards their user, encoding them to
+    BSON again to measure them, scaled by 1 / sample to estimate the
+    total. Commands slower than explain_ms are explained in a background
+    thread, at most once per shape every EXPLAIN_EVERY_SECONDS, and the
+    last MAX_EXPLAINS are kept. With sampling and explains off, no command
+    is kept past its reply.
+    """
+
+    def __init__(self, sample: float = 0.0, explain_ms: float = 0.0):
+        self.sample = sample
+        self.explain_ms = explain_ms
+        self.client = None
+        self.started_at = time.time()
+        self.histograms: dict[tuple[str, str], LatencyHistogram] = {}
+        self.explains: deque[dict] = deque(maxlen=MAX_EXPLAINS)
+        self.explains_dropped = 0
+        # user -> [bytes read, bytes written, commands sampled]
+        self._users: OrderedDict[str, list[float]] = OrderedDict()
+        self._running: dict[tuple, tuple] = {}
+        self._explained_at: dict[tuple, float] = {}
+        self._explain_queue: queue.Queue = queue.Queue(MAX_QUEUED_EXPLAINS)
+        self._explain_thread = None
+        self._lock = threading.Lock()
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        name = event.command_name
+        if name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        collection = command.get("collection" if name == "getMore" else name)
+        if not isinstance(collection, str):
+            collection = ""
+        sampled = self.sample > 0 and random.random() < self.sample
+        if sampled:
+            user = command_user(name, command)
+            written = document_bytes(written_documents(name, command)) if user else 0
+        else:
+            user, written = None, 0
+        keep = command if self.explain_ms > 0 and name in EXPLAINABLE_COMMANDS else None
+        self._running[(event.connection_id, event.request_id)] = (
+            name,
+            collection,
+            event.database_name,
+            keep,
+            user,
+            written,
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        running = self._running.pop((event.connection_id, event.request_id), None)
+        if running is None:
+            return
+        name, collection, database, command, user, written = running
+        ms = event.duration_micros / 1000
+        self._record(name, collection, ms)
+        if user is not None:
+            read = document_bytes(read_documents(event.reply))
+            self._count_bytes(user, read / self.sample, written / self.sample)
+        if command is not None and ms >= self.explain_ms:
+            self._queue_explain(name, collection, database, command, ms)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        running = self._running.pop((event.connection_id, event.request_id), None)
+        if running is not None:
+            self._record(running[0], running[1], event.duration_micros / 1000, True)
+
+    def _record(self, name: str, collection: str, ms: float, failed: bool = False):
+        with self._lock:
+            histogram = self.histograms.get((name, collection))
+            if histogram is None:
+                histogram = self.histograms[(name, collection)] = LatencyHistogram()
+            histogram.add(ms, failed)
+
+    def _count_bytes(self, user: str, read: float, written: float):
+        with self._lock:
+            counts = self._users.pop(user, None) or [0.0, 0.0, 0]
+            counts[0] += read
+            counts[1] += written
+            counts[2] += 1
+            self._users[user] = counts
+            while len(self._users) > MAX_PROFILED_USERS:
+                self._users.popitem(last=False)
+
+    def _queue_explain(self, name, collection, database, command, ms):
+        shape = command_shape(name, collection, command)
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained_at.get(shape, -EXPLAIN_EVERY_SECONDS) < (
+                EXPLAIN_EVERY_SECONDS
+            ):
+                return
+            self._explained_at[shape] = now
+        try:
+            self._explain_queue.put_nowait(
+                (name, collection, database, explainable(name, command), ms)
+            )
+        except queue.Full:
+            self.explains_dropped += 1
+            return
+        if self._explain_thread is None:
+            self._explain_thread = threading.Thread(
+                target=self._explain_loop, daemon=True
+            )
+            self._explain_thread.start()
+
+    def _explain_loop(self):
+        while True:
+            name, collection, database, command, ms = self._explain_queue.get()
+            try:
+                self.explains.append(
+                    self._explain(name, collection, database, command, ms)
+                )
+            except Exception as e:
+                logging.warning(f"Could not explain a slow {name} on {collection}: {e}")
+
+    def _explain(self, name, collection, database, command, ms) -> dict:
+        explain = self.client[database].command(
+            "explain", command, verbosity="queryPlanner"
+        )
+        plan = winning_plan(explain)
+        return {
+            "command": name,
+            "collection": collection,
+            "ms": round(ms, 3),
+            "at": time.time(),
+            "shape": list(command_shape(name, collection, command)[2]),
+            "plan": plan_stages(plan),
+            "winning_plan": json.loads(json_util.dumps(plan)),
+        }
+
+    def stats(self, top_users: int = 100) -> dict:
+        """Everything recorded since the worker started, as JSON-ready data."""
+        with self._lock:
+            commands = [
+                {
+                    "command": name,
+                    "collection": collection,
+                    "count": h.count,
+                    "failures": h.failures,
+                    "total_ms": round(h.total_ms, 3),
+                    "max_ms": round(h.max_ms, 3),
+                    "buckets": list(h.counts),
+                }
+                for (name, collection), h in self.histograms.items()
+            ]
+            users = sorted(
+                self._users.items(), key=lambda u: u[1][0] + u[1][1], reverse=True
+            )[:top_users]
+            explains = list(self.explains)
+        return {
+            "since": self.started_at,
+            "sample": self.sample,
+            "explain_ms": self.explain_ms,
+            "bucket_bounds_ms": list(LATENCY_BUCKETS_MS),
+            "commands": commands,
+            "users": [
+                {
+                    "user": user,
+                    "read_bytes": round(read),
+                    "written_bytes": round(written),
+                    "sampled_commands": sampled,
+                }
+                for user, (read, written, sampled) in users
+            ],
+            "explains": explains,
+            "explains_dropped": self.explains_dropped,
+        }
+
+
+def get_command_profiler() -> CommandProfiler | None:
+    global _profiler
+    if _profiler is None and mongo_profile_enabled():
+        _profiler = CommandProfiler(mongo_profile_sample(), mongo_explain_ms())
+    return _profiler
+
+
+async def mongo_metrics(request):
+    from starlette.responses import JSONResponse
+
+    token = mongo_metrics_token()
+    given = request.headers.get("authorization", "")
+    if not hmac.compare_digest(given.encode(), f"Bearer {token}".encode()):
+        return JSONResponse({"error": "unauthorized"}, status_code=401)
+    profiler = get_command_profiler()
+    return JSONResponse(profiler.stats() if profiler is not None else {})
+
+
+def install_mongo_metrics(app) -> bool:
+    """Serve the profiler's stats at /metrics/mongo if MONGO_METRICS_TOKEN is set.
+
+    They name users and show their queries' plans, so they are only
+    served to requests bearing the token.
+    """
+    if not mongo_metrics_token() or app._api is None:
+        return False
+    from reflex.config import get_config
+
+    path = get_config().prepend_backend_path("/metrics/mongo")
+    app._api.add_route(path, mongo_metrics, methods=["GET"])
+    return True
@@ -0,0 +1,64 @@
+FREQUENCIES = {
+    "weekly": {"label": "Semanal", "per_year": 52},
+    "biweekly": {"label": "A cada 2 semanas", "per_year": 26},
+    "monthly": {"label": "Mensal", "per_year": 12},
+    "quarterly": {"label": "Trimestral", "per_year": 4},
+    "semiannual": {"label": "Semestral", "per_year": 2},
+    "annual": {"label": "Anual", "per_year": 1},
+    # Every interval_months months.
+    "custom": {"label": "Personalizada", "per_year": None},
+}
+
+# Compact items refer to their frequency by its position (see app/compact.py),
+# so new frequencies go at the end of FREQUENCIES and none is removed.
+FREQUENCY_CODES = {frequency: code for code, frequency in enumerate(FREQUENCIES)}
+FREQUENCY_NAMES = dict(enumerate(FREQUENCIES))
+
+# Recurring expenses, and the frequency of their items stored before items
+# had one: the section was all there was to say how often they recur.
+SECTION_FREQUENCIES = {
+    "monthly_expenses": "monthly",
+    "annual_expenses": "annual",
+}
+MAX_INTERVAL_MONTHS = 120
+
+
+def monthly_factor(frequency: str, interval_months: int | None = None) -> float:
+    """What an amount recurring at frequency weighs in a month."""
+    if frequency == "custom":
+        return 1 / max(1, min(int(interval_months or 1), MAX_INTERVAL_MONTHS))
+    return FREQUENCIES.get(frequency, FREQUENCIES["monthly"])["per_year"] / 12
+
+
+def section_factor(section: str) -> float:
+    """The monthly factor of a section's items that do not carry one."""
+    return monthly_factor(SECTION_FREQUENCIES.get(section, "monthly"))
+
+
+def with_recurrence(section: str, item: dict) -> dict:
+    """The item of a recurring section with its frequency and monthly factor.
+
+    The factor is worked out here, when the item is read or written, so
+    totals only multiply by it. An unknown or missing frequency is the
+    section's own; only custom frequencies keep an interval.
+    """
+    frequency = item.get("frequency", "")
+    if frequency not in FREQUENCIES:
+        frequency = SECTION_FREQUENCIES[section]
+    item["frequency"] = frequency
+    if frequency == "custom":
+        interval_months = int(item.get("interval_months") or 1)
+        item["interval_months"] = max(1, min(interval_months, MAX_INTERVAL_MONTHS))
+    else:
+        item.pop("interval_months", None)
+    item["monthly_factor"] = monthly_factor(frequency, item.get("interval_months"))
+    return item
+
+
+def without_recurrence(item: dict) -> dict:
+    """The item without its frequency, e.g. to take a new section's default."""
+    return {
+        key: value
+        for key, value in item.items()
+        if key not in ("frequency", "interval_months", "monthly_factor")
+    }
@@ -0,0 +1,170 @@
+import os
+import logging
+from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from app.database import get_ledger_collection
+from app.encryption import encrypt_value
+from app.finance_data import SECTIONS, monthly_amount, remove_op, update_op
+from app.invalidation import publish_write
+from app.key_cache import get_data_cipher
+from app.ledger import ledger_enabled, apply_ledger_ops
+from app.user_cache import get_user_cache
+
+
+def rollover_enabled() -> bool:
+    """Close each month for every user in the background (see app/scheduler.py)."""
+    return os.getenv("ROLLOVER") == "1"
+
+
+def month_key(moment: datetime | None = None) -> str:
+    moment = moment or datetime.now(timezone.utc)
+    return f"{moment.year:04d}-{moment.month:02d}"
+
+
+def previous_month(month: str) -> str:
+    year, number = (int(part) for part in month.split("-"))
+    if number == 1:
+        return f"{year - 1:04d}-12"
+    return f"{year:04d}-{number - 1:02d}"
+
+
+def dated_entries(data: dict, cipher) -> list[dict]:
+    """What each item weighed in the month being closed, amounts encrypted.
+
+    An installment paid for the last time is marked final: this entry is
+    what remains of it once the rollover archives it.
+    """
+    entries = []
+    for section in SECTIONS:
+        for item in data.get(section, []):
+            entry = {
+                "item_id": item["id"],
+                "kind": section,
+                "name": item.get("name", ""),
+                "amount": encrypt_value(monthly_amount(section, item), cipher),
+            }
+            if section != "monthly_income":
+                entry["category"] = item.get("category", "Outros")
+            if section == "installments" and item["installments_count"] <= 1:
+                entry["final"] = True
+            entries.append(entry)
+    return entries
+
+
+def installment_counts(data: dict) -> dict[str, int]:
+    return {item["id"]: item["installments_count"] for item in data["installments"]}
+
+
+def rollover_ops(data: dict, counts: dict[str, int]) -> list[dict]:
+    """Ops paying one installment of each item counted when the month closed.
+
+    Installments become what is left to pay: one fewer installment and
+    the total less one installment_value, so installment_value itself (and
+    the monthly totals) stay as they were. The last one is removed. Items
+    whose count no longer matches were already rolled over, or edited
+    since, and are left alone: running the same month twice changes
+    nothing.
+    """
+    ops = []
+    for item in data.get("installments", []):
+        count = counts.get(item["id"])
+        if count is None or item["installments_count"] != count:
+            continue
+        if count <= 1:
+            ops.append(remove_op("installments", item["id"]))
+            continue
+        remaining = round(item["total_amount"] - item["installment_value"], 2)
+        ops.append(
+            update_op(
+                "installments",
+                {**item, "installments_count": count - 1, "total_amount": remaining},
+            )
+        )
+    return ops
+
+
+def begin_rollover(
+    collection, email: str, month: str, entries: list[dict], counts: dict
+) -> dict:
+    """The user's record for month, created with entries and counts if new.
+
+    A rerun after a crash gets the first run's record back, so it works
+    from the same counts.
+    """
+    return collection.find_one_and_update(
+        {"user_email": email, "month": month},
+        {
+            "$setOnInsert": {
+                "entries": entries,
+                "counts": counts,
+                "done": False,
+            }
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def finish_rollover(collection, email: str, month: str):
+    collection.update_one(
+        {"user_email": email, "month": month}, {"$set": {"done": True}}
+    )
+
+
+def rolled_over(collection, emails: list[str], month: str) -> set[str]:
+    """Which of emails are done with month."""
+    return {
+        doc["user_email"]
+        for doc in collection.find(
+            {"user_email": {"$in": emails}, "month": month, "done": True},
+            {"user_email": 1},
+        )
+    }
+
+
+def user_emails(collection, after: str, limit: int) -> list[str]:
+    """Up to limit user emails following after, in order."""
+    return [
+        doc["user_email"]
+        for doc in collection.find({"user_email": {"$gt": after}}, {"user_email": 1})
+        .sort("user_email", 1)
+        .limit(limit)
+    ]
+
+
+def rollover_user(store, email: str, month: str) -> bool:
+    """Close month for one user; False if it already was (or there is no data).
+
+    The record is written before the installments are touched and marked
+    done after, so an interrupted rollover resumes from the same counts.
+    A document from before per-user data keys is given one first, by an
+    empty save, the way a save by its user would.
+    """
+    data = store.load(email)
+    if data is None:
+        return False
+    if not data.get("data_key"):
+        logging.info(f"Creating a data key for {email} before rolling over {month}")
+        data["data_key"] = store.save_ops(email, [])["data_key"]
+        publish_write(email)
+        get_user_cache().invalidate(email)
+    cipher = get_data_cipher(data["data_key"])
+    record = store.begin_rollover(
+        email, month, dated_entries(data, cipher), installment_counts(data)
+    )
+    if record.get("done"):
+        return False
+    ops = rollover_ops(data, record["counts"])
+    if ops:
+        header = store.save_ops(email, ops)
+        publish_write(email)
+        get_user_cache().invalidate(email)
+        ledger = get_ledger_collection() if ledger_enabled() else None
+        if ledger is not None:
+            try:
+                apply_ledger_ops(ledger, email, ops, header["version"])
+            except Exception as e:
+                logging.exception(f"Error updating ledger for {email}: {e}")
+                ledger.delete_many({"user_email": email})
+    store.finish_rollover(email, month)
+    return True
@@ -0,0 +1,79 @@
+import os
+import asyncio
+import logging
+from app.rollover import month_key, previous_month, rollover_user
+from app.storage import get_store
+
+
+def rollover_batch() -> int:
+    """How many users are listed, and checked for being done, per query."""
+    return int(os.getenv("ROLLOVER_BATCH", "500"))
+
+
+def rollover_concurrency() -> int:
+    """How many users are rolled over at once."""
+    return int(os.getenv("ROLLOVER_CONCURRENCY", "8"))
+
+
+def rollover_check_seconds() -> float:
+    return float(os.getenv("ROLLOVER_CHECK_SECONDS", "3600"))
+
+
+async def run_rollover(
+    store, month: str, batch: int = 500, concurrency: int = 8
+) -> dict[str, int]:
+    """Close month for every user of store, in email order.
+
+    Users already done are skipped a batch at a time, so an interrupted run
+    resumes where it stopped by starting over. Store calls block, so they
+    run in threads, at most concurrency of them at once. Returns how many
+    users were rolled over, skipped and failed; failures are retried on
+    the next run.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"rolled": 0, "skipped": 0, "failed": 0}
+
+    async def roll(email: str):
+        async with semaphore:
+            try:
+                rolled = await asyncio.to_thread(rollover_user, store, email, month)
+            except Exception as e:
+                logging.exception(f"Error rolling over {month} for {email}: {e}")
+                counts["failed"] += 1
+                return
+        counts["rolled" if rolled else "skipped"] += 1
+
+    after = ""
+    while True:
+        emails = await asyncio.to_thread(store.user_emails, after, batch)
+        if not emails:
+            return counts
+        done = await asyncio.to_thread(store.rolled_over, emails, month)
+        counts["skipped"] += len(done)
+        await asyncio.gather(*(roll(email) for email in emails if email not in done))
+        after = emails[-1]
+
+
+async def rollover_loop():
+    """Lifespan task closing the month that just ended, for every user.
+
+    Checks every ROLLOVER_CHECK_SECONDS, so a month is closed within that
+    long of its end, and on startup, which also finishes a run a restart
+    interrupted. Every worker runs it: rollovers are idempotent, so workers
+    racing on a user write the same result.
+    """
+    closed = None
+    while True:
+        month = previous_month(month_key())
+        store = get_store() if month != closed else None
+        if store is not None:
+            try:
+                counts = await run_rollover(
+                    store, month, rollover_batch(), rollover_concurrency()
+                )
+                logging.info(f"Rollover of {month}: {counts}")
+                if not counts["failed"]:
+                    closed = month
+            except Exception as e:
+                logging.exception(f"Error running rollover of {month}: {e}")
+        await asyncio.sleep(rollover_check_seconds())
@@ -0,0 +1,266 @@
+import os
+import re
+import heapq
+import bisect
+import threading
+import unicodedata
+from itertools import islice
+from collections import OrderedDict
+from app.categories import with_parents
+from app.finance_data import SECTIONS
+
+_indexes = None
+
+SORTS = ("amount_desc", "amount_asc", "name", "category")
+
+# Query words up to this long are looked up in precomputed prefix postings;
+# their ranges of indexed words are the widest, too costly to union per query.
+SHORT_PREFIX = 2
+
+_WORD = re.compile(r"\w+")
+_EMPTY: frozenset[str] = frozenset()
+
+
+def normalize(text: str) -> str:
+    """Lowercase without accents, so "saude" finds "Saúde"."""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(normalize(text))
+
+
+def item_amount(section: str, item: dict) -> float:
+    """The amount the lists show for an item."""
+    if section == "installments":
+        return item["installment_value"]
+    return item["amount"]
+
+
+def _prefixes(words: set[str]) -> set[str]:
+    return {word[:n] for word in words for n in range(1, SHORT_PREFIX + 1)}
+
+
+class SearchIndex:
+    """Inverted index over one session's items, by words of name and category.
+
+    A query word matches every indexed word it is a prefix of: the distinct
+    words are kept sorted, so their range is found by bisection. Each sort
+    order is kept as a sorted list too, so a query matching many items reads
+    its first results off it instead of sorting the matches. An add or a
+    remove costs O(log n) comparisons plus a list insertion or deletion.
+    Items are also posted under each word's first SHORT_PREFIX characters,
+    so one- and two-letter query words cost a lookup.
+    """
+
+    def __init__(self, stamp: str = ""):
+        self.stamp = stamp
+        # id -> (section, item, words, sort keys)
+        self.entries: dict[str, tuple[str, dict, set[str], dict]] = {}
+        self.postings: dict[str, set[str]] = {}
+        self.short: dict[str, set[str]] = {}
+        self.words: list[str] = []
+        self.by_category: dict[str, set[str]] = {}
+        self.orders: dict[str, list[tuple]] = {sort: [] for sort in SORTS}
+        # The ids of each order, walked without unpacking its keys.
+        self.order_ids: dict[str, list[str]] = {sort: [] for sort in SORTS}
+
+    @classmethod
+    def build(cls, data: dict, stamp: str = "") -> "SearchIndex":
+        """Index data at once, sorting each list once rather than per item."""
+        index = cls(stamp)
+        for section in SECTIONS:
+            for item in data.get(section, []):
+                words, keys = index._enter(section, item)
+                for word in words:
+                    index.postings.setdefault(word, set()).add(item["id"])
+                for sort, key in keys.items():
+                    index.orders[sort].append(key)
+        index.words = sorted(index.postings)
+        for sort, order in index.orders.items():
+            order.sort()
+            index.order_ids[sort] = [key[-1] for key in order]
+        return index
+
+    def _enter(self, section: str, item: dict) -> tuple[set[str], dict]:
+        # A copy, so what is removed later is what was added.
+        item = dict(item)
+        name = normalize(item.get("name", ""))
+        category = item.get("category", "")
+        words = set(_WORD.findall(name)) | set(tokenize(category))
+        amount = item_amount(section, item)
+        keys = {
+            "amount_desc": (-amount, name, item["id"]),
+            "amount_asc": (amount, name, item["id"]),
+            "name": (name, item["id"]),
+            "category": (normalize(category), -amount, item["id"]),
+        }
+        self.entries[item["id"]] = (section, item, words, keys)
+        # Under its category and every one above it, so filtering by a
+        # category finds the items of those below it too.
+        for node in with_parents(category):
+            self.by_category.setdefault(node, set()).add(item["id"])
+        for prefix in _prefixes(words):
+            self.short.setdefault(prefix, set()).add(item["id"])
+        return words, keys
+
+    def add(self, section: str, item: dict):
+        item_id = item["id"]
+        if item_id in self.entries:
+            self.remove(item_id)
+        words, keys = self._enter(section, item)
+        for word in words:
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                bisect.insort(self.words, word)
+            ids.add(item_id)
+        for sort, key in keys.items():
+            order = self.orders[sort]
+            position = bisect.bisect_left(order, key)
+            order.insert(position, key)
+            self.order_ids[sort].insert(position, item_id)
+
+    def remove(self, item_id: str):
+        entry = self.entries.pop(item_id, None)
+        if entry is None:
+            return
+        _, item, words, keys = entry
+        for word in words:
+            ids = self.postings[word]
+            ids.discard(item_id)
+            if not ids:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+        for node in with_parents(item.get("category", "")):
+            self.by_category[node].discard(item_id)
+        for prefix in _prefixes(words):
+            ids = self.short[prefix]
+            ids.discard(item_id)
+            if not ids:
+                del self.short[prefix]
+        for sort, key in keys.items():
+            order = self.orders[sort]
+            position = bisect.bisect_left(order, key)
+            del order[position]
+            del self.order_ids[sort][position]
+
+    def _range(self, prefix: str) -> tuple[int, int]:
+        start = bisect.bisect_left(self.words, prefix)
+        return start, bisect.bisect_left(self.words, prefix + "\U0010ffff", start)
+
+    def _prefix(self, start: int, end: int) -> set[str]:
+        if end - start == 1:
+            return self.postings[self.words[start]]
+        matches = set()
+        for word in self.words[start:end]:
+            matches |= self.postings[word]
+        return matches
+
+    def _matching(self, candidates: set[str], prefix: str) -> set[str]:
+        return {
+            i
+            for i in candidates
+            if any(word.startswith(prefix) for word in self.entries[i][2])
+        }
+
+    def search(
+        self, query: str = "", category: str = "", sort: str = "amount_desc", limit=100
+    ) -> tuple[int, list[tuple[str, dict]]]:
+        """How many items match, and the first limit of them as (section, item).
+
+        Every word of the query must prefix a word of the item's name or
+        category; an empty query matches everything.
+        """
+        candidates = None
+        if category:
+            candidates = self.by_category.get(category, set())
+        # Short words are one lookup each; the others go fewest indexed
+        # words first, since a prefix spanning many of them is cheaper to
+        # check on the few candidates left.
+        words = set(tokenize(query))
+        lookups = sorted(
+            (
+                self.short.get(word, _EMPTY)
+                for word in words
+                if len(word) <= SHORT_PREFIX
+            ),
+            key=len,
+        )
+        for ids in lookups:
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return 0, []
+        ranges = sorted(
+            (self._range(word) + (word,) for word in words if len(word) > SHORT_PREFIX),
+            key=lambda r: r[1] - r[0],
+        )
+        for start, end, word in ranges:
+            if candidates is not None and len(candidates) < end - start:
+                candidates = self._matching(candidates, word)
+            else:
+                ids = self._prefix(start, end)
+                candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return 0, []
+        sort = sort if sort in SORTS else "amount_desc"
+        order_ids = self.order_ids[sort]
+        if candidates is None:
+            ids = order_ids[:limit]
+        elif len(candidates) ** 2 > limit * len(order_ids):
+            # Walking the presorted order finds limit matches in about
+            # limit * n / matches steps, fewer than sorting the matches.
+            ids = list(islice(filter(candidates.__contains__, order_ids), limit))
+        else:
+            keys = heapq.nsmallest(
+                limit, (self.entries[i][3][sort] for i in candidates)
+            )
+            ids = [key[-1] for key in keys]
+        total = len(self.entries) if candidates is None else len(candidates)
+        return total, [self.entries[i][:2] for i in ids]
+
+
+class SessionIndexes:
+    """In-memory indexes of the sessions served by this worker, LRU-bounded.
+
+    State is pickled between events, so indexes over a session's lists live
+    here, keyed by its client token and stamped with the version of the
+    lists they hold. They are built on first use and kept up to date by
+    the session's handlers; a session whose index was evicted, or built on
+    another worker, gets a new one from its lists.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, object] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str, stamp: str):
+        """The session's index, if it is the one stamped stamp."""
+        with self._lock:
+            index = self._entries.get(token)
+            if index is None or index.stamp != stamp:
+                return None
+            self._entries.move_to_end(token)
+            return index
+
+    def put(self, token: str, index):
+        with self._lock:
+            self._entries[token] = index
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+
+def get_search_indexes() -> SessionIndexes:
+    global _indexes
+    if _indexes is None:
+        _indexes = SessionIndexes(int(os.getenv("SEARCH_INDEX_SESSIONS", "1000")))
+    return _indexes
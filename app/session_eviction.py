@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from reflex.middleware import Middleware
+from reflex.istate.manager.disk import StateManagerDisk
+from reflex.istate.manager.memory import StateManagerMemory
+from reflex.istate.manager.token import BaseStateToken
+from app.finance_data import SECTIONS
+from app.states.finance_state import FinanceState
+
+_evictor = None
+
+
+def session_idle_seconds() -> float:
+    """Drop the lists of sessions idle this long; 0 (the default) never does."""
+    return float(os.getenv("SESSION_IDLE_SECONDS", "0"))
+
+
+def session_memory_bytes() -> int:
+    """Past this resident size (SESSION_MEMORY_MB), drop the idlest sessions' lists."""
+    return int(float(os.getenv("SESSION_MEMORY_MB", "0")) * 1024 * 1024)
+
+
+def session_min_idle_seconds() -> float:
+    """Sessions idle for less than this are kept even past the memory watermark."""
+    return float(os.getenv("SESSION_MIN_IDLE_SECONDS", "60"))
+
+
+def session_check_seconds() -> float:
+    return float(os.getenv("SESSION_CHECK_SECONDS", "30"))
+
+
+def resident_bytes() -> int | None:
+    """This process's resident set size, where /proc has it."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def deep_size(value, seen: set[int] | None = None) -> int:
+    """Approximate bytes held by value and everything it contains, once each."""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(deep_size(item, seen) for item in value)
+    return size
+
+
+def session_footprint(finance: FinanceState) -> int:
+    """Approximate bytes of a session's lists and the computed vars cached on it."""
+    seen = set()
+    size = sum(deep_size(finance.__dict__.get(section), seen) for section in SECTIONS)
+    for var in finance.computed_vars.values():
+        size += deep_size(finance.__dict__.get(var._cache_attr), seen)
+    return size
+
+
+# State managers keeping every session's state in the worker between events;
+# the disk manager keeps them in memory too, pickling them only as a backup.
+IN_PROCESS_MANAGERS = (StateManagerMemory, StateManagerDisk)
+
+
+class SessionEvictor:
+    """Drops the lists of idle sessions kept in the worker's state manager.
+
+    Sessions are tracked in the order of their last event. A session idle
+    for idle seconds has its lists dropped (see FinanceState._evict); so
+    do the idlest sessions, oldest first, while the worker's resident size
+    is over memory bytes, counting what each one held. Either limit can be
+    0 to turn it off. The next event of an evicted session puts its lists
+    back first (see SessionActivity).
+    """
+
+    def __init__(self, idle: float, memory: int, min_idle: float = 60.0):
+        self.idle = idle
+        self.memory = memory
+        self.min_idle = min_idle
+        self.evictions = 0
+        self.rehydrations = 0
+        self.bytes_dropped = 0
+        self.last_seen: OrderedDict[str, float] = OrderedDict()
+        self.evicted: set[str] = set()
+
+    def touch(self, token: str):
+        self.last_seen[token] = time.monotonic()
+        self.last_seen.move_to_end(token)
+
+    def _due(self, idle: float, excess: int) -> bool:
+        if idle < self.min_idle:
+            return False
+        return excess > 0 or (self.idle > 0 and idle >= self.idle)
+
+    async def run(self, manager) -> int:
+        """Evict the sessions due; returns how many were."""
+        if not isinstance(manager, IN_PROCESS_MANAGERS):
+            return 0
+        now = time.monotonic()
+        rss = resident_bytes() if self.memory else None
+        excess = rss - self.memory if rss is not None else 0
+        evicted = 0
+        for token, seen in list(self.last_seen.items()):
+            if token not in manager.states:
+                # Expired by the state manager itself.
+                del self.last_seen[token]
+                self.evicted.discard(token)
+                continue
+            if not self._due(now - seen, excess):
+                break
+            if token in self.evicted:
+                continue
+            dropped = await self.evict(manager, token)
+            if dropped is not None:
+                excess -= dropped
+                evicted += 1
+        return evicted
+
+    async def evict(self, manager, token: str) -> int | None:
+        """Evict one session; the bytes it held, or None if it was kept."""
+        async with manager.modify_state(
+            BaseStateToken(ident=token, cls=FinanceState)
+        ) as root:
+            finance = await root.get_state(FinanceState)
+            size = session_footprint(finance)
+            if not finance._evict():
+                return None
+        self.evicted.add(token)
+        self.evictions += 1
+        self.bytes_dropped += size
+        return size
+
+
+class SessionActivity(Middleware):
+    """Notes each session's events, and rehydrates evicted sessions first."""
+
+    def __init__(self, evictor: SessionEvictor):
+        self.evictor = evictor
+
+    async def preprocess(self, app, state, event):
+        token = state.router.session.client_token
+        self.evictor.touch(token)
+        if token in self.evictor.evicted:
+            finance = await state.get_state(FinanceState)
+            if finance._evicted:
+                await finance._rehydrate()
+                self.evictor.rehydrations += 1
+            self.evictor.evicted.discard(token)
+        return None
+
+
+def get_session_evictor() -> SessionEvictor:
+    global _evictor
+    if _evictor is None:
+        _evictor = SessionEvictor(
+            session_idle_seconds(), session_memory_bytes(), session_min_idle_seconds()
+        )
+    return _evictor
+
+
+async def eviction_loop(app):
+    """Lifespan task running the evictor every SESSION_CHECK_SECONDS."""
+    evictor = get_session_evictor()
+    while True:
+        await asyncio.sleep(session_check_seconds())
+        try:
+            evicted = await evictor.run(app.state_manager)
+            if evicted:
+                logging.info(
+                    f"Evicted {evicted} idle sessions ({evictor.evictions} so far,"
+                    f" {evictor.bytes_dropped / 1e6:.1f} MB dropped)"
+                )
+        except Exception as e:
+            logging.exception(f"Error evicting idle sessions: {e}")
+
+
+def install_session_eviction(app) -> SessionEvictor | None:
+    """Evict idle sessions if SESSION_IDLE_SECONDS or SESSION_MEMORY_MB is set.
+
+    Only the memory and disk state managers keep every session's state in
+    the worker; with Redis, states already leave it between events.
+    """
+    evictor = get_session_evictor()
+    if evictor.idle <= 0 and evictor.memory <= 0:
+        return None
+    app.add_middleware(SessionActivity(evictor))
+    app.register_lifespan_task(eviction_loop)
+    return evictor
@@ -0,0 +1,311 @@
+import os
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from app.categories import CATEGORY_SEPARATOR
+from app.change_log import COMPACT_EVERY, change_log_keep, covers
+from app.encryption import create_data_key
+from app.finance_data import (
+    SECTIONS,
+    ENCRYPTORS,
+    DECRYPTORS,
+    copy_data,
+    empty_data,
+    encrypt_op,
+    decrypt_op,
+)
+from app.key_cache import get_data_cipher
+
+_store = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_email TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    data_key TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    user_email TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    category TEXT,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (user_email, item_id)
+);
+CREATE INDEX IF NOT EXISTS items_by_kind ON items (user_email, kind, category);
+CREATE TABLE IF NOT EXISTS changes (
+    user_email TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    ops TEXT NOT NULL,
+    PRIMARY KEY (user_email, seq)
+);
+CREATE TABLE IF NOT EXISTS rollovers (
+    user_email TEXT NOT NULL,
+    month TEXT NOT NULL,
+    entries TEXT NOT NULL,
+    counts TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_email, month)
+);
+CREATE TABLE IF NOT EXISTS categories (
+    user_email TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (user_email, path)
+);
+"""
+
+
+class SqliteStore:
+    """Embedded storage in one SQLite file, for single-node installs and tests.
+
+    Same interface and encryption as the MongoDB stores, with the items
+    layout: one row per item, amounts encrypted with the user's data key
+    inside a JSON column. WAL mode lets readers run alongside the writer,
+    and synchronous=NORMAL (SQLITE_SYNCHRONOUS) skips the fsync per commit:
+    a power loss can drop the last commits, an application crash cannot.
+    Saves run in one transaction, so unlike MongoDB no merge is ever partial,
+    and each is appended to the user's change log in the same transaction.
+    """
+
+    def __init__(self, path: str, synchronous: str = "NORMAL"):
+        if synchronous.upper() not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError(f"Invalid SQLite synchronous mode '{synchronous}'")
+        self.path = path
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connection()
+        # IMMEDIATE takes the write lock up front, so the version read in
+        # the transaction is still current when it commits.
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _header(self, db, email: str) -> dict | None:
+        row = db.execute(
+            "SELECT version, data_key FROM users WHERE user_email = ?", (email,)
+        ).fetchone()
+        return {"version": row[0], "data_key": row[1]} if row else None
+
+    def _load(self, db, email, header, sections=SECTIONS, fields=None, page=None):
+        cipher = get_data_cipher(header["data_key"])
+        data = empty_data()
+        for section in sections:
+            query = (
+                "SELECT item_id, doc FROM items"
+                " WHERE user_email = ? AND kind = ? ORDER BY rowid"
+            )
+            params = [email, section]
+            if page:
+                query += " LIMIT ? OFFSET ?"
+                params += [page[1], page[0]]
+            for item_id, doc in db.execute(query, params):
+                stored = json.loads(doc)
+                if fields:
+                    stored = {key: stored[key] for key in fields if key in stored}
+                stored["id"] = item_id
+                data[section].append(DECRYPTORS[section](stored, cipher))
+        data["version"] = header["version"]
+        data["data_key"] = header["data_key"]
+        return data
+
+    def load(self, email: str) -> dict | None:
+        return self.load_partial(email)
+
+    def load_partial(self, email: str, sections=SECTIONS, fields=None, page=None):
+        db = self._connection()
+        # One read transaction, so the header and items agree.
+        db.execute("BEGIN")
+        try:
+            header = self._header(db, email)
+            if header is None:
+                return None
+            return self._load(db, email, header, sections, fields, page)
+        finally:
+            db.execute("COMMIT")
+
+    def _write(self, db, email: str, ops: list[dict], cipher):
+        for op in ops:
+            if op["op"] == "remove":
+                db.execute(
+                    "DELETE FROM items WHERE user_email = ? AND item_id = ?",
+                    (email, op["id"]),
+                )
+                continue
+            stored = ENCRYPTORS[op["section"]](op["item"], cipher)
+            item_id = stored.pop("id")
+            params = (
+                json.dumps(stored),
+                stored.get("category"),
+                email,
+                item_id,
+                op["section"],
+            )
+            # Like apply_ops: adds are idempotent, and an update to an item
+            # someone else removed is dropped.
+            if op["op"] == "add":
+                db.execute(
+                    "INSERT INTO items (doc, category, user_email, item_id, kind)"
+                    " VALUES (?, ?, ?, ?, ?) ON CONFLICT DO NOTHING",
+                    params,
+                )
+            else:
+                db.execute(
+                    "UPDATE items SET doc = ?, category = ?"
+                    " WHERE user_email = ? AND item_id = ? AND kind = ?",
+                    params,
+                )
+
+    def _save(self, db, email: str, ops: list[dict], data_key: str | None) -> dict:
+        header = self._header(db, email)
+        if header is None:
+            header = {"version": 0, "data_key": data_key or create_data_key()}
+            db.execute(
+                "INSERT INTO users (user_email, version, data_key) VALUES (?, 0, ?)",
+                (email, header["data_key"]),
+            )
+        cipher = get_data_cipher(header["data_key"])
+        self._write(db, email, ops, cipher)
+        db.execute(
+            "UPDATE users SET version = version + 1 WHERE user_email = ?", (email,)
+        )
+        seq = header["version"] + 1
+        db.execute(
+            "INSERT INTO changes (user_email, seq, ops) VALUES (?, ?, ?)",
+            (email, seq, json.dumps([encrypt_op(op, cipher) for op in ops])),
+        )
+        if seq % COMPACT_EVERY == 0:
+            db.execute(
+                "DELETE FROM changes WHERE user_email = ? AND seq <= ?",
+                (email, seq - change_log_keep()),
+            )
+        return {**header, "version": seq}
+
+    def save_ops(self, email: str, ops: list[dict]) -> dict:
+        with self._transaction() as db:
+            return self._save(db, email, ops, None)
+
+    def save(self, email: str, data: dict, ops: list[dict]):
+        """Apply this session's ops; returns the same as save_user_data."""
+        with self._transaction() as db:
+            header = self._save(db, email, ops, data.get("data_key"))
+            expected = data.get("version", 0) + 1
+            data_key = data.get("data_key")
+            if header["version"] != expected or header["data_key"] != data_key:
+                return self._load(db, email, header), True
+        saved = copy_data(data)
+        saved["version"] = header["version"]
+        return saved, False
+
+    def changes_since(self, email: str, seq: int) -> dict | None:
+        db = self._connection()
+        db.execute("BEGIN")
+        try:
+            header = self._header(db, email)
+            if header is None or seq > header["version"]:
+                return None
+            rows = db.execute(
+                "SELECT seq, ops FROM changes"
+                " WHERE user_email = ? AND seq > ? AND seq <= ? ORDER BY seq",
+                (email, seq, header["version"]),
+            ).fetchall()
+        finally:
+            db.execute("COMMIT")
+        if not covers([row[0] for row in rows], seq, header["version"]):
+            return None
+        cipher = get_data_cipher(header["data_key"])
+        ops = [decrypt_op(op, cipher) for _, ops in rows for op in json.loads(ops)]
+        return {**header, "ops": ops}
+
+    def user_emails(self, after: str, limit: int) -> list[str]:
+        rows = self._connection().execute(
+            "SELECT user_email FROM users WHERE user_email > ?"
+            " ORDER BY user_email LIMIT ?",
+            (after, limit),
+        )
+        return [row[0] for row in rows]
+
+    def rolled_over(self, emails: list[str], month: str) -> set[str]:
+        marks = ", ".join("?" * len(emails))
+        rows = self._connection().execute(
+            f"SELECT user_email FROM rollovers WHERE month = ? AND done = 1"
+            f" AND user_email IN ({marks})",
+            (month, *emails),
+        )
+        return {row[0] for row in rows}
+
+    def begin_rollover(self, email: str, month: str, entries, counts) -> dict:
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO rollovers (user_email, month, entries, counts)"
+                " VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING",
+                (email, month, json.dumps(entries), json.dumps(counts)),
+            )
+            row = db.execute(
+                "SELECT entries, counts, done FROM rollovers"
+                " WHERE user_email = ? AND month = ?",
+                (email, month),
+            ).fetchone()
+        return {
+            "user_email": email,
+            "month": month,
+            "entries": json.loads(row[0]),
+            "counts": json.loads(row[1]),
+            "done": bool(row[2]),
+        }
+
+    def finish_rollover(self, email: str, month: str):
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE rollovers SET done = 1 WHERE user_email = ? AND month = ?",
+                (email, month),
+            )
+
+    def load_categories(self, email: str) -> list[str]:
+        rows = self._connection().execute(
+            "SELECT path FROM categories WHERE user_email = ? ORDER BY path", (email,)
+        )
+        return [row[0] for row in rows]
+
+    def add_category(self, email: str, category: str):
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO categories (user_email, path) VALUES (?, ?)",
+                (email, category),
+            )
+
+    def remove_category(self, email: str, category: str):
+        below = category + CATEGORY_SEPARATOR
+        with self._transaction() as db:
+            db.execute(
+                "DELETE FROM categories WHERE user_email = ?"
+                " AND (path = ? OR substr(path, 1, ?) = ?)",
+                (email, category, len(below), below),
+            )
+
+
+def get_sqlite_store() -> SqliteStore:
+    global _store
+    if _store is None:
+        _store = SqliteStore(
+            os.getenv("SQLITE_PATH", "finance.db"),
+            os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        )
+    return _store
@@ -1,6 +1,11 @@
 import reflex as rx
 from reflex_google_auth import GoogleAuthState
+from app.fake_tokens import install_fake_token_verifier
+from app.token_cache import install_token_cache
+
+install_token_cache()
+install_fake_token_verifier()
 
 
 class AuthState(GoogleAuthState):
-    pass
\ No newline at end of file
+    pass
@@ -1,71 +1,116 @@
+import os
+import math
+import random
+import asyncio
 import reflex as rx
 import logging
 from typing import TypedDict
-from app.database import get_user_collection
-from app.encryption import encrypt_value, decrypt_value, is_using_temp_key
-
-CATEGORY_DEFINITIONS = {
-    "Moradia": {
-        "icon": "home",
-        "hex": "#3b82f6",
-        "color_cls": "bg-blue-100 text-blue-700 border-blue-200",
-    },
-    "Transporte": {
-        "icon": "car",
-        "hex": "#6366f1",
-        "color_cls": "bg-indigo-100 text-indigo-700 border-indigo-200",
-    },
-    "Alimentação": {
-        "icon": "utensils",
-        "hex": "#22c55e",
-        "color_cls": "bg-green-100 text-green-700 border-green-200",
-    },
-    "Saúde": {
-        "icon": "heart-pulse",
-        "hex": "#ef4444",
-        "color_cls": "bg-red-100 text-red-700 border-red-200",
-    },
-    "Educação": {
-        "icon": "graduation-cap",
-        "hex": "#eab308",
-        "color_cls": "bg-yellow-100 text-yellow-700 border-yellow-200",
-    },
-    "Lazer": {
-        "icon": "gamepad-2",
-        "hex": "#a855f7",
-        "color_cls": "bg-purple-100 text-purple-700 border-purple-200",
-    },
-    "Comunicação": {
-        "icon": "radio",
-        "hex": "#00ff04",
-        "color_cls": "bg-lime-100 text-lime-700 border-lime-200",
-    },
-    "Despesas pessoais": {
-        "icon": "user",
-        "hex": "#ec4899",
-        "color_cls": "bg-pink-100 text-pink-700 border-pink-200",
-    },
-    "Outros": {
-        "icon": "circle-help",
-        "hex": "#6b7280",
-        "color_cls": "bg-gray-100 text-gray-700 border-gray-200",
-    },
+from app.client_snapshot import (
+    client_snapshots_enabled,
+    encode_snapshot,
+    decode_snapshot,
+)
+from app.database import get_ledger_collection
+from app.encryption import is_using_temp_key
+from app.finance_data import (
+    SECTIONS,
+    empty_data,
+    new_item_id,
+    add_op,
+    update_op,
+    remove_op,
+    apply_ops,
+    bulk_remove_ops,
+    bulk_update_ops,
+    bulk_move_ops,
+    summarize,
+    adjust_summary,
+)
+from app.invalidation import publish_write
+from app.search_index import SORTS, SearchIndex, get_search_indexes, item_amount
+from app.anomalies import ExpenseIndex, get_expense_indexes, is_outlier
+from app.ledger import (
+    ledger_enabled,
+    ensure_ledger,
+    ledger_version,
+    apply_ledger_ops,
+    aggregate_summary,
+)
+from app.storage import SUMMARY_FIELDS, get_store
+from app.user_cache import get_user_cache
+from app.validation import (
+    ValidationError,
+    format_amount,
+    parse_category_name,
+    parse_form,
+)
+from app.categories import (
+    CATEGORY_DEFINITIONS,
+    CATEGORY_SEPARATOR,
+    MAX_CATEGORY_DEPTH,
+    MAX_USER_CATEGORIES,
+    all_categories,
+    category_children,
+    category_label,
+    category_parts,
+    category_shades,
+    category_tree,
+)
+from app.write_limits import (
+    QUEUE_RETRY_SECONDS,
+    WriteQueueFull,
+    get_rate_limiter,
+    get_write_queue,
+)
+
+SECTION_PAGE_SIZE = 50
+# Lists with multi-select, and where a bulk move sends their items.
+MOVE_TARGETS = {
+    "monthly_expenses": "annual_expenses",
+    "annual_expenses": "monthly_expenses",
+}
+EDIT_SECTIONS = {
+    "income": "monthly_income",
+    "monthly_expense": "monthly_expenses",
+    "annual_expense": "annual_expenses",
+    "installment": "installments",
 }
-CATEGORIES = list(CATEGORY_DEFINITIONS.keys())
+
+
+def _edit_data(item: dict) -> dict:
+    """An item with its amounts written the way the edit form parses them."""
+    return {
+        key: format_amount(value) if key in ("amount", "total_amount") else value
+        for key, value in item.items()
+    }
+
+
+def lazy_sections_enabled() -> bool:
+    """Load only the totals up front, and each section's items when shown.
+
+    For users with many items: the lists are fetched a page at a time.
+    """
+    return os.getenv("LAZY_SECTIONS") == "1"
 
 
 class IncomeItem(TypedDict):
+    id: str
     name: str
     amount: float
 
 
 class ExpenseItem(TypedDict):
+    id: str
     name: str
     amount: float
     category: str
+    # See app/recurrence.py; custom frequencies also have interval_months.
+    frequency: str
+    monthly_factor: float
 
 
 class InstallmentItem(TypedDict):
+    id: str
     name: str
     total_amount: float
     installments_count: int
@@ -73,29 +118,88 @@ class InstallmentItem(TypedDict):
     category: str
 
 
+class SearchResult(TypedDict):
+    id: str
+    section: str
+    name: str
+    category: str
+    amount: float
+
+
+class ExpenseAlert(TypedDict):
+    id: str
+    section: str
+    name: str
+    category: str
+    amount: float
+    reason: str
+
+
 class FinanceState(rx.State):
     monthly_income: list[IncomeItem] = []
     monthly_expenses: list[ExpenseItem] = []
     annual_expenses: list[ExpenseItem] = []
     installments: list[InstallmentItem] = []
+    _version: int = 0
+    _data_key: str = ""
+    _pending_ops: list[dict] = []
+    # Changes kept in _pending_ops by a full write queue, until save_pending.
+    saving_later: bool = False
+    _save_scheduled: bool = False
+    # Whose data the lists hold, once loaded in full.
+    _loaded_email: str = ""
+    # The lists were dropped while the session sat idle (see _evict).
+    _evicted: bool = False
 
-    @rx.var
+    _summary: dict = {}
+
+    # The user's own categories, below the built-in ones (app/categories.py).
+    user_categories: list[str] = []
+    # The category whose subcategories the pie shows; "" for the built-in ones.
+    pie_category: str = ""
+
+    # Lazy mode: the lists hold only the pages fetched so far.
+    section_has_more: dict[str, bool] = {}
+    _partial: bool = False
+    _requested_sections: list[str] = []
+    _section_offsets: dict[str, int] = {}
+
+    # Encrypted copy of the data kept in the browser (see client_snapshot.py),
+    # the version it holds, and whether it was written since the last load.
+    offline_snapshot: str = rx.LocalStorage("", name="finance_snapshot")
+    _snapshot_version: int = -1
+    _snapshot_written: bool = False
+
+    # Ids of the items ticked for a bulk action (see MOVE_TARGETS).
+    selected_ids: list[str] = []
+
+    search_query: str = ""
+    search_category: str = ""
+    search_sort: str = "amount_desc"
+    # Which version of the lists this session's search and expense indexes
+    # hold; changed with every change to them (see app/search_index.py).
+    _index_stamp: str = ""
+
+    # The totals are uncached: Reflex recomputes them for every delta, which
+    # is cheap, and leaves out those whose value did not change since it was
+    # last sent, e.g. the income totals when an expense is added.
+    @rx.var(cache=False)
     def total_monthly_income(self) -> float:
-        return sum((item["amount"] for item in self.monthly_income))
+        return self._summary.get("totals", {}).get("monthly_income", 0.0)
 
-    @rx.var
+    @rx.var(cache=False)
     def total_monthly_expenses(self) -> float:
-        return sum((item["amount"] for item in self.monthly_expenses))
+        return self._summary.get("totals", {}).get("monthly_expenses", 0.0)
 
-    @rx.var
+    @rx.var(cache=False)
     def total_annual_expenses_monthly(self) -> float:
-        return sum((item["amount"] for item in self.annual_expenses)) / 12
+        return self._summary.get("totals", {}).get("annual_expenses", 0.0)
 
-    @rx.var
+    @rx.var(cache=False)
     def total_installments_monthly(self) -> float:
-        return sum((item["installment_value"] for item in self.installments))
+        return self._summary.get("totals", {}).get("installments", 0.0)
 
-    @rx.var
+    @rx.var(cache=False)
     def total_monthly_spending(self) -> float:
         return (
             self.total_monthly_expenses
@@ -103,59 +207,195 @@ class FinanceState(rx.State):
             + self.total_installments_monthly
         )
 
-    @rx.var
+    @rx.var(cache=False)
     def monthly_balance(self) -> float:
         return self.total_monthly_income - self.total_monthly_spending
 
     @rx.var
-    def pie_chart_data(self) -> list[dict[str, str | float]]:
-        data = {cat: 0.0 for cat in CATEGORIES}
-        for item in self.monthly_expenses:
-            cat = item.get("category", "Outros")
-            if cat in data:
-                data[cat] += item["amount"]
-            else:
-                data.setdefault("Outros", 0.0)
-                data["Outros"] += item["amount"]
-        for item in self.annual_expenses:
-            cat = item.get("category", "Outros")
-            val = item["amount"] / 12
-            if cat in data:
-                data[cat] += val
-            else:
-                data.setdefault("Outros", 0.0)
-                data["Outros"] += val
-        for item in self.installments:
-            cat = item.get("category", "Outros")
-            val = item["installment_value"]
-            if cat in data:
-                data[cat] += val
-            else:
-                data.setdefault("Outros", 0.0)
-                data["Outros"] += val
-        total = sum(data.values())
+    def category_options(self) -> list[str]:
+        """Every category an item can be in, each followed by those below it."""
+        return all_categories(self.user_categories)
+
+    @rx.var
+    def parent_options(self) -> list[str]:
+        """The categories a new one can go below without getting too deep."""
+        return [
+            category
+            for category in self.category_options
+            if len(category_parts(category)) < MAX_CATEGORY_DEPTH
+        ]
+
+    def _category_tree(self) -> dict:
+        tree = self._summary.get("tree")
+        if tree is None:
+            tree = category_tree(self._summary.get("by_category", {}))
+        return tree
+
+    @rx.var(cache=False)
+    def pie_chart_data(self) -> list[dict[str, str | float | bool]]:
+        """The slices of the categories right below pie_category.
+
+        Read off the summary's tree, which has every category's total with
+        those below it, so showing a level costs its nodes, not the items.
+        What is filed under pie_category itself gets a slice of its own.
+        """
+        tree = self._category_tree()
+        node = self.pie_category
+        children = category_children(tree, node)
+        parents = {category.rpartition(CATEGORY_SEPARATOR)[0] for category in tree}
+        slices = [(child, tree[child], child in parents) for child in children]
+        if node:
+            own = tree.get(node, 0.0) - sum(value for _, value, _ in slices)
+            slices.append((node, own, False))
+        slices = [
+            (category, value, drillable)
+            for category, value, drillable in slices
+            if round(value, 2) > 0
+        ]
+        slices.sort(key=lambda s: s[1], reverse=True)
+        total = sum(value for _, value, _ in slices)
+        shades = category_shades(node, len(slices)) if node else []
         result = []
-        for cat, value in data.items():
-            if value > 0:
-                pct = value / total * 100 if total > 0 else 0.0
-                val_str = (
-                    f"{value:,.2f}".replace(",", "X")
-                    .replace(".", ",")
-                    .replace("X", ".")
-                )
-                pct_str = f"{pct:.1f}".replace(".", ",")
-                result.append(
-                    {
-                        "name": cat,
-                        "value": round(value, 2),
-                        "value_str": f"R$ {val_str}",
-                        "pct_str": f"({pct_str}%)",
-                        "fill": CATEGORY_DEFINITIONS.get(
-                            cat, CATEGORY_DEFINITIONS["Outros"]
-                        )["hex"],
-                    }
-                )
-        return sorted(result, key=lambda x: x["value"], reverse=True)
+        for n, (category, value, drillable) in enumerate(slices):
+            pct = value / total * 100 if total > 0 else 0.0
+            val_str = (
+                f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+            )
+            pct_str = f"{pct:.1f}".replace(".", ",")
+            result.append(
+                {
+                    "name": category,
+                    "label": "Sem subcategoria"
+                    if category == node
+                    else category_label(category),
+                    "value": round(value, 2),
+                    "value_str": f"R$ {val_str}",
+                    "pct_str": f"({pct_str}%)",
+                    "fill": shades[n]
+                    if node
+                    else CATEGORY_DEFINITIONS[category]["hex"],
+                    "drillable": drillable,
+                }
+            )
+        return result
+
+    @rx.var(cache=False)
+    def pie_total(self) -> float:
+        """The total of the pie's slices: all spending, or pie_category's."""
+        if not self.pie_category:
+            return self.total_monthly_spending
+        return round(self._category_tree().get(self.pie_category, 0.0), 2)
+
+    @rx.var
+    def pie_breadcrumb(self) -> list[dict[str, str]]:
+        """The categories above the pie's, and its own, to drill back up to."""
+        parts = category_parts(self.pie_category) if self.pie_category else []
+        return [
+            {
+                "name": CATEGORY_SEPARATOR.join(parts[: n + 1]),
+                "label": part,
+            }
+            for n, part in enumerate(parts)
+        ]
+
+    def _search_index(self) -> SearchIndex:
+        token = self.router.session.client_token
+        indexes = get_search_indexes()
+        index = indexes.get(token, self._index_stamp)
+        if index is None:
+            index = SearchIndex.build(self._get_data(), self._index_stamp)
+            indexes.put(token, index)
+        return index
+
+    def _expense_index(self) -> ExpenseIndex:
+        token = self.router.session.client_token
+        indexes = get_expense_indexes()
+        index = indexes.get(token, self._index_stamp)
+        if index is None:
+            index = ExpenseIndex.build(self._get_data(), self._index_stamp)
+            indexes.put(token, index)
+        return index
+
+    @rx.var(deps=["_index_stamp", "_summary"], auto_deps=False)
+    def expense_alerts(self) -> list[ExpenseAlert]:
+        """Likely duplicate expenses, then outliers within their category."""
+        index = self._expense_index()
+        found = [
+            (section, item, f"{count + 1} lançamentos parecidos")
+            for section, item, count in index.duplicate_items()
+        ]
+        found += [
+            (section, item, "Valor acima do normal na categoria")
+            for section, item in index.outliers(self._summary.get("stats", {}))
+        ]
+        return [
+            {
+                "id": item["id"],
+                "section": section,
+                "name": item.get("name", ""),
+                "category": item.get("category", ""),
+                "amount": round(item_amount(section, item), 2),
+                "reason": reason,
+            }
+            for section, item, reason in found
+        ]
+
+    def _expense_warning(self, section: str, item: dict) -> str:
+        """Why a just-added expense looks wrong, or "" if it does not."""
+        index = self._expense_index()
+        duplicates = index.duplicates.get(item["id"])
+        if duplicates:
+            other = index.entries[next(iter(duplicates))][1]
+            return f"Possível duplicata de '{other.get('name', '')}'."
+        stats = self._summary.get("stats", {}).get(item.get("category", "Outros"))
+        if is_outlier(index.entries[item["id"]][3], stats):
+            return f"Valor acima do normal para {item.get('category', 'Outros')}."
+        return ""
+
+    def _added(self, section: str, item: dict, message: str):
+        """The toasts for an added expense, warning if it looks wrong."""
+        warning = self._expense_warning(section, item)
+        if warning:
+            return [rx.toast(message), rx.toast.warning(warning)]
+        return rx.toast(message)
+
+    def _search(self) -> tuple[int, list]:
+        if not self.search_query.strip() and not self.search_category:
+            return 0, []
+        return self._search_index().search(
+            self.search_query, self.search_category, self.search_sort
+        )
+
+    @rx.var(
+        deps=["search_query", "search_category", "search_sort", "_index_stamp"],
+        auto_deps=False,
+    )
+    def search_results(self) -> list[SearchResult]:
+        return [
+            {
+                "id": item["id"],
+                "section": section,
+                "name": item.get("name", ""),
+                "category": item.get("category", ""),
+                "amount": round(item_amount(section, item), 2),
+            }
+            for section, item in self._search()[1]
+        ]
+
+    @rx.var(
+        deps=["search_query", "search_category", "search_sort", "_index_stamp"],
+        auto_deps=False,
+    )
+    def search_count(self) -> int:
+        return self._search()[0]
+
+    @rx.var
+    def selected_counts(self) -> dict[str, int]:
+        selected = set(self.selected_ids)
+        return {
+            section: sum(1 for item in getattr(self, section) if item["id"] in selected)
+            for section in MOVE_TARGETS
+        }
 
     hide_values: bool = True
     is_editing: bool = False
@@ -167,220 +407,675 @@ class FinanceState(rx.State):
     def toggle_privacy(self):
         self.hide_values = not self.hide_values
 
+    @rx.event
+    def set_search_query(self, query: str):
+        self.search_query = query
+
+    @rx.event
+    def set_search_category(self, category: str):
+        self.search_category = category if category in self.category_options else ""
+
+    @rx.event
+    def drill_category(self, category: str):
+        """Show the categories below category in the pie."""
+        if category == "" or category in self._category_tree():
+            self.pie_category = category
+
+    @rx.event
+    async def add_category(self, form_data: dict):
+        """Add one of the user's own categories, below form_data's parent."""
+        parent = form_data.get("parent", "")
+        if parent not in self.parent_options:
+            return rx.toast("Escolha a categoria acima da nova.")
+        try:
+            name = parse_category_name(form_data.get("name") or "")
+        except ValidationError as e:
+            return rx.toast(str(e))
+        category = f"{parent}{CATEGORY_SEPARATOR}{name}"
+        if category in self.user_categories:
+            return rx.toast(f"{category} já existe.")
+        if len(self.user_categories) >= MAX_USER_CATEGORIES:
+            return rx.toast(f"Limite de {MAX_USER_CATEGORIES} categorias atingido.")
+        email = await self._session_email()
+        store = get_store()
+        if email and store is not None:
+            refused = await self._write_refused()
+            if refused:
+                return refused
+            try:
+                await get_write_queue().run(email, store.add_category, email, category)
+            except Exception as e:
+                logging.exception(f"Error adding category for {email}: {e}")
+                return rx.toast("Erro ao salvar a categoria.")
+        self.user_categories = sorted(self.user_categories + [category])
+        return rx.toast(f"Categoria {category} criada.")
+
+    @rx.event
+    async def remove_category(self, category: str):
+        """Remove one of the user's categories and those below it.
+
+        Items filed under them keep their category: its totals still count
+        towards the built-in category it is below.
+        """
+        if category not in self.user_categories:
+            return
+        email = await self._session_email()
+        store = get_store()
+        if email and store is not None:
+            refused = await self._write_refused()
+            if refused:
+                return refused
+            try:
+                await get_write_queue().run(
+                    email, store.remove_category, email, category
+                )
+            except Exception as e:
+                logging.exception(f"Error removing category for {email}: {e}")
+                return rx.toast("Erro ao remover a categoria.")
+        below = category + CATEGORY_SEPARATOR
+        self.user_categories = [
+            c for c in self.user_categories if c != category and not c.startswith(below)
+        ]
+        if self.search_category not in self.category_options:
+            self.search_category = ""
+        return rx.toast(f"Categoria {category} removida.")
+
+    @rx.event
+    def set_search_sort(self, sort: str):
+        self.search_sort = sort if sort in SORTS else "amount_desc"
+
+    @rx.event
+    def clear_search(self):
+        self.search_query = ""
+        self.search_category = ""
+
     @rx.event
     def start_edit_income(self, index: int):
         self.editing_item_type = "income"
         self.editing_item_index = index
-        self.editing_item_data = self.monthly_income[index]
+        self.editing_item_data = _edit_data(self.monthly_income[index])
         self.is_editing = True
 
     @rx.event
     def start_edit_monthly_expense(self, index: int):
         self.editing_item_type = "monthly_expense"
         self.editing_item_index = index
-        self.editing_item_data = self.monthly_expenses[index]
+        self.editing_item_data = _edit_data(self.monthly_expenses[index])
         self.is_editing = True
 
     @rx.event
     def start_edit_annual_expense(self, index: int):
         self.editing_item_type = "annual_expense"
         self.editing_item_index = index
-        self.editing_item_data = self.annual_expenses[index]
+        self.editing_item_data = _edit_data(self.annual_expenses[index])
         self.is_editing = True
 
     @rx.event
     def start_edit_installment(self, index: int):
         self.editing_item_type = "installment"
         self.editing_item_index = index
-        self.editing_item_data = self.installments[index]
+        self.editing_item_data = _edit_data(self.installments[index])
         self.is_editing = True
 
     @rx.event
     def cancel_edit(self):
+        self._close_edit()
+
+    def _close_edit(self):
         self.is_editing = False
         self.editing_item_data = {}
         self.editing_item_index = -1
         self.editing_item_type = ""
 
+    def _editing_index(self, section: str) -> int:
+        """Index of the item being edited, found by id if the list has moved."""
+        items = getattr(self, section)
+        item_id = self.editing_item_data.get("id")
+        index = self.editing_item_index
+        if 0 <= index < len(items) and items[index]["id"] == item_id:
+            return index
+        for i, item in enumerate(items):
+            if item["id"] == item_id:
+                return i
+        return -1
+
+    def _index_ops(self, ops: list[dict] | None = None):
+        """Apply ops to the session's indexes, or drop them if ops is None.
+
+        A dropped index is rebuilt from the lists when next used.
+        """
+        token = self.router.session.client_token
+        indexes = [
+            registry.get(token, self._index_stamp)
+            for registry in (get_search_indexes(), get_expense_indexes())
+        ]
+        self._index_stamp = new_item_id()
+        if ops is None:
+            return
+        for index in indexes:
+            if index is None:
+                continue
+            for op in ops:
+                if op["op"] == "remove":
+                    index.remove(op["id"])
+                else:
+                    index.add(op["section"], op["item"])
+            index.stamp = self._index_stamp
+
+    def _add_item(self, section: str, item: dict):
+        item["id"] = new_item_id()
+        getattr(self, section).append(item)
+        self._pending_ops.append(add_op(section, item))
+        self._index_ops(self._pending_ops[-1:])
+        if self._partial:
+            self._summary = adjust_summary(self._summary, section, item, 1)
+
+    def _replace_item(self, section: str, index: int, item: dict):
+        items = getattr(self, section)
+        old = items[index]
+        item["id"] = old["id"]
+        items[index] = item
+        self._pending_ops.append(update_op(section, item))
+        self._index_ops(self._pending_ops[-1:])
+        if self._partial:
+            self._summary = adjust_summary(self._summary, section, old, -1)
+            self._summary = adjust_summary(self._summary, section, item, 1)
+
+    def _remove_item(self, section: str, index: int):
+        item = getattr(self, section).pop(index)
+        self._pending_ops.append(remove_op(section, item["id"]))
+        self._index_ops(self._pending_ops[-1:])
+        if self._partial:
+            self._summary = adjust_summary(self._summary, section, item, -1)
+            # Erring low only refetches items, which _load_page skips.
+            offset = self._section_offsets.get(section, 0)
+            self._section_offsets[section] = max(0, offset - 1)
+
+    @rx.event
+    def toggle_selected(self, item_id: str):
+        if item_id in self.selected_ids:
+            self.selected_ids.remove(item_id)
+        else:
+            self.selected_ids.append(item_id)
+
+    @rx.event
+    def select_all(self, section: str):
+        if section in MOVE_TARGETS:
+            selected = set(self.selected_ids)
+            self.selected_ids.extend(
+                item["id"]
+                for item in getattr(self, section)
+                if item["id"] not in selected
+            )
+
+    @rx.event
+    def clear_selection(self, section: str):
+        self._deselect(section)
+
+    def _deselect(self, section: str):
+        ids = {item["id"] for item in getattr(self, section, [])}
+        self.selected_ids = [i for i in self.selected_ids if i not in ids]
+
+    def _apply_bulk(self, ops: list[dict]):
+        """Apply ops on many items as one change to the lists, saved at once."""
+        data = self._get_data()
+        merged = apply_ops(data, ops)
+        touched = {op["section"] for op in ops}
+        if self._partial:
+            ids = {op["id"] if op["op"] == "remove" else op["item"]["id"] for op in ops}
+            for section in touched:
+                old = [item for item in data[section] if item["id"] in ids]
+                new = [item for item in merged[section] if item["id"] in ids]
+                for item in old:
+                    self._summary = adjust_summary(self._summary, section, item, -1)
+                for item in new:
+                    self._summary = adjust_summary(self._summary, section, item, 1)
+                removed = len(old) - len(new)
+                if removed > 0:
+                    offset = self._section_offsets.get(section, 0)
+                    self._section_offsets[section] = max(0, offset - removed)
+        for section in touched:
+            setattr(self, section, merged[section])
+        self._pending_ops.extend(ops)
+        self._index_ops(ops)
+
+    @rx.event
+    async def bulk_remove(self, section: str):
+        if section not in MOVE_TARGETS:
+            return
+        ops = bulk_remove_ops(self._get_data(), section, self.selected_ids)
+        if not ops:
+            return
+        refused = await self._write_refused()
+        if refused:
+            return refused
+        self._deselect(section)
+        self._apply_bulk(ops)
+        return await self._save_data() or rx.toast(f"{len(ops)} itens removidos.")
+
+    @rx.event
+    async def bulk_recategorize(self, section: str, category: str):
+        if section not in MOVE_TARGETS or category not in self.category_options:
+            return
+        ops = bulk_update_ops(
+            self._get_data(), section, self.selected_ids, {"category": category}
+        )
+        if not ops:
+            return
+        refused = await self._write_refused()
+        if refused:
+            return refused
+        self._deselect(section)
+        self._apply_bulk(ops)
+        return await self._save_data() or rx.toast(
+            f"{len(ops)} itens movidos para {category}."
+        )
+
+    @rx.event
+    async def bulk_move(self, section: str):
+        if section not in MOVE_TARGETS:
+            return
+        target = MOVE_TARGETS[section]
+        ops = bulk_move_ops(self._get_data(), section, target, self.selected_ids)
+        if not ops:
+            return
+        refused = await self._write_refused()
+        if refused:
+            return refused
+        self._deselect(section)
+        self._apply_bulk(ops)
+        label = "anuais" if target == "annual_expenses" else "mensais"
+        return await self._save_data() or rx.toast(
+            f"{len(ops) // 2} itens movidos para despesas {label}."
+        )
+
     @rx.event
     async def save_edit(self, form_data: dict):
         if self.editing_item_index == -1:
             return
+        section = EDIT_SECTIONS.get(self.editing_item_type)
+        if section is None:
+            return
+        index = self._editing_index(section)
+        if index == -1:
+            # Removed in another tab or session since the dialog opened.
+            self._close_edit()
+            return rx.toast.error("Este item foi removido e não pode ser editado.")
         try:
-            if self.editing_item_type == "income":
-                name = form_data.get("name", "")
-                amount = float(form_data.get("amount", "0"))
-                if 0 <= self.editing_item_index < len(self.monthly_income):
-                    self.monthly_income[self.editing_item_index] = {
-                        "name": name,
-                        "amount": amount,
-                    }
-            elif self.editing_item_type == "monthly_expense":
-                name = form_data.get("name", "")
-                amount = float(form_data.get("amount", "0"))
-                category = form_data.get("category", "Outros")
-                if 0 <= self.editing_item_index < len(self.monthly_expenses):
-                    self.monthly_expenses[self.editing_item_index] = {
-                        "name": name,
-                        "amount": amount,
-                        "category": category,
-                    }
-            elif self.editing_item_type == "annual_expense":
-                name = form_data.get("name", "")
-                amount = float(form_data.get("amount", "0"))
-                category = form_data.get("category", "Outros")
-                if 0 <= self.editing_item_index < len(self.annual_expenses):
-                    self.annual_expenses[self.editing_item_index] = {
-                        "name": name,
-                        "amount": amount,
-                        "category": category,
-                    }
-            elif self.editing_item_type == "installment":
-                name = form_data.get("name", "")
-                total_amount = float(form_data.get("total_amount", "0"))
-                count = int(form_data.get("count", "1"))
-                category = form_data.get("category", "Outros")
-                installment_value = total_amount / count if count > 0 else 0
-                if 0 <= self.editing_item_index < len(self.installments):
-                    self.installments[self.editing_item_index] = {
-                        "name": name,
-                        "total_amount": total_amount,
-                        "installments_count": count,
-                        "installment_value": installment_value,
-                        "category": category,
-                    }
-            await self._save_data()
+            item = parse_form(section, form_data, self.category_options)
+        except ValidationError as e:
+            return rx.toast(str(e))
+        refused = await self._write_refused()
+        if refused:
+            return refused
+        try:
+            self._replace_item(section, index, item)
+            saving = await self._save_data()
             self.is_editing = False
-            return rx.toast("Item atualizado com sucesso!")
-        except ValueError as e:
-            logging.exception(f"Error parsing values during edit: {e}")
-            return rx.toast("Erro ao salvar: verifique os valores numéricos.")
+            return saving or rx.toast("Item atualizado com sucesso!")
         except Exception as e:
             logging.exception(f"Error saving edit: {e}")
             return rx.toast("Erro ao salvar edição.")
 
-    async def _save_data(self):
-        """Internal helper to save state to MongoDB with encryption."""
-        from app.states.auth_state import AuthState
+    def _get_data(self) -> dict:
+        data = {section: list(getattr(self, section)) for section in SECTIONS}
+        data["version"] = self._version
+        data["data_key"] = self._data_key or None
+        return data
 
-        auth_state = await self.get_state(AuthState)
-        if not auth_state.token_is_valid:
-            return
-        email = auth_state.tokeninfo.get("email")
-        if not email:
+    def _set_data(self, data: dict):
+        for section in SECTIONS:
+            setattr(self, section, data[section])
+        self._index_ops(None)
+        self._version = data.get("version", 0)
+        self._data_key = data.get("data_key") or ""
+
+    def _refresh_summary(self, email: str = ""):
+        """Recompute the totals, with a MongoDB aggregation if the ledger is on."""
+        if self._partial:
+            # The lists are incomplete; the item helpers keep the totals.
             return
-        collection = get_user_collection()
-        if collection is not None:
+        ledger = get_ledger_collection() if email and ledger_enabled() else None
+        if ledger is not None:
             try:
-                encrypted_income = [
-                    {"name": item["name"], "amount": encrypt_value(item["amount"])}
-                    for item in self.monthly_income
-                ]
-                encrypted_monthly_expenses = [
-                    {
-                        "name": item["name"],
-                        "amount": encrypt_value(item["amount"]),
-                        "category": item.get("category", "Outros"),
-                    }
-                    for item in self.monthly_expenses
-                ]
-                encrypted_annual_expenses = [
-                    {
-                        "name": item["name"],
-                        "amount": encrypt_value(item["amount"]),
-                        "category": item.get("category", "Outros"),
-                    }
-                    for item in self.annual_expenses
-                ]
-                encrypted_installments = [
-                    {
-                        "name": item["name"],
-                        "total_amount": encrypt_value(item["total_amount"]),
-                        "installments_count": item["installments_count"],
-                        "installment_value": encrypt_value(item["installment_value"]),
-                        "category": item.get("category", "Outros"),
-                    }
-                    for item in self.installments
-                ]
-                data = {
-                    "user_email": email,
-                    "monthly_income": encrypted_income,
-                    "monthly_expenses": encrypted_monthly_expenses,
-                    "annual_expenses": encrypted_annual_expenses,
-                    "installments": encrypted_installments,
-                }
-                collection.replace_one({"user_email": email}, data, upsert=True)
+                # A ledger behind the lists is rebuilt; one ahead is not used.
+                if ensure_ledger(ledger, email, self._get_data()):
+                    self._summary = aggregate_summary(ledger, email)
+                    return
             except Exception as e:
-                logging.exception(f"Error saving data to MongoDB: {e}")
-                return rx.toast("Aviso: Não foi possível salvar online.")
+                logging.exception(f"Error aggregating ledger for {email}: {e}")
+        self._summary = summarize(self._get_data())
 
-    @rx.event
-    async def load_data(self):
-        """Load and decrypt data from MongoDB if available."""
+    def _update_ledger(self, email: str, ops: list[dict]):
+        ledger = get_ledger_collection() if ledger_enabled() else None
+        if ledger is None:
+            return
+        try:
+            apply_ledger_ops(ledger, email, ops, self._version)
+        except Exception as e:
+            # An incomplete ledger would give wrong totals; drop it so the
+            # next load rebuilds it from the document.
+            logging.exception(f"Error updating ledger for {email}: {e}")
+            ledger.delete_many({"user_email": email})
+
+    async def _session_email(self) -> str | None:
         from app.states.auth_state import AuthState
 
-        self.monthly_income = []
-        self.monthly_expenses = []
-        self.annual_expenses = []
-        self.installments = []
         auth_state = await self.get_state(AuthState)
         if not auth_state.token_is_valid:
+            return None
+        return auth_state.tokeninfo.get("email")
+
+    def _load_page(self, store, email: str, section: str):
+        """Append the section's next page, skipping items already listed."""
+        offset = self._section_offsets.get(section, 0)
+        data = store.load_partial(
+            email, [section], page=(offset, SECTION_PAGE_SIZE + 1)
+        )
+        page = (data or empty_data())[section]
+        items = getattr(self, section)
+        listed = {item["id"] for item in items}
+        self._index_ops(None)
+        items.extend(
+            item for item in page[:SECTION_PAGE_SIZE] if item["id"] not in listed
+        )
+        self._section_offsets[section] = offset + len(page[:SECTION_PAGE_SIZE])
+        self.section_has_more[section] = len(page) > SECTION_PAGE_SIZE
+
+    def _load_lazily(self, store, email: str):
+        """Fetch the totals, and the first page of the sections already shown.
+
+        The totals come from the ledger if it was built against the stored
+        version, else from a projection of the amounts, with the item ids so
+        the ledger can be rebuilt from it.
+        """
+        ledger = get_ledger_collection() if ledger_enabled() else None
+        data = store.load_partial(email, sections=[]) or empty_data()
+        if ledger is not None and ledger_version(ledger, email) == data["version"]:
+            self._summary = aggregate_summary(ledger, email)
+        elif ledger is not None:
+            fields = (*SUMMARY_FIELDS, "id")
+            data = store.load_partial(email, fields=fields) or empty_data()
+            self._summary = summarize(data)
+            ensure_ledger(ledger, email, data)
+        else:
+            data = store.load_partial(email, fields=SUMMARY_FIELDS) or empty_data()
+            self._summary = summarize(data)
+        self._version = data.get("version", 0)
+        self._data_key = data.get("data_key") or ""
+        self._partial = True
+        for section in self._requested_sections:
+            self._load_page(store, email, section)
+
+    def _apply_loaded(self, email: str, data: dict):
+        self._set_data(data)
+        self._loaded_email = email
+        self._refresh_summary(email)
+        self._store_snapshot(email)
+
+    def _apply_changes(self, email: str, changes: dict):
+        """Bring the lists up to date with ops from store.changes_since."""
+        if changes["ops"]:
+            merged = apply_ops(self._get_data(), changes["ops"])
+            # Only the lists that changed are sent to the browser.
+            for section in {op["section"] for op in changes["ops"]}:
+                setattr(self, section, merged[section])
+            self._index_ops(None)
+            self._refresh_summary(email)
+        self._version = changes["version"]
+        self._store_snapshot(email)
+
+    def _catch_up(self, store, email: str) -> bool:
+        """Apply what was saved since this session's version, if the log has it.
+
+        Only for a session still holding the user's whole data with nothing
+        left to save, such as one reconnecting after a network blip.
+        """
+        if self._loaded_email != email or self._partial or self._pending_ops:
+            return False
+        changes = store.changes_since(email, self._version)
+        if changes is None or (changes["data_key"] or "") != self._data_key:
+            return False
+        self._apply_changes(email, changes)
+        return True
+
+    def _store_snapshot(self, email: str):
+        """Refresh the browser's copy if it is behind; lazy mode keeps none.
+
+        At most once per load: the copy is up to 1 MB, sent whole whenever
+        it changes, and sync_snapshot brings a copy left behind by later
+        saves up to date on the next visit.
+        """
+        if not client_snapshots_enabled() or self._partial:
             return
-        email = auth_state.tokeninfo.get("email")
+        if self._snapshot_written or self._snapshot_version == self._version:
+            return
+        self.offline_snapshot = encode_snapshot(email, self._get_data())
+        self._snapshot_version = self._version
+        self._snapshot_written = True
+
+    def _evict(self) -> bool:
+        """Drop the lists of an idle session, keeping what gets them back.
+
+        What is kept is small: the email, version and data key, and the
+        totals. Nothing is marked dirty, so nothing is sent: the browser
+        keeps showing the lists and _rehydrate puts them back before the
+        next event. Sessions in lazy mode, or with changes not yet saved,
+        are left alone; returns whether the lists were dropped.
+        """
+        if (
+            self._evicted
+            or not self._loaded_email
+            or self._partial
+            or self._pending_ops
+            or self._save_scheduled
+            or get_store() is None
+        ):
+            return False
+        for section in SECTIONS:
+            self.__dict__[section] = []
+        for var in self.computed_vars.values():
+            var.mark_dirty(instance=self)
+        token = self.router.session.client_token
+        get_search_indexes().discard(token)
+        get_expense_indexes().discard(token)
+        self.__dict__["_evicted"] = True
+        return True
+
+    async def _rehydrate(self):
+        """Put back the lists _evict dropped, from the cache or the database.
+
+        Lists still at the version the browser shows are put back as they
+        were, without being sent again; newer ones are applied like a load.
+        Raises if the database cannot be read, leaving the session evicted:
+        an event handled without its lists could save them empty.
+        """
+        email = self._loaded_email
+        if await self._session_email() != email:
+            # Signed out while idle: there is nothing to put back.
+            self._set_data(empty_data())
+            self.user_categories = []
+            self._loaded_email = ""
+            self._evicted = False
+            return
+        cache = get_user_cache()
+        data = cache.get(email, self._version)
+        if data is None:
+            epoch = cache.epoch
+            data = await asyncio.to_thread(get_store().load, email) or empty_data()
+            cache.put(email, data, epoch)
+        if (
+            data.get("version", 0) == self._version
+            and (data.get("data_key") or "") == self._data_key
+        ):
+            for section in SECTIONS:
+                self.__dict__[section] = data[section]
+        else:
+            self._apply_loaded(email, data)
+        self._evicted = False
+
+    async def _write_refused(self):
+        """A toast if a change now would put the user over the write rate limit.
+
+        Checked before the change is applied: a user making changes faster
+        than any person would gets them refused, not queued, so they cost
+        the worker next to nothing.
+        """
+        email = await self._session_email()
+        wait = get_rate_limiter().acquire(email) if email else 0.0
+        if wait > 0:
+            return rx.toast.warning(
+                f"Muitas alterações seguidas. Tente de novo em {math.ceil(wait)} s."
+            )
+
+    async def _save_data(self):
+        """Internal helper to save state to MongoDB with encryption.
+
+        Saves are conditional on the version this session last saw. If another
+        session saved in between, its data is kept and this session's pending
+        changes are replayed on top of it. A save finding the write queue
+        full keeps its changes pending for save_pending. Returns the toast
+        telling the user the changes are not saved yet, or None.
+        """
+        ops = self._pending_ops
+        self._pending_ops = []
+        email = await self._session_email()
+        store = get_store()
+        if not email or store is None:
+            self._refresh_summary()
+            return
+        cache = get_user_cache()
+        queue = get_write_queue()
+        try:
+            if self._partial:
+                # Writing back incomplete lists would lose the rest.
+                header = await queue.run(email, store.save_ops, email, ops)
+                self._version = header["version"]
+                self._data_key = header["data_key"]
+                publish_write(email)
+                cache.invalidate(email)
+            else:
+                saved, merged = await queue.run(
+                    email, store.save, email, self._get_data(), ops
+                )
+                if merged:
+                    self._set_data(saved)
+                else:
+                    self._version = saved["version"]
+                    self._data_key = saved["data_key"]
+                publish_write(email)
+                cache.put(email, saved)
+                self._store_snapshot(email)
+        except WriteQueueFull:
+            return self._save_later(ops)
+        except Exception as e:
+            self._pending_ops = ops + self._pending_ops
+            cache.invalidate(email)
+            self._refresh_summary()
+            logging.exception(f"Error saving data to MongoDB: {e}")
+            return rx.toast("Aviso: Não foi possível salvar online.")
+        self.saving_later = False
+        self._update_ledger(email, ops)
+        self._refresh_summary(email)
+
+    def _save_later(self, ops: list[dict]):
+        """Keep ops pending and have save_pending save them in a moment.
+
+        The lists already show the changes; the user is told once, and
+        further changes join the same pending save.
+        """
+        self._pending_ops = ops + self._pending_ops
+        self._refresh_summary()
+        events = []
+        if not self.saving_later:
+            self.saving_later = True
+            events.append(rx.toast.info("Servidor ocupado: salvando em instantes."))
+        if not self._save_scheduled:
+            self._save_scheduled = True
+            events.append(FinanceState.save_pending)
+        return events
+
+    @rx.event(background=True)
+    async def save_pending(self):
+        """Save the changes a full write queue turned away, once it has room."""
+        # Jittered, so sessions turned away together do not all retry together.
+        await asyncio.sleep(QUEUE_RETRY_SECONDS * random.uniform(0.5, 1.5))
+        async with self:
+            self._save_scheduled = False
+            if not self._pending_ops:
+                self.saving_later = False
+                return
+            return await self._save_data()
+
+    @rx.event
+    async def load_data(self):
+        """Load and decrypt data from the cache or MongoDB if available.
+
+        A session already holding the data only applies the changes saved
+        since. Otherwise, without a cached copy, the browser's snapshot is
+        shown at once and sync_snapshot checks it in the background.
+        """
+        email = await self._session_email()
+        store = get_store()
+        self.user_categories = []
+        self._snapshot_written = False
+        if email and store is not None:
+            try:
+                # Read on every load, so categories added in another tab show.
+                self.user_categories = sorted(store.load_categories(email))
+                if self._catch_up(store, email):
+                    return
+            except Exception as e:
+                logging.exception(f"Error reading changes from MongoDB: {e}")
+        # A cached copy older than what this session already showed is stale.
+        seen = self._version if self._loaded_email == email else 0
+        self._set_data(empty_data())
+        self._pending_ops = []
+        self.saving_later = False
+        self.selected_ids = []
+        self.pie_category = ""
+        self._loaded_email = ""
+        self._partial = False
+        self._section_offsets = {}
+        self.section_has_more = {}
+        self._snapshot_version = -1
+        self._refresh_summary()
         if not email:
             return
-        collection = get_user_collection()
-        if collection is not None:
+        if store is not None:
+            cache = get_user_cache()
             try:
-                doc = collection.find_one({"user_email": email})
-                if doc:
-                    raw_income = doc.get("monthly_income") or []
-                    self.monthly_income = [
-                        {
-                            "name": item["name"],
-                            "amount": decrypt_value(item.get("amount", 0)),
-                        }
-                        for item in raw_income
-                    ]
-                    raw_monthly_expenses = doc.get("monthly_expenses") or []
-                    self.monthly_expenses = [
-                        {
-                            "name": item["name"],
-                            "amount": decrypt_value(item.get("amount", 0)),
-                            "category": item.get("category", "Outros"),
-                        }
-                        for item in raw_monthly_expenses
-                    ]
-                    raw_annual_expenses = doc.get("annual_expenses") or []
-                    self.annual_expenses = [
-                        {
-                            "name": item["name"],
-                            "amount": decrypt_value(item.get("amount", 0)),
-                            "category": item.get("category", "Outros"),
-                        }
-                        for item in raw_annual_expenses
-                    ]
-                    raw_installments = doc.get("installments") or []
-                    self.installments = [
-                        {
-                            "name": item["name"],
-                            "total_amount": decrypt_value(item.get("total_amount", 0)),
-                            "installments_count": int(
-                                item.get("installments_count", 1)
-                            ),
-                            "installment_value": decrypt_value(
-                                item.get("installment_value", 0)
-                            ),
-                            "category": item.get("category", "Outros"),
-                        }
-                        for item in raw_installments
-                    ]
-                    logging.info(
-                        f"Loaded data for {email}: {len(self.monthly_income)} income items"
-                    )
-                else:
-                    logging.info(f"No existing data found for {email}, starting fresh.")
+                snapshot = None
+                if client_snapshots_enabled() and not lazy_sections_enabled():
+                    snapshot = decode_snapshot(email, self.offline_snapshot)
+                if snapshot is not None:
+                    self._snapshot_version = snapshot["version"]
+                    seen = max(seen, snapshot["version"])
+                data = cache.get(email, seen)
+                if data is None and lazy_sections_enabled():
+                    self._load_lazily(store, email)
+                elif data is None and snapshot is not None:
+                    self._set_data(snapshot)
+                    self._loaded_email = email
+                    self._refresh_summary()
+                    return FinanceState.sync_snapshot
+                if data is None and not self._partial:
+                    epoch = cache.epoch
+                    data = store.load(email)
+                    if data is not None:
+                        logging.info(
+                            f"Loaded data for {email}: {len(data['monthly_income'])} income items"
+                        )
+                    else:
+                        data = empty_data()
+                        logging.info(
+                            f"No existing data found for {email}, starting fresh."
+                        )
+                    cache.put(email, data, epoch)
+                if not self._partial:
+                    self._apply_loaded(email, data)
             except Exception as e:
+                self._refresh_summary()
                 logging.exception(f"Error loading data from MongoDB: {e}")
                 return rx.toast("Erro ao carregar dados online.")
             if is_using_temp_key():
@@ -389,116 +1084,153 @@ class FinanceState(rx.State):
                     duration=6000,
                 )
 
+    @rx.event(background=True)
+    async def sync_snapshot(self):
+        """Bring the snapshot shown up to date with the database.
+
+        Applies the changes saved since the snapshot's version, or reloads
+        everything if the change log no longer has them. A save made
+        meanwhile already brought the session up to date.
+        """
+        async with self:
+            email = await self._session_email()
+            version, data_key = self._version, self._data_key
+        store = get_store()
+        if not email or store is None:
+            return
+        data = None
+        try:
+            changes = store.changes_since(email, version)
+            if changes is None or (changes["data_key"] or "") != data_key:
+                cache = get_user_cache()
+                epoch = cache.epoch
+                data = store.load(email) or empty_data()
+                cache.put(email, data, epoch)
+            elif changes["version"] == version:
+                return
+        except Exception as e:
+            logging.exception(f"Error syncing data from MongoDB: {e}")
+            return
+        async with self:
+            if self._version != version or self._pending_ops:
+                return
+            if data is None:
+                self._apply_changes(email, changes)
+            else:
+                self._apply_loaded(email, data)
+
+    @rx.event
+    async def load_section(self, section: str):
+        """Fetch a section's first page when its list is first shown."""
+        if section not in SECTIONS or section in self._requested_sections:
+            return
+        self._requested_sections.append(section)
+        return await self._fetch_next_page(section)
+
+    @rx.event
+    async def load_more(self, section: str):
+        if section in SECTIONS:
+            return await self._fetch_next_page(section)
+
+    async def _fetch_next_page(self, section: str):
+        if not self._partial or self.section_has_more.get(section) is False:
+            return
+        email = await self._session_email()
+        store = get_store()
+        if not email or store is None:
+            return
+        try:
+            self._load_page(store, email, section)
+        except Exception as e:
+            logging.exception(f"Error loading {section} from MongoDB: {e}")
+            return rx.toast("Erro ao carregar dados online.")
+
     @rx.event
     async def add_income(self, form_data: dict):
-        name = form_data.get("name", "")
-        amount_str = form_data.get("amount", "0")
-        if not name or not amount_str:
-            return rx.toast("Preencha todos os campos.")
         try:
-            amount = float(amount_str)
-        except ValueError as e:
-            logging.exception(f"Error parsing income amount: {e}")
-            return rx.toast("Valor inválido.")
-        self.monthly_income.append({"name": name, "amount": amount})
-        await self._save_data()
-        return rx.toast("Renda adicionada e salva!")
+            item = parse_form("monthly_income", form_data, self.category_options)
+        except ValidationError as e:
+            return rx.toast(str(e))
+        refused = await self._write_refused()
+        if refused:
+            return refused
+        self._add_item("monthly_income", item)
+        return await self._save_data() or rx.toast("Renda adicionada e salva!")
 
     @rx.event
     async def remove_income(self, index: int):
         if 0 <= index < len(self.monthly_income):
-            self.monthly_income.pop(index)
-            await self._save_data()
-            return rx.toast("Renda removida.")
+            refused = await self._write_refused()
+            if refused:
+                return refused
+            self._remove_item("monthly_income", index)
+            return await self._save_data() or rx.toast("Renda removida.")
 
     @rx.event
     async def add_monthly_expense(self, form_data: dict):
-        name = form_data.get("name", "")
-        amount_str = form_data.get("amount", "0")
-        category = form_data.get("category")
-        if category not in CATEGORIES:
-            category = "Outros"
-        if not name or not amount_str:
-            return rx.toast("Preencha todos os campos.")
         try:
-            amount = float(amount_str)
-        except ValueError as e:
-            logging.exception(f"Error parsing monthly expense amount: {e}")
-            return rx.toast("Valor inválido.")
-        self.monthly_expenses.append(
-            {"name": name, "amount": amount, "category": category}
+            item = parse_form("monthly_expenses", form_data, self.category_options)
+        except ValidationError as e:
+            return rx.toast(str(e))
+        refused = await self._write_refused()
+        if refused:
+            return refused
+        self._add_item("monthly_expenses", item)
+        return await self._save_data() or self._added(
+            "monthly_expenses", item, "Despesa mensal adicionada!"
         )
-        await self._save_data()
-        return rx.toast("Despesa mensal adicionada!")
 
     @rx.event
     async def remove_monthly_expense(self, index: int):
         if 0 <= index < len(self.monthly_expenses):
-            self.monthly_expenses.pop(index)
-            await self._save_data()
-            return rx.toast("Despesa removida.")
+            refused = await self._write_refused()
+            if refused:
+                return refused
+            self._remove_item("monthly_expenses", index)
+            return await self._save_data() or rx.toast("Despesa removida.")
 
     @rx.event
     async def add_annual_expense(self, form_data: dict):
-        name = form_data.get("name", "")
-        amount_str = form_data.get("amount", "0")
-        category = form_data.get("category")
-        if category not in CATEGORIES:
-            category = "Outros"
-        if not name or not amount_str:
-            return rx.toast("Preencha todos os campos.")
         try:
-            amount = float(amount_str)
-        except ValueError as e:
-            logging.exception(f"Error parsing annual expense amount: {e}")
-            return rx.toast("Valor inválido.")
-        self.annual_expenses.append(
-            {"name": name, "amount": amount, "category": category}
+            item = parse_form("annual_expenses", form_data, self.category_options)
+        except ValidationError as e:
+            return rx.toast(str(e))
+        refused = await self._write_refused()
+        if refused:
+            return refused
+        self._add_item("annual_expenses", item)
+        return await self._save_data() or self._added(
+            "annual_expenses", item, "Despesa anual adicionada!"
         )
-        await self._save_data()
-        return rx.toast("Despesa anual adicionada!")
 
     @rx.event
     async def remove_annual_expense(self, index: int):
         if 0 <= index < len(self.annual_expenses):
-            self.annual_expenses.pop(index)
-            await self._save_data()
-            return rx.toast("Despesa anual removida.")
+            refused = await self._write_refused()
+            if refused:
+                return refused
+            self._remove_item("annual_expenses", index)
+            return await self._save_data() or rx.toast("Despesa anual removida.")
 
     @rx.event
     async def add_installment(self, form_data: dict):
-        name = form_data.get("name", "")
-        total_amount_str = form_data.get("total_amount", "0")
-        count_str = form_data.get("count", "1")
-        category = form_data.get("category")
-        if category not in CATEGORIES:
-            category = "Outros"
-        if not name or not total_amount_str or (not count_str):
-            return rx.toast("Preencha todos os campos.")
         try:
-            total_amount = float(total_amount_str)
-            count = int(count_str)
-            if count <= 0:
-                count = 1
-        except ValueError as e:
-            logging.exception(f"Error parsing installment values: {e}")
-            return rx.toast("Valores inválidos.")
-        installment_value = total_amount / count
-        self.installments.append(
-            {
-                "name": name,
-                "total_amount": total_amount,
-                "installments_count": count,
-                "installment_value": installment_value,
-                "category": category,
-            }
+            item = parse_form("installments", form_data, self.category_options)
+        except ValidationError as e:
+            return rx.toast(str(e))
+        refused = await self._write_refused()
+        if refused:
+            return refused
+        self._add_item("installments", item)
+        return await self._save_data() or self._added(
+            "installments", item, "Parcelamento adicionado!"
         )
-        await self._save_data()
-        return rx.toast("Parcelamento adicionado!")
 
     @rx.event
     async def remove_installment(self, index: int):
         if 0 <= index < len(self.installments):
-            self.installments.pop(index)
-            await self._save_data()
-            return rx.toast("Parcelamento removido.")
\ No newline at end of file
+            refused = await self._write_refused()
+            if refused:
+                return refused
+            self._remove_item("installments", index)
+            return await self._save_data() or rx.toast("Parcelamento removido.")
@@ -0,0 +1,650 @@
+import os
+import re
+from typing import Protocol
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.change_log import record_changes, read_changes
+from app.database import (
+    bulk_write,
+    get_user_collection,
+    get_item_collection,
+    get_change_collection,
+    get_rollover_collection,
+    get_category_collection,
+)
+from app.categories import CATEGORY_SEPARATOR
+from app.encryption import create_data_key
+from app.finance_data import (
+    SECTIONS,
+    copy_data,
+    empty_data,
+    encrypt_data,
+    decrypt_data,
+    encrypt_item,
+    decrypt_item,
+    stored_op,
+    apply_ops,
+    with_item_ids,
+)
+from app.key_cache import get_data_cipher
+from app.compact import (
+    compressed_field,
+    compress_section,
+    decompress_section,
+    section_compression,
+    stored_fields,
+)
+from app.rollover import begin_rollover, finish_rollover, rolled_over, user_emails
+
+MAX_SAVE_ATTEMPTS = 5
+
+# user_finances documents converted to one document per item keep only the
+# header fields (user_email, version, data_key) and are marked with this.
+ITEMS_LAYOUT = "items"
+
+# What summarize needs: names and installment totals are left out.
+SUMMARY_FIELDS = (
+    "amount",
+    "installment_value",
+    "category",
+    "frequency",
+    "interval_months",
+)
+
+
+class SaveConflictError(Exception):
+    """Raised when a save keeps losing the race against other writers."""
+
+
+class StorageLayoutError(Exception):
+    """Raised when a document is read with the wrong storage layout."""
+
+
+def _check_layout(doc: dict | None, email: str):
+    if doc and doc.get("layout") == ITEMS_LAYOUT:
+        # Its sections are empty: reading it as a document would lose data.
+        raise StorageLayoutError(f"Data for {email} is stored in the items layout.")
+
+
+def pack_sections(fields: dict) -> tuple[dict, dict]:
+    """The $set and $unset writing fields, with sections compressed or not.
+
+    Whichever form a section is written in, the other one is unset.
+    """
+    compress = section_compression()
+    to_set, to_unset = {}, {}
+    for key, value in fields.items():
+        if key not in SECTIONS:
+            to_set[key] = value
+        elif compress:
+            to_set[compressed_field(key)] = compress_section(value)
+            to_unset[key] = ""
+        else:
+            to_set[key] = value
+            to_unset[compressed_field(key)] = ""
+    return to_set, to_unset
+
+
+def unpack_sections(doc: dict, page: tuple[int, int] | None = None) -> dict:
+    """doc with its compressed sections (if any) as plain item lists.
+
+    MongoDB cannot project into a blob, so a page is cut here; a field
+    projection simply gets whole items.
+    """
+    unpacked = None
+    for section in SECTIONS:
+        blob = doc.get(compressed_field(section))
+        if blob is None:
+            continue
+        if unpacked is None:
+            unpacked = dict(doc)
+        items = decompress_section(blob)
+        if page:
+            items = items[page[0] : page[0] + page[1]]
+        unpacked[section] = items
+        del unpacked[compressed_field(section)]
+    return doc if unpacked is None else unpacked
+
+
+def load_user_data(collection, email: str) -> dict | None:
+    doc = collection.find_one({"user_email": email})
+    _check_layout(doc, email)
+    return decrypt_data(unpack_sections(doc)) if doc else None
+
+
+def section_projection(
+    sections=SECTIONS, fields=None, page: tuple[int, int] | None = None
+) -> dict:
+    """Projection fetching only some sections of a user_finances document.
+
+    Either whole items, optionally a page (skip, limit) of each with $slice,
+    or only some fields of every item: MongoDB cannot do both on one array.
+    Compressed sections are fetched whole (see unpack_sections).
+    """
+    if fields and page:
+        raise ValueError("A page and a field projection cannot be combined.")
+    projection = {"version": 1, "data_key": 1, "layout": 1}
+    for section in sections:
+        projection[compressed_field(section)] = 1
+        if fields:
+            projection.update(
+                {f"{section}.{field}": 1 for field in stored_fields(fields)}
+            )
+        elif page:
+            projection[section] = {"$slice": list(page)}
+        else:
+            projection[section] = 1
+    return projection
+
+
+def load_partial_data(
+    collection, email: str, sections=SECTIONS, fields=None, page=None
+) -> dict | None:
+    """Like load_user_data, for a projection; sections not fetched are empty."""
+    doc = collection.find_one(
+        {"user_email": email}, section_projection(sections, fields, page)
+    )
+    _check_layout(doc, email)
+    if doc is None:
+        return None
+    return decrypt_data(unpack_sections(doc, page))
+
+
+def version_filter(version: int):
+    """Match a stored version; documents from before versioning have none."""
+    return version if version else {"$in": [0, None]}
+
+
+def _try_save(
+    collection, email: str, version: int, fields: dict, data_key: str, created: bool
+) -> bool:
+    """Write fields only if the stored version is still the one they were based on.
+
+    fields are encrypted with data_key, so they are only written over a
+    document holding that very key. The key itself is only written when
+    created, i.e. generated for this save because the document had none:
+    a session's copy of it may be wrapped by a master key since rotated
+    out (see scripts/reencrypt.py), and writing it back would undo that.
+    """
+    to_set, to_unset = pack_sections(fields)
+    query = {"user_email": email, "version": version_filter(version)}
+    if created:
+        query["data_key"] = None
+        to_set["data_key"] = data_key
+    else:
+        query["data_key"] = data_key
+    update = {"$set": to_set, "$inc": {"version": 1}}
+    if to_unset:
+        update["$unset"] = to_unset
+    try:
+        result = collection.update_one(query, update, upsert=not version)
+    except DuplicateKeyError:
+        # Upserting version 0 while another session already created the doc.
+        return False
+    return result.matched_count == 1 or result.upserted_id is not None
+
+
+def save_user_data(collection, email: str, data: dict, ops: list[dict]):
+    """Save data with optimistic concurrency control.
+
+    On a version conflict the latest document is refetched and this session's
+    pending ops are replayed on top of it, instead of overwriting whatever the
+    other writer stored. Returns the data as stored, with its new version, and
+    whether a merge was needed.
+    """
+    merged = False
+    for _ in range(MAX_SAVE_ATTEMPTS):
+        created = not data.get("data_key")
+        if created:
+            data = {**data, "data_key": create_data_key()}
+        fields = encrypt_data(data)
+        fields.pop("data_key")
+        if _try_save(
+            collection, email, data.get("version", 0), fields, data["data_key"], created
+        ):
+            saved = copy_data(data)
+            saved["version"] = data.get("version", 0) + 1
+            return saved, merged
+        latest = load_user_data(collection, email) or empty_data()
+        data = apply_ops(latest, ops)
+        merged = True
+    raise SaveConflictError(
+        f"Could not save data for {email} after {MAX_SAVE_ATTEMPTS} attempts."
+    )
+
+
+def save_user_ops(collection, email: str, ops: list[dict]) -> dict:
+    """Apply ops to the stored document without decrypting it.
+
+    For sessions holding only part of the data, which must not write their
+    lists back. The ops' items are encrypted and replayed on the stored
+    items by id. Returns the new version and data key.
+    """
+    for _ in range(MAX_SAVE_ATTEMPTS):
+        doc = unpack_sections(collection.find_one({"user_email": email}) or {})
+        _check_layout(doc, email)
+        created = not doc.get("data_key")
+        data_key = doc.get("data_key") or create_data_key()
+        stored = {
+            section: with_item_ids(section, doc.get(section) or [])
+            for section in SECTIONS
+        }
+        cipher = get_data_cipher(data_key)
+        merged = apply_ops(stored, [stored_op(op, cipher) for op in ops])
+        fields = {section: merged[section] for section in SECTIONS}
+        version = doc.get("version", 0)
+        if _try_save(collection, email, version, fields, data_key, created):
+            return {"version": version + 1, "data_key": data_key}
+    raise SaveConflictError(
+        f"Could not save data for {email} after {MAX_SAVE_ATTEMPTS} attempts."
+    )
+
+
+class FinanceStore(Protocol):
+    """What FinanceState needs from a storage backend.
+
+    Every backend stores amounts encrypted with the user's data key, and
+    saves are applied as ops keyed by item id, so concurrent sessions merge.
+    """
+
+    def load(self, email: str) -> dict | None: ...
+
+    def load_partial(
+        self, email: str, sections=SECTIONS, fields=None, page=None
+    ) -> dict | None: ...
+
+    def save(self, email: str, data: dict, ops: list[dict]) -> tuple[dict, bool]: ...
+
+    def save_ops(self, email: str, ops: list[dict]) -> dict: ...
+
+    def changes_since(self, email: str, seq: int) -> dict | None:
+        """The ops saved after version seq, with the current version and data key.
+
+        None if the user does not exist or the change log cannot cover the
+        range: the caller then loads everything.
+        """
+        ...
+
+    # Monthly rollover (see app/rollover.py).
+
+    def user_emails(self, after: str, limit: int) -> list[str]: ...
+
+    def rolled_over(self, emails: list[str], month: str) -> set[str]: ...
+
+    def begin_rollover(
+        self, email: str, month: str, entries: list[dict], counts: dict
+    ) -> dict: ...
+
+    def finish_rollover(self, email: str, month: str): ...
+
+    # The user's own categories (see app/categories.py). Added and removed
+    # one at a time, so sessions adding different ones do not overwrite
+    # each other; removing one removes those below it.
+
+    def load_categories(self, email: str) -> list[str]: ...
+
+    def add_category(self, email: str, category: str): ...
+
+    def remove_category(self, email: str, category: str): ...
+
+
+def load_categories(collection, email: str) -> list[str]:
+    if collection is None:
+        return []
+    doc = collection.find_one({"user_email": email}, {"categories": 1})
+    return list(doc.get("categories", [])) if doc else []
+
+
+def add_category(collection, email: str, category: str):
+    collection.update_one(
+        {"user_email": email}, {"$addToSet": {"categories": category}}, upsert=True
+    )
+
+
+def remove_category(collection, email: str, category: str):
+    below = re.compile(f"^{re.escape(category + CATEGORY_SEPARATOR)}")
+    collection.update_one(
+        {"user_email": email}, {"$pull": {"categories": {"$in": [category, below]}}}
+    )
+
+
+def item_document(email: str, section: str, stored_item: dict) -> dict:
+    """The items-layout document for an already encrypted item."""
+    doc = {key: value for key, value in stored_item.items() if key != "id"}
+    doc.update(user_email=email, kind=section, item_id=stored_item["id"])
+    return doc
+
+
+# Matches documents not yet converted, or whose conversion was interrupted.
+UNCONVERTED_QUERY = {
+    "$or": [
+        {"layout": {"$ne": ITEMS_LAYOUT}},
+        {"monthly_income": {"$exists": True}},
+        {compressed_field("monthly_income"): {"$exists": True}},
+    ]
+}
+
+
+def is_converted(doc: dict) -> bool:
+    return (
+        doc.get("layout") == ITEMS_LAYOUT
+        and "monthly_income" not in doc
+        and compressed_field("monthly_income") not in doc
+    )
+
+
+def convert_document(collection, items, doc: dict) -> bool:
+    """Move a user_finances document's items into the items collection.
+
+    The document is claimed first (marked converted, with a version bump),
+    so sessions still on the document layout cannot save over it. Its items
+    are then upserted by id and the sections dropped; if that is
+    interrupted, converting again finishes it. Amounts are copied still
+    encrypted, with whatever key they were stored under. Users without a
+    data key get one for their future items. Returns False if the document
+    was saved in the meantime.
+    """
+    if doc.get("layout") != ITEMS_LAYOUT:
+        result = collection.update_one(
+            {"_id": doc["_id"], "version": version_filter(doc.get("version", 0))},
+            {
+                "$set": {
+                    "layout": ITEMS_LAYOUT,
+                    "data_key": doc.get("data_key") or create_data_key(),
+                },
+                "$inc": {"version": 1},
+            },
+        )
+        if result.modified_count != 1:
+            return False
+    email = doc["user_email"]
+    requests = []
+    sections = unpack_sections(doc)
+    for section in SECTIONS:
+        for item in with_item_ids(section, sections.get(section) or []):
+            requests.append(
+                ReplaceOne(
+                    {"user_email": email, "item_id": item["id"]},
+                    item_document(email, section, item),
+                    upsert=True,
+                )
+            )
+    if requests:
+        bulk_write(items, requests, ordered=False)
+    unset = {section: "" for section in SECTIONS}
+    unset.update({compressed_field(section): "" for section in SECTIONS})
+    collection.update_one({"_id": doc["_id"]}, {"$unset": unset})
+    return True
+
+
+def _changes_since(changes, email: str, header: dict | None, seq: int):
+    if changes is None or header is None:
+        return None
+    version = header.get("version", 0)
+    cipher = get_data_cipher(header.get("data_key"))
+    ops = read_changes(changes, email, seq, version, cipher)
+    if ops is None:
+        return None
+    return {"version": version, "data_key": header.get("data_key"), "ops": ops}
+
+
+class DocumentStore:
+    """One user_finances document per user, rewritten whole on every save.
+
+    With a changes collection, every save is also appended to the user's
+    change log (see app/change_log.py).
+    """
+
+    def __init__(self, collection, changes=None, rollovers=None, categories=None):
+        self.collection = collection
+        self.changes = changes
+        self.rollovers = rollovers
+        self.categories = categories
+
+    def _record(self, email: str, header: dict, ops: list[dict]):
+        if self.changes is not None:
+            cipher = get_data_cipher(header["data_key"])
+            record_changes(self.changes, email, header["version"], ops, cipher)
+
+    def load(self, email: str) -> dict | None:
+        return load_user_data(self.collection, email)
+
+    def load_partial(self, email: str, sections=SECTIONS, fields=None, page=None):
+        return load_partial_data(self.collection, email, sections, fields, page)
+
+    def save(self, email: str, data: dict, ops: list[dict]):
+        saved, merged = save_user_data(self.collection, email, data, ops)
+        self._record(email, saved, ops)
+        return saved, merged
+
+    def save_ops(self, email: str, ops: list[dict]) -> dict:
+        header = save_user_ops(self.collection, email, ops)
+        self._record(email, header, ops)
+        return header
+
+    def changes_since(self, email: str, seq: int) -> dict | None:
+        header = self.collection.find_one(
+            {"user_email": email}, {"version": 1, "data_key": 1}
+        )
+        return _changes_since(self.changes, email, header, seq)
+
+    def user_emails(self, after: str, limit: int) -> list[str]:
+        return user_emails(self.collection, after, limit)
+
+    def rolled_over(self, emails: list[str], month: str) -> set[str]:
+        return rolled_over(self.rollovers, emails, month)
+
+    def begin_rollover(self, email: str, month: str, entries, counts) -> dict:
+        return begin_rollover(self.rollovers, email, month, entries, counts)
+
+    def finish_rollover(self, email: str, month: str):
+        finish_rollover(self.rollovers, email, month)
+
+    def load_categories(self, email: str) -> list[str]:
+        return load_categories(self.categories, email)
+
+    def add_category(self, email: str, category: str):
+        add_category(self.categories, email, category)
+
+    def remove_category(self, email: str, category: str):
+        remove_category(self.categories, email, category)
+
+
+class ItemStore:
+    """One document per item, so a save writes only the items it changed.
+
+    user_finances keeps a header per user whose version is bumped after the
+    items are written, which is what other sessions and workers watch.
+    Users still in the document layout are converted on first access.
+    """
+
+    def __init__(
+        self, collection, items, changes=None, rollovers=None, categories=None
+    ):
+        self.collection = collection
+        self.items = items
+        self.changes = changes
+        self.rollovers = rollovers
+        self.categories = categories
+
+    def _header(self, email: str) -> dict | None:
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            doc = self.collection.find_one({"user_email": email})
+            if doc is None or is_converted(doc):
+                return doc
+            convert_document(self.collection, self.items, doc)
+        raise SaveConflictError(f"Could not convert data for {email}.")
+
+    def _create_header(self, email: str, data_key: str | None) -> dict:
+        try:
+            self.collection.insert_one(
+                {
+                    "user_email": email,
+                    "version": 0,
+                    "layout": ITEMS_LAYOUT,
+                    "data_key": data_key or create_data_key(),
+                }
+            )
+        except DuplicateKeyError:
+            # Another session created it first; its data key wins.
+            pass
+        return self._header(email)
+
+    def _load_items(self, header: dict, sections=SECTIONS, fields=None, page=None):
+        cipher = get_data_cipher(header.get("data_key"))
+        projection = None
+        if fields:
+            projection = {
+                "kind": 1,
+                "item_id": 1,
+                **{field: 1 for field in stored_fields(fields)},
+            }
+        query = {"user_email": header["user_email"]}
+        if page:
+            # One query per section, so each gets its own page.
+            cursors = [
+                self.items.find({**query, "kind": section}, projection)
+                .sort("_id", 1)
+                .skip(page[0])
+                .limit(page[1])
+                for section in sections
+            ]
+        else:
+            query["kind"] = {"$in": list(sections)}
+            cursors = [self.items.find(query, projection).sort("_id", 1)]
+        data = empty_data()
+        for cursor in cursors:
+            for doc in cursor:
+                section = doc["kind"]
+                data[section].append(
+                    decrypt_item(section, {**doc, "id": doc["item_id"]}, cipher)
+                )
+        data["version"] = header.get("version", 0)
+        data["data_key"] = header.get("data_key")
+        return data
+
+    def load(self, email: str) -> dict | None:
+        header = self._header(email)
+        return self._load_items(header) if header else None
+
+    def load_partial(self, email: str, sections=SECTIONS, fields=None, page=None):
+        if fields and page:
+            raise ValueError("A page and a field projection cannot be combined.")
+        header = self._header(email)
+        return self._load_items(header, sections, fields, page) if header else None
+
+    def _write(self, email: str, op: dict, cipher):
+        if op["op"] == "remove":
+            return DeleteOne({"user_email": email, "item_id": op["id"]})
+        stored = encrypt_item(op["section"], op["item"], cipher)
+        # Like apply_ops: adds are idempotent, and an update to an item
+        # someone else removed is dropped.
+        return ReplaceOne(
+            {"user_email": email, "item_id": stored["id"]},
+            item_document(email, op["section"], stored),
+            upsert=op["op"] == "add",
+        )
+
+    def save_ops(self, email: str, ops: list[dict], data_key: str | None = None):
+        """Write ops, then bump the header version. Returns the new header.
+
+        The bump is conditional on the header still being the one read
+        before writing the items: the version, so the change recorded is
+        the one right after it, and the data key, which the items were
+        encrypted with. If another session saved in between, the bump is
+        retried on its header; the items are only written again if the
+        data key changed, so a removal saved meanwhile is not undone.
+        """
+        header = self._header(email) or self._create_header(email, data_key)
+        written_with = None
+        for _ in range(MAX_SAVE_ATTEMPTS):
+            cipher = get_data_cipher(header["data_key"])
+            if header["data_key"] != written_with:
+                requests = [self._write(email, op, cipher) for op in ops]
+                if requests:
+                    bulk_write(self.items, requests, ordered=True)
+                written_with = header["data_key"]
+            bumped = self.collection.find_one_and_update(
+                {
+                    "_id": header["_id"],
+                    "version": version_filter(header.get("version", 0)),
+                    "data_key": header["data_key"],
+                },
+                {"$inc": {"version": 1}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if bumped is not None:
+                if self.changes is not None:
+                    record_changes(self.changes, email, bumped["version"], ops, cipher)
+                return bumped
+            header = self._header(email) or self._create_header(email, data_key)
+        raise SaveConflictError(
+            f"Could not save data for {email} after {MAX_SAVE_ATTEMPTS} attempts."
+        )
+
+    def save(self, email: str, data: dict, ops: list[dict]):
+        """Write this session's ops, then bump the header version.
+
+        Only the ops are written. Ops are keyed by item id, so they apply
+        as they are even if another session saved first; in that case the
+        merged items are reloaded. Returns the same as save_user_data.
+        """
+        header = self.save_ops(email, ops, data.get("data_key"))
+        expected = data.get("version", 0) + 1
+        if header["version"] != expected or header["data_key"] != data.get("data_key"):
+            return self._load_items(header), True
+        saved = copy_data(data)
+        saved["version"] = header["version"]
+        return saved, False
+
+    def changes_since(self, email: str, seq: int) -> dict | None:
+        return _changes_since(self.changes, email, self._header(email), seq)
+
+    def user_emails(self, after: str, limit: int) -> list[str]:
+        return user_emails(self.collection, after, limit)
+
+    def rolled_over(self, emails: list[str], month: str) -> set[str]:
+        return rolled_over(self.rollovers, emails, month)
+
+    def begin_rollover(self, email: str, month: str, entries, counts) -> dict:
+        return begin_rollover(self.rollovers, email, month, entries, counts)
+
+    def finish_rollover(self, email: str, month: str):
+        finish_rollover(self.rollovers, email, month)
+
+    def load_categories(self, email: str) -> list[str]:
+        return load_categories(self.categories, email)
+
+    def add_category(self, email: str, category: str):
+        add_category(self.categories, email, category)
+
+    def remove_category(self, email: str, category: str):
+        remove_category(self.categories, email, category)
+
+
+def storage_backend() -> str:
+    """Either "mongodb" (the default) or "sqlite" (an embedded database file)."""
+    return os.getenv("STORAGE_BACKEND", "mongodb")
+
+
+def get_store() -> FinanceStore | None:
+    """The configured store, or None if there is no database to use.
+
+    With MongoDB, FINANCE_LAYOUT chooses "document" (the default) or "items".
+    """
+    if storage_backend() == "sqlite":
+        from app.sqlite_store import get_sqlite_store
+
+        return get_sqlite_store()
+    collection = get_user_collection()
+    if collection is None:
+        return None
+    changes = get_change_collection()
+    rollovers = get_rollover_collection()
+    categories = get_category_collection()
+    if os.getenv("FINANCE_LAYOUT", "document") == ITEMS_LAYOUT:
+        items = get_item_collection()
+        if items is None:
+            return None
+        return ItemStore(collection, items, changes, rollovers, categories)
+    return DocumentStore(collection, changes, rollovers, categories)
@@ -0,0 +1,229 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from google.auth import exceptions, jwt
+from google.auth.transport import requests as google_requests
+import reflex_google_auth.state as google_auth_state
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# Used when the certificate response carries no max-age.
+DEFAULT_CERTS_MAX_AGE = 3600.0
+# A token signed by a key we do not have yet refetches the certificates, at
+# most this often, so a stream of forged kids cannot hammer Google for us.
+MIN_CERTS_REFETCH_SECONDS = 60.0
+
+_verifier = None
+
+
+def token_cache_size() -> int:
+    """Verified tokens kept (TOKEN_CACHE_SIZE); 0 verifies every token every time."""
+    return int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+
+def certs_refresh_ahead_seconds() -> float:
+    """Refetch Google's certificates in the background this long before they expire."""
+    return float(os.getenv("CERTS_REFRESH_AHEAD_SECONDS", "300"))
+
+
+def cache_max_age(cache_control: str | None) -> float | None:
+    match = re.search(r"max-age=(\d+)", cache_control or "")
+    return float(match.group(1)) if match else None
+
+
+class CertCache:
+    """Google's token signing certificates, fetched once and kept until they expire.
+
+    verify_oauth2_token fetches them over HTTP for every token it checks.
+    Here they are kept for the max-age Google serves them with, and
+    refetched in a background thread once they are within refresh_ahead
+    seconds of it, so no check waits on the fetch while they are in use.
+    If a fetch fails the certificates we have are kept and the next check
+    tries again; a fetch only blocks when there are none yet.
+    """
+
+    def __init__(
+        self, url: str = GOOGLE_CERTS_URL, refresh_ahead: float = 300.0, fetch=None
+    ):
+        self.url = url
+        self.refresh_ahead = refresh_ahead
+        self.fetches = 0
+        self.failures = 0
+        self._fetch = fetch or self._fetch_url
+        self._certs: dict[str, str] | None = None
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def _fetch_url(self) -> tuple[dict[str, str], float | None]:
+        response = google_requests.Request()(self.url, method="GET")
+        if response.status != 200:
+            raise exceptions.TransportError(
+                f"Could not fetch certificates at {self.url}"
+            )
+        max_age = cache_max_age(response.headers.get("cache-control"))
+        return json.loads(response.data.decode("utf-8")), max_age
+
+    def refresh(self) -> dict[str, str]:
+        """Fetch the certificates now; keeps the ones we have if that fails."""
+        try:
+            certs, max_age = self._fetch()
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+                self._refreshing = False
+                certs = self._certs
+            if certs is None:
+                raise
+            logging.warning(f"Keeping cached Google certificates, fetch failed: {e}")
+            return certs
+        now = time.monotonic()
+        with self._lock:
+            self.fetches += 1
+            self._certs = certs
+            self._fetched_at = now
+            self._expires_at = now + (max_age or DEFAULT_CERTS_MAX_AGE)
+            self._refreshing = False
+        return certs
+
+    def get(self, key_id: str | None = None) -> dict[str, str]:
+        """The certificates by key id, fetched first if key_id is not among them."""
+        now = time.monotonic()
+        with self._lock:
+            certs = self._certs
+            stale = certs is None or now >= self._expires_at
+            unknown = (
+                certs is not None
+                and key_id is not None
+                and key_id not in certs
+                and now - self._fetched_at >= MIN_CERTS_REFETCH_SECONDS
+            )
+            ahead = (
+                not self._refreshing and now >= self._expires_at - self.refresh_ahead
+            )
+            if ahead and not (stale or unknown):
+                self._refreshing = True
+        if stale or unknown:
+            return self.refresh()
+        if ahead:
+            threading.Thread(target=self.refresh, daemon=True).start()
+        return certs
+
+
+class VerifiedClaims:
+    """LRU cache of the claims of verified tokens, by token hash, until they expire.
+
+    A token is checked against Google's certificates once; until its exp
+    the same token (and audience) gets the same claims back from a
+    dictionary lookup. Only hashes of tokens are kept, never the tokens.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str, audience: str | None) -> tuple[str, str]:
+        return hashlib.sha256(token.encode()).hexdigest(), audience or ""
+
+    def get(self, token: str, audience: str | None = None) -> dict | None:
+        key = self._key(token, audience)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, exp = entry
+                if exp > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+        return None
+
+    def put(self, token: str, audience: str | None, claims: dict):
+        if self.max_entries <= 0:
+            return
+        exp = float(claims.get("exp", 0))
+        if exp <= time.time():
+            return
+        with self._lock:
+            self._entries[self._key(token, audience)] = (claims, exp)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TokenVerifier:
+    """Checks Google ID tokens as verify_oauth2_token does, from the caches."""
+
+    def __init__(self, certs: CertCache, claims: VerifiedClaims):
+        self.certs = certs
+        self.claims = claims
+
+    def verify(self, token: str | bytes, audience: str | None = None) -> dict:
+        if isinstance(token, bytes):
+            token = token.decode("utf-8")
+        claims = self.claims.get(token, audience)
+        if claims is not None:
+            return claims
+        key_id = jwt.decode_header(token).get("kid")
+        claims = jwt.decode(token, certs=self.certs.get(key_id), audience=audience)
+        if claims.get("iss") not in GOOGLE_ISSUERS:
+            raise exceptions.GoogleAuthError(
+                f"Wrong issuer. 'iss' should be one of the following: {GOOGLE_ISSUERS}"
+            )
+        self.claims.put(token, audience, claims)
+        return claims
+
+
+def get_token_verifier() -> TokenVerifier:
+    global _verifier
+    if _verifier is None:
+        _verifier = TokenVerifier(
+            CertCache(GOOGLE_CERTS_URL, certs_refresh_ahead_seconds()),
+            VerifiedClaims(token_cache_size()),
+        )
+    return _verifier
+
+
+def install_token_cache():
+    """Have GoogleAuthState verify tokens through get_token_verifier().
+
+    GoogleAuthState.tokeninfo is recomputed whenever token_response_json is
+    set, which the client does on every page load and reconnect; each time
+    it fetched Google's certificates and checked the signature again.
+    """
+    if getattr(google_auth_state.verify_oauth2_token, "uses_token_cache", False):
+        return
+    verifier = get_token_verifier()
+
+    def verify_oauth2_token(id_token, request, audience=None, **kwargs):
+        return verifier.verify(id_token, audience)
+
+    verify_oauth2_token.uses_token_cache = True
+    google_auth_state.verify_oauth2_token = verify_oauth2_token
@@ -0,0 +1,107 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from app.finance_data import copy_data
+from app.invalidation import is_multi_worker, start_invalidation
+
+_cache = None
+
+
+class UserDataCache:
+    """LRU cache of decrypted user data, keyed by user_email.
+
+    Entries are copied on the way in and out, so state mutations never leak
+    into the cache. When several workers share the database, every worker's
+    cache must be subscribed to an invalidation bus (see app/invalidation.py).
+    """
+
+    def __init__(self, max_entries: int = 1000, enabled: bool = True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidations = 0
+        self.epoch = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email: str, min_version: int = 0) -> dict | None:
+        """A copy of email's data, or None.
+
+        A copy older than min_version, the version the caller has already
+        seen, missed an invalidation: it is dropped and counts as a miss.
+        """
+        with self._lock:
+            data = self._entries.get(email) if self.enabled else None
+            if data is not None and data.get("version", 0) < min_version:
+                del self._entries[email]
+                self.stale += 1
+                data = None
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return copy_data(data)
+
+    def put(self, email: str, data: dict, epoch: int | None = None):
+        """Cache data for email.
+
+        Pass the epoch read before fetching from the database: if an
+        invalidation arrived meanwhile, the fetched data may be stale and is
+        not cached.
+        """
+        if not self.enabled:
+            return
+        data = copy_data(data)
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self._entries[email] = data
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self.epoch += 1
+            if self._entries.pop(email, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+
+    def disable(self, reason: str):
+        """Stop caching, e.g. when invalidations can no longer be trusted."""
+        logging.warning(f"User data cache disabled: {reason}")
+        with self._lock:
+            self.enabled = False
+            self._entries.clear()
+
+
+def user_cache_enabled() -> bool:
+    """Whether to cache user data: USER_CACHE=1, or by default with WORKER_MODE=multi.
+
+    With several workers, a worker's cache only learns of another worker's
+    writes through the invalidation bus, which WORKER_MODE=single does not
+    start: USER_CACHE=1 there asserts the app runs a single worker.
+    """
+    setting = os.getenv("USER_CACHE", "")
+    if setting:
+        return setting == "1"
+    return is_multi_worker()
+
+
+def get_user_cache() -> UserDataCache:
+    global _cache
+    if _cache is None:
+        _cache = UserDataCache(
+            int(os.getenv("USER_CACHE_SIZE", "1000")), user_cache_enabled()
+        )
+        if _cache.enabled:
+            start_invalidation(_cache)
+    return _cache
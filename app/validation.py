@@ -0,0 +1,146 @@
+import re
+from app.categories import known_category
+from app.recurrence import FREQUENCIES, SECTION_FREQUENCIES, with_recurrence
+
+MAX_NAME_LENGTH = 100
+MAX_CATEGORY_NAME_LENGTH = 40
+
+# Patterns shared with the forms' HTML pattern attributes, so the browser
+# refuses what the server would: keep them to syntax that Python and
+# JavaScript regexes read alike. Browsers compile them with the v flag,
+# which is stricter than Python: no named groups, and characters such as
+# "/" escaped inside classes (v rejects the whole pattern otherwise, and the
+# browser then checks nothing). Digits are [0-9]: Python's \d also takes
+# other scripts' digits, which float() would then accept. The server
+# matches them whole, like the browser does; scripts/bench_validation.py
+# checks every pattern against node.
+NAME_PATTERN = r".*\S.*"
+# pt-BR amounts: "1.234,56" with thousands dots and a decimal comma, or
+# plain digits with a decimal comma or dot ("1234,56", "1234.56"). At most
+# two decimals, which keeps "1.234" unambiguous: it is one thousand.
+AMOUNT_PATTERN = (
+    r"([0-9]{1,3}(?:\.[0-9]{3}){1,3}(?:,[0-9]{1,2})?)|[0-9]{1,12}(?:[.,][0-9]{1,2})?"
+)
+COUNT_PATTERN = r"[1-9][0-9]{0,2}"
+# Months between the payments of a custom frequency: 1 to 120.
+INTERVAL_PATTERN = r"[1-9]|[1-9][0-9]|1[01][0-9]|120"
+# A category of the user's own, one level of its path: no "/", which
+# separates the levels, and not only spaces.
+CATEGORY_NAME_PATTERN = r"[^\/]*[^\/ ][^\/]*"
+
+_NAME = re.compile(NAME_PATTERN)
+_AMOUNT = re.compile(AMOUNT_PATTERN)
+_COUNT = re.compile(COUNT_PATTERN)
+_INTERVAL = re.compile(INTERVAL_PATTERN)
+_CATEGORY_NAME = re.compile(CATEGORY_NAME_PATTERN)
+
+# The fields each section's forms send, by kind.
+SCHEMAS = {
+    "monthly_income": {"name": "name", "amount": "amount"},
+    "monthly_expenses": {
+        "name": "name",
+        "amount": "amount",
+        "category": "category",
+        "frequency": "frequency",
+        "interval_months": "interval",
+    },
+    "annual_expenses": {
+        "name": "name",
+        "amount": "amount",
+        "category": "category",
+        "frequency": "frequency",
+        "interval_months": "interval",
+    },
+    "installments": {
+        "name": "name",
+        "total_amount": "amount",
+        "count": "count",
+        "category": "category",
+    },
+}
+
+MESSAGES = {
+    "name": "Informe um nome de até 100 caracteres.",
+    "amount": "Valor inválido: use o formato 1.234,56.",
+    "count": "Número de parcelas inválido: use de 1 a 999.",
+    "interval": "Intervalo inválido: use de 1 a 120 meses.",
+    "category_name": "Informe um nome de até 40 caracteres, sem barras.",
+}
+
+
+class ValidationError(ValueError):
+    """A form value that does not parse; its message is shown to the user."""
+
+
+def parse_name(value: str) -> str:
+    name = value.strip()
+    if not _NAME.fullmatch(value) or len(name) > MAX_NAME_LENGTH:
+        raise ValidationError(MESSAGES["name"])
+    return name
+
+
+def parse_amount(value: str) -> float:
+    match = _AMOUNT.fullmatch(value)
+    if match is None:
+        raise ValidationError(MESSAGES["amount"])
+    if match.group(1):
+        value = value.replace(".", "")
+    return float(value.replace(",", "."))
+
+
+def parse_count(value: str) -> int:
+    if not _COUNT.fullmatch(value):
+        raise ValidationError(MESSAGES["count"])
+    return int(value)
+
+
+def parse_interval(value: str) -> int:
+    if not _INTERVAL.fullmatch(value):
+        raise ValidationError(MESSAGES["interval"])
+    return int(value)
+
+
+def parse_category_name(value: str) -> str:
+    name = value.strip()
+    if not _CATEGORY_NAME.fullmatch(value) or len(name) > MAX_CATEGORY_NAME_LENGTH:
+        raise ValidationError(MESSAGES["category_name"])
+    return name
+
+
+def format_amount(value: float) -> str:
+    """An amount as the forms take it back, e.g. 1234.5 -> "1234,50"."""
+    return f"{value:.2f}".replace(".", ",")
+
+
+def parse_form(section: str, form_data: dict, categories: list[str]) -> dict:
+    """The item a section's form describes, without its id.
+
+    Raises ValidationError on the first field that does not parse. An
+    unknown category falls back to its nearest known parent, or "Outros",
+    and an unknown frequency to the section's; the interval is only read
+    for custom frequencies.
+    """
+    item = {}
+    for field, kind in SCHEMAS[section].items():
+        value = form_data.get(field)
+        value = value if isinstance(value, str) else ""
+        if kind == "name":
+            item["name"] = parse_name(value)
+        elif kind == "amount":
+            item[field] = parse_amount(value)
+        elif kind == "count":
+            item["installments_count"] = parse_count(value)
+        elif kind == "frequency":
+            item["frequency"] = (
+                value if value in FREQUENCIES else SECTION_FREQUENCIES[section]
+            )
+        elif kind == "interval":
+            if item["frequency"] == "custom":
+                item["interval_months"] = parse_interval(value)
+        else:
+            item["category"] = known_category(value, categories)
+    if section == "installments":
+        item["installment_value"] = item["total_amount"] / item["installments_count"]
+    if section in SECTION_FREQUENCIES:
+        with_recurrence(section, item)
+    return item
@@ -0,0 +1,137 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+_rate_limiter = None
+_write_queue = None
+
+# How long changes a full queue turned away wait before being saved again.
+QUEUE_RETRY_SECONDS = 1.0
+
+
+class WriteQueueFull(Exception):
+    """Raised when the write queue has as many saves waiting as it may hold."""
+
+
+def write_rate() -> float:
+    """Saves per second each user may sustain; WRITE_RATE=0 turns the limit off."""
+    return float(os.getenv("WRITE_RATE", "5"))
+
+
+def write_burst() -> int:
+    """How many saves a user may make back to back before being held to the rate."""
+    return int(os.getenv("WRITE_BURST", "20"))
+
+
+def write_concurrency() -> int:
+    """How many saves run at once; keep it under the database pool size."""
+    return int(os.getenv("WRITE_CONCURRENCY", "4"))
+
+
+def write_queue_size() -> int:
+    """How many more saves may wait for their turn before new ones are turned away."""
+    return int(os.getenv("WRITE_QUEUE_SIZE", "64"))
+
+
+class RateLimiter:
+    """Token bucket per user: burst saves at once, then rate per second.
+
+    Buckets are (tokens, last refill) kept in LRU order; a user evicted
+    past max_users comes back with a full bucket, which only ever errs on
+    the side of letting a save through.
+    """
+
+    def __init__(self, rate: float, burst: int, max_users: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self.allowed = 0
+        self.throttled = 0
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, email: str, now: float | None = None) -> float:
+        """Take one of email's tokens: 0 if there was one, else seconds until there is."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(email, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+                self.allowed += 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.throttled += 1
+            self._buckets[email] = (tokens, now)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class WriteQueue:
+    """Bounds the saves of a worker running at once, and waiting to.
+
+    Store calls block, so saves run in threads, at most concurrency of them
+    at once, and the rest wait their turn in order. A user's saves run one
+    at a time: however many tabs they have open, they take one place, and
+    their saves do not race each other into conflicts. Once max_waiting
+    saves are waiting, run raises WriteQueueFull at once instead of letting
+    waits grow without bound: the caller keeps its changes and tries again
+    later.
+    """
+
+    def __init__(self, concurrency: int, max_waiting: int):
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # email -> (lock, saves holding or waiting for it)
+        self._users: dict[str, tuple[asyncio.Lock, int]] = {}
+
+    async def run(self, email: str, fn, *args):
+        lock, count = self._users.get(email, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._users[email] = (lock, count + 1)
+        try:
+            async with lock:
+                return await self._run(fn, *args)
+        finally:
+            lock, count = self._users[email]
+            if count == 1:
+                del self._users[email]
+            else:
+                self._users[email] = (lock, count - 1)
+
+    async def _run(self, fn, *args):
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise WriteQueueFull(f"{self.waiting} saves are already waiting.")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            self._semaphore.release()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(write_rate(), write_burst())
+    return _rate_limiter
+
+
+def get_write_queue() -> WriteQueue:
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = WriteQueue(write_concurrency(), write_queue_size())
+    return _write_queue
@@ -0,0 +1,114 @@
+"""Benchmark dashboard totals: Python summing against a ledger aggregation.
+
+Seeds one user with --items items, then times the two ways FinanceState can
+compute its totals: fetching and decrypting the whole document and summing
+in Python, and running the $group pipeline over the finance_items ledger,
+which holds the amounts in plaintext (LEDGER_AGGREGATION=plaintext-amounts
+in app/ledger.py). Both results are checked to agree before timing.
+
+    MONGODB_URI=mongodb://localhost:27017 python -m scripts.bench_aggregation --items 100000
+
+Run it against a real MongoDB: with mongomock:// the pipeline is evaluated
+in Python too, so the numbers say nothing about the server.
+"""
+
+import argparse
+from app.database import get_user_collection, get_ledger_collection
+from app.finance_data import empty_data, new_item_id, summarize
+from app.ledger import rebuild_ledger, aggregate_summary
+from app.recurrence import SECTION_FREQUENCIES, with_recurrence
+from app.storage import load_user_data, save_user_data
+from scripts.bench_data_keys import best_time
+
+CATEGORIES = ("Moradia", "Transporte", "Alimentação", "Saúde", "Lazer", "Outros")
+
+
+def sample_data(items: int) -> dict:
+    data = empty_data()
+    for i in range(items):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        if i % 10 == 0:
+            data["monthly_income"].append(
+                {"id": new_item_id(), "name": f"Renda {i}", "amount": 1000.0 + i}
+            )
+        elif i % 10 < 6:
+            data["monthly_expenses"].append(
+                {
+                    "id": new_item_id(),
+                    "name": f"Despesa {i}",
+                    "amount": i * 1.5,
+                    "category": category,
+                }
+            )
+        elif i % 10 < 8:
+            data["annual_expenses"].append(
+                {
+                    "id": new_item_id(),
+                    "name": f"Anual {i}",
+                    "amount": i * 12.0,
+                    "category": category,
+                }
+            )
+        else:
+            data["installments"].append(
+                {
+                    "id": new_item_id(),
+                    "name": f"Parcela {i}",
+                    "total_amount": i * 10.0,
+                    "installments_count": 10,
+                    "installment_value": float(i),
+                    "category": category,
+                }
+            )
+    # As the forms and stores produce them: with their frequency and factor.
+    for section in SECTION_FREQUENCIES:
+        for item in data[section]:
+            with_recurrence(section, item)
+    return data
+
+
+def same_summary(a: dict, b: dict) -> bool:
+    for part in ("totals", "by_category"):
+        keys = set(a[part]) | set(b[part])
+        if any(abs(a[part].get(k, 0.0) - b[part].get(k, 0.0)) > 1e-6 for k in keys):
+            return False
+    return True
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--email", default="bench-aggregation@example.com")
+    args = parser.parse_args(argv)
+    collection = get_user_collection()
+    ledger = get_ledger_collection()
+    if collection is None or ledger is None:
+        parser.error("MONGODB_URI is not set or the database is unreachable.")
+    collection.delete_one({"user_email": args.email})
+    data = sample_data(args.items)
+    saved, _ = save_user_data(collection, args.email, data, [])
+    rebuild_ledger(ledger, args.email, saved)
+
+    def python_path() -> dict:
+        return summarize(load_user_data(collection, args.email))
+
+    def ledger_path() -> dict:
+        return aggregate_summary(ledger, args.email)
+
+    if not same_summary(python_path(), ledger_path()):
+        raise SystemExit("The two paths disagree; not timing them.")
+    results = {
+        "load + decrypt + sum": best_time(python_path, args.rounds),
+        "ledger $group": best_time(ledger_path, args.rounds),
+    }
+    for name, seconds in results.items():
+        print(f"{name:<24}{seconds * 1000:>11.1f} ms")
+    base = results["load + decrypt + sum"]
+    print(f"speedup: {base / results['ledger $group']:.1f}x")
+    collection.delete_one({"user_email": args.email})
+    ledger.delete_many({"user_email": args.email})
+
+
+if __name__ == "__main__":
+    main()
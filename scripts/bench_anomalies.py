@@ -0,0 +1,157 @@
+"""Benchmark duplicate and outlier detection, and check it against brute force.
+
+Generates --items expenses named from a small vocabulary with log-normal
+amounts, then re-enters 1% of them with the name's case and spacing
+changed and the amount off by under 1%, and multiplies 0.2% by twenty.
+Times building the blocking index, reading the alerts the dashboard
+shows, and adding (then removing) one expense with its warning, against
+comparing every pair of expenses. On --check items, the duplicates and
+outliers found must be exactly those brute force finds; exits non-zero
+otherwise.
+
+    python -m scripts.bench_anomalies --items 50000
+"""
+
+import time
+import random
+import argparse
+from app.anomalies import (
+    EXPENSE_SECTIONS,
+    ExpenseIndex,
+    is_outlier,
+    name_key,
+    same_amount,
+)
+from app.finance_data import empty_data, new_item_id, summarize
+from app.search_index import item_amount
+from app.categories import CATEGORIES
+from scripts.bench_backends import percentiles, timed
+
+NAMES = [f"Conta {k}" for k in range(500)]
+
+
+def expense(section: str, name: str, amount: float, category: str) -> dict:
+    item = {"id": new_item_id(), "name": name, "category": category}
+    if section == "installments":
+        item.update(total_amount=amount * 10, installments_count=10)
+        item["installment_value"] = amount
+    else:
+        item["amount"] = amount
+    return item
+
+
+def sample(items: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    data = empty_data()
+    for _ in range(items):
+        section = rng.choice(EXPENSE_SECTIONS)
+        amount = round(rng.lognormvariate(4, 1), 2)
+        data[section].append(
+            expense(section, rng.choice(NAMES), amount, rng.choice(CATEGORIES))
+        )
+    for _ in range(items // 100):
+        section = rng.choice(EXPENSE_SECTIONS)
+        original = rng.choice(data[section])
+        amount = round(item_amount(section, original) * rng.uniform(0.995, 1.005), 2)
+        name = f" {original['name'].upper()}  "
+        data[section].append(expense(section, name, amount, original["category"]))
+    for _ in range(items // 500):
+        section = rng.choice(EXPENSE_SECTIONS)
+        original = rng.choice(data[section])
+        amount = round(item_amount(section, original) * 20, 2)
+        data[section].append(
+            expense(section, original["name"], amount, original["category"])
+        )
+    return data
+
+
+def flat(data: dict) -> list[tuple[str, dict]]:
+    return [(section, item) for section in EXPENSE_SECTIONS for item in data[section]]
+
+
+def brute_duplicates(items: list[tuple[str, dict]]) -> set[str]:
+    keys = [
+        (name_key(item["name"]), item["category"], item_amount(section, item))
+        for section, item in items
+    ]
+    found = set()
+    for i, (name, category, amount) in enumerate(keys):
+        for j in range(i + 1, len(keys)):
+            other = keys[j]
+            if (
+                name == other[0]
+                and category == other[1]
+                and same_amount(amount, other[2])
+            ):
+                found.update((items[i][1]["id"], items[j][1]["id"]))
+    return found
+
+
+def check(items: int, seed: int) -> tuple[list[str], float]:
+    data = sample(items, seed)
+    index = ExpenseIndex.build(data)
+    failures = []
+    started = time.perf_counter()
+    expected = brute_duplicates(flat(data))
+    seconds = time.perf_counter() - started
+    found = {item["id"] for _, item, _ in index.duplicate_items(limit=None)}
+    if found != expected:
+        failures.append(
+            f"duplicates: {len(found - expected)} extra, {len(expected - found)} missed"
+        )
+    stats = summarize(data)["stats"]
+    expected = {
+        item["id"]
+        for section, item in flat(data)
+        if is_outlier(index.entries[item["id"]][3], stats.get(item["category"]))
+    }
+    found = {item["id"] for _, item in index.outliers(stats, limit=None)}
+    if found != expected:
+        failures.append(
+            f"outliers: {len(found - expected)} extra, {len(expected - found)} missed"
+        )
+    return failures, seconds
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--check", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    failures, brute_seconds = check(args.check, args.seed)
+    print(f"checked {args.check} items against brute force: {failures or 'ok'}")
+
+    data = sample(args.items, args.seed)
+    total = len(flat(data))
+    started = time.perf_counter()
+    index = ExpenseIndex.build(data)
+    print(f"{total} expenses, index built in {time.perf_counter() - started:.2f}s")
+    stats = summarize(data)["stats"]
+
+    def alerts():
+        index.duplicate_items()
+        index.outliers(stats)
+
+    item = expense("monthly_expenses", "Conta 7", 123.45, "Moradia")
+
+    def add():
+        item["id"] = new_item_id()
+        index.add("monthly_expenses", item)
+        is_outlier(index.entries[item["id"]][3], stats.get("Moradia"))
+        index.remove(item["id"])
+
+    print(f"{'':<26}{'p50':>10}{'p99':>10}")
+    for label, fn in (("alerts", alerts), ("add + warning + remove", add)):
+        p50, p99 = percentiles(timed(fn, args.rounds))
+        print(f"{label:<26}{p50:>8.3f}ms{p99:>8.3f}ms")
+    pairwise = brute_seconds * (total / len(flat(sample(args.check, args.seed)))) ** 2
+    print(f"pairwise comparison at {total} expenses: ~{pairwise:.0f}s (extrapolated)")
+    if failures:
+        raise SystemExit("Detection disagrees with brute force.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Benchmark the cost of checking a session's sign-in, per event.
+
+Signs --users ID tokens with a locally generated RSA key, whose self-signed
+certificate is served the way Google serves its own, over HTTP on
+localhost with a max-age. Times --events checks on three paths: the
+library's verify_oauth2_token pointed at that server (before: certificates
+fetched and signature checked on every check), app/token_cache.py's
+verifier with the certificates cached but no verified claims, and with
+both caches warm (after: a dictionary lookup). Then times the same events
+through the states, as the server runs them: the client setting
+token_response_json, as it does on every page load and reconnect, then
+FinanceState._session_email. Over the network Google's certificates take
+far longer to fetch than from localhost, so the before numbers are a floor.
+
+Also checks that tokens that are forged, expired or for another client
+are refused by the cached verifier as they are by the library; exits
+non-zero otherwise.
+
+    python -m scripts.bench_auth --users 100 --events 2000
+"""
+
+import json
+import time
+import asyncio
+import argparse
+import datetime
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, exceptions, jwt
+from google.auth.transport import requests as google_requests
+from google.oauth2 import id_token as google_id_token
+from reflex.istate.manager.memory import StateManagerMemory
+from reflex.istate.manager.token import BaseStateToken
+import reflex_google_auth.state as google_auth_state
+from app.states.auth_state import AuthState
+from app.states.finance_state import FinanceState
+from app.token_cache import GOOGLE_ISSUERS, CertCache, TokenVerifier, VerifiedClaims
+from scripts.bench_backends import percentiles
+
+CLIENT_ID = "bench-client.apps.googleusercontent.com"
+KEY_ID = "bench-key"
+
+
+def make_key(key_id: str) -> tuple[crypt.RSASigner, str]:
+    """A signer, and the PEM certificate of its key, as Google publishes them."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, key_id)])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode()
+    return crypt.RSASigner.from_string(private_pem, key_id), cert_pem
+
+
+def make_token(signer, email: str, audience: str = CLIENT_ID, ttl: int = 3600) -> str:
+    now = int(time.time())
+    claims = {
+        "iss": GOOGLE_ISSUERS[1],
+        "aud": audience,
+        "sub": email,
+        "email": email,
+        "email_verified": True,
+        "name": email.split("@")[0],
+        "picture": "",
+        "iat": now,
+        "exp": now + ttl,
+    }
+    return jwt.encode(signer, claims).decode()
+
+
+def serve_certs(certs: dict[str, str]) -> ThreadingHTTPServer:
+    body = json.dumps(certs).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Cache-Control", "public, max-age=3600")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def library_verifier(certs_url: str):
+    """verify_oauth2_token, pointed at certs_url instead of Google."""
+
+    def verify(token, audience=None):
+        claims = google_id_token.verify_token(
+            token, google_requests.Request(), audience, certs_url=certs_url
+        )
+        if claims["iss"] not in GOOGLE_ISSUERS:
+            raise exceptions.GoogleAuthError("Wrong issuer.")
+        return claims
+
+    return verify
+
+
+def time_checks(verify, tokens: list[str], events: int) -> list[float]:
+    latencies = []
+    for event in range(events):
+        token = tokens[event % len(tokens)]
+        started = time.perf_counter()
+        verify(token, CLIENT_ID)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def refused(verify, token: str) -> bool:
+    try:
+        verify(token, CLIENT_ID)
+    except Exception:
+        return True
+    return False
+
+
+async def time_events(verify, tokens: list[str], events: int) -> list[float]:
+    """Each event sets a session's token, as hydration does, then reads its email."""
+    google_auth_state.verify_oauth2_token = (
+        lambda id_token, request, audience=None, **kwargs: verify(id_token, audience)
+    )
+    google_auth_state.CLIENT_ID = CLIENT_ID
+    manager = StateManagerMemory()
+    latencies = []
+    for event in range(events):
+        session = event % len(tokens)
+        token = BaseStateToken(ident=f"bench-auth-{session}", cls=FinanceState)
+        async with manager.modify_state(token) as root:
+            started = time.perf_counter()
+            auth = await root.get_state(AuthState)
+            auth.token_response_json = json.dumps({"id_token": tokens[session]})
+            finance = await root.get_state(FinanceState)
+            email = await finance._session_email()
+            latencies.append(time.perf_counter() - started)
+            root._clean()
+        if email is None:
+            raise SystemExit(f"Session {session} was not signed in.")
+    return latencies
+
+
+def report(label: str, latencies: list[float]):
+    p50, p99 = percentiles(latencies)
+    mean = sum(latencies) / len(latencies) * 1000
+    print(f"{label:<28}{mean:>10.3f}{p50:>10.3f}{p99:>10.3f}")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--events", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    signer, cert = make_key(KEY_ID)
+    server = serve_certs({KEY_ID: cert})
+    certs_url = f"http://127.0.0.1:{server.server_address[1]}/certs"
+    tokens = [
+        make_token(signer, f"bench-auth-{i}@example.com") for i in range(args.users)
+    ]
+
+    library = library_verifier(certs_url)
+    certs_only = TokenVerifier(CertCache(certs_url), VerifiedClaims(0))
+    cached = TokenVerifier(CertCache(certs_url), VerifiedClaims(args.users))
+
+    failures = []
+    for token in tokens[:5]:
+        if cached.verify(token, CLIENT_ID) != library(token, CLIENT_ID):
+            failures.append("claims differ from the library's")
+    forger, _ = make_key(KEY_ID)
+    for label, token in (
+        ("forged", make_token(forger, "forged@example.com")),
+        ("expired", make_token(signer, "expired@example.com", ttl=-60)),
+        ("other client", make_token(signer, "other@example.com", audience="other")),
+    ):
+        if not refused(library, token) or not refused(cached.verify, token):
+            failures.append(f"{label} token accepted")
+
+    print(f"{args.events} checks of {args.users} users' tokens")
+    print(f"{'ms per check':<28}{'mean':>10}{'p50':>10}{'p99':>10}")
+    report("before (library)", time_checks(library, tokens, args.events))
+    report("certificates cached", time_checks(certs_only.verify, tokens, args.events))
+    cached.claims.clear()
+    report("after (claims cached)", time_checks(cached.verify, tokens, args.events))
+    print(
+        f"certificate fetches: {cached.certs.fetches}, claims hit rate"
+        f" {cached.claims.stats()['hit_rate']:.1%}"
+    )
+
+    print(f"{'ms per event':<28}{'mean':>10}{'p50':>10}{'p99':>10}")
+    report("before (library)", asyncio.run(time_events(library, tokens, args.events)))
+    report(
+        "after (claims cached)",
+        asyncio.run(time_events(cached.verify, tokens, args.events)),
+    )
+    server.shutdown()
+    if failures:
+        raise SystemExit("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Compare save and load latency across storage backends.
+
+Runs the same workload against every backend available: SQLite in a
+temporary file always, and MongoDB in both layouts when MONGODB_URI is set.
+Each backend gets a user with --items items, then --writes single-item
+saves (the common case in the app) and --loads full loads, all with
+encryption. Latencies are reported as p50/p99.
+
+    python -m scripts.bench_backends --items 1000 --writes 2000
+    MONGODB_URI=mongodb://localhost:27017 python -m scripts.bench_backends
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from app.database import get_user_collection, get_item_collection
+from app.finance_data import SECTIONS, add_op, new_item_id
+from app.sqlite_store import SqliteStore
+from app.storage import DocumentStore, ItemStore
+from scripts.bench_aggregation import sample_data
+
+EMAIL = "bench-backends@example.com"
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2]
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return p50 * 1000, p99 * 1000
+
+
+def timed(fn, times: int) -> list[float]:
+    samples = []
+    for _ in range(times):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def measure(store, args) -> dict:
+    data = sample_data(args.items)
+    store.save_ops(
+        EMAIL, [add_op(section, item) for section in SECTIONS for item in data[section]]
+    )
+
+    def write():
+        item = {
+            "id": new_item_id(),
+            "name": "Café",
+            "amount": 4.5,
+            "category": "Outros",
+        }
+        store.save_ops(EMAIL, [add_op("monthly_expenses", item)])
+
+    return {
+        "save": percentiles(timed(write, args.writes)),
+        "load": percentiles(timed(lambda: store.load(EMAIL), args.loads)),
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--loads", type=int, default=50)
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {"sqlite": SqliteStore(os.path.join(tmp, "bench.db"))}
+        if os.getenv("MONGODB_URI"):
+            collection, items = get_user_collection(), get_item_collection()
+            if collection is None or items is None:
+                parser.error("MONGODB_URI is set but the database is unreachable.")
+            collection.delete_one({"user_email": EMAIL})
+            items.delete_many({"user_email": EMAIL})
+            stores["mongodb (document)"] = DocumentStore(collection)
+            stores["mongodb (items)"] = ItemStore(collection, items)
+        print(f"{args.items} items, {args.writes} saves, {args.loads} loads")
+        print(
+            f"{'':<20}{'save p50':>10}{'save p99':>10}{'load p50':>10}{'load p99':>10}"
+        )
+        for name, store in stores.items():
+            results = measure(store, args)
+            save, load = results["save"], results["load"]
+            print(
+                f"{name:<20}{save[0]:>8.3f}ms{save[1]:>8.3f}ms"
+                f"{load[0]:>8.1f}ms{load[1]:>8.1f}ms",
+                flush=True,
+            )
+            if isinstance(store, (DocumentStore, ItemStore)):
+                store.collection.delete_one({"user_email": EMAIL})
+                get_item_collection().delete_many({"user_email": EMAIL})
+
+
+if __name__ == "__main__":
+    main()
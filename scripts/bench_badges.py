@@ -0,0 +1,134 @@
+"""Benchmark category badges: the style lookup table against rx.match chains.
+
+Compiles the index page with each badge and reports its size, raw and
+gzipped. Then compiles a list of --rows badges to JavaScript and, with node
+(skipped if it is not installed), times rendering it --rounds times, with
+jsx creating plain objects so only the badges' own code is timed, not
+React's. Both badges must give every row the same class and icon; exits
+non-zero otherwise.
+
+    python -m scripts.bench_badges --rows 5000
+"""
+
+import gzip
+import json
+import random
+import shutil
+import argparse
+import subprocess
+import reflex as rx
+from reflex.compiler import compiler
+import app.components.alerts as alerts
+import app.components.lists as lists
+import app.components.search as search
+from app.app import index
+from app.categories import CATEGORIES, CATEGORY_DEFINITIONS
+
+BADGE_MODULES = (lists, alerts, search)
+
+
+def match_badge(category) -> rx.Component:
+    """category_badge as it was: one rx.match for its icon, one for its class."""
+    icon_cases = [
+        (cat, details["icon"]) for cat, details in CATEGORY_DEFINITIONS.items()
+    ]
+    icon_name = rx.match(category, *icon_cases, CATEGORY_DEFINITIONS["Outros"]["icon"])
+    cls_cases = [
+        (cat, f"{lists.BADGE_CLS} {details['color_cls']}")
+        for cat, details in CATEGORY_DEFINITIONS.items()
+    ]
+    default_cls = f"{lists.BADGE_CLS} {CATEGORY_DEFINITIONS['Outros']['color_cls']}"
+    return rx.el.span(
+        rx.icon(icon_name, class_name="w-3 h-3 mr-1.5"),
+        category,
+        class_name=rx.match(category, *cls_cases, default_cls),
+        title=category,
+    )
+
+
+def compile_index(badge) -> bytes:
+    for module in BADGE_MODULES:
+        module.category_badge = badge
+    _, code = compiler.compile_page("index", rx.fragment(index()))
+    return code.encode()
+
+
+def rows_js(badge) -> tuple[str, str]:
+    """The module code, and the expression rendering the rows, for badge."""
+    rows = rx.Var("rows", _var_type=list[dict])
+    component = rx.fragment(rx.foreach(rows, lambda item: badge(item["category"])))
+    custom_code = "\n".join(component._get_all_custom_code())
+    return custom_code, str(component.children[0])
+
+
+NODE_BENCH = """
+const jsx = (type, props, ...children) => ({type, props, children});
+const DynamicIcon = "DynamicIcon";
+const rows = %(rows)s;
+const results = {};
+for (const [name, render] of Object.entries(renders)) {
+  render(rows);
+  const times = [];
+  for (let round = 0; round < %(rounds)d; round++) {
+    const started = process.hrtime.bigint();
+    render(rows);
+    times.push(Number(process.hrtime.bigint() - started) / 1e6);
+  }
+  times.sort((a, b) => a - b);
+  const out = render(rows).map((row) => [row.props.className, row.children[0].props.name]);
+  results[name] = {p50: times[times.length >> 1], best: times[0], out};
+}
+console.log(JSON.stringify(results));
+"""
+
+
+def time_renders(badges: dict, rows: list[dict], rounds: int) -> dict | None:
+    node = shutil.which("node")
+    if node is None:
+        return None
+    parts = ["const renders = {};"]
+    for name, badge in badges.items():
+        custom_code, render = rows_js(badge)
+        parts.append(
+            f"renders[{json.dumps(name)}] = (() => {{\n{custom_code}\n"
+            f"return (rows) => {render};\n}})();"
+        )
+    script = "\n".join(parts) + NODE_BENCH % {
+        "rows": json.dumps(rows),
+        "rounds": rounds,
+    }
+    result = subprocess.run(
+        [node, "-"], input=script, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args(argv)
+    badges = {"rx.match": match_badge, "lookup table": lists.category_badge}
+
+    print(f"{'index page':<16}{'bytes':>10}{'gzip':>10}")
+    for name, badge in badges.items():
+        code = compile_index(badge)
+        print(f"{name:<16}{len(code):>10}{len(gzip.compress(code)):>10}")
+
+    random.seed(0)
+    categories = CATEGORIES + ["Sem categoria", ""]
+    rows = [{"category": random.choice(categories)} for _ in range(args.rows)]
+    results = time_renders(badges, rows, args.rounds)
+    if results is None:
+        print("node is not installed: render times skipped.")
+        return
+    print(f"{args.rows} rows, ms per render{'p50':>10}{'best':>10}")
+    for name, result in results.items():
+        print(f"{name:<31}{result['p50']:>10.2f}{result['best']:>10.2f}")
+    outputs = [result["out"] for result in results.values()]
+    if any(out != outputs[0] for out in outputs):
+        raise SystemExit("The badges differ.")
+
+
+if __name__ == "__main__":
+    main()
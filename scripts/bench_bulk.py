@@ -0,0 +1,190 @@
+"""Count store writes for bulk edits against editing one item at a time.
+
+For each --sizes N, seeds a user with N monthly expenses in a temporary
+SQLite store (or MongoDB, document layout, with --mongodb and MONGODB_URI),
+opens a FinanceState session on it the way the server does, and removes,
+recategorizes and moves all N of them: once through the per-item events
+(remove_monthly_expense, save_edit, and a remove then add_annual_expense
+for a move), and once by selecting them all and sending bulk_remove,
+bulk_recategorize or bulk_move. The session's store counts the saves made
+through it. Exits non-zero if a bulk event saves anything but exactly once,
+or leaves the stored items other than it should.
+
+    python -m scripts.bench_bulk --sizes 10,100,1000
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from reflex.istate.manager.memory import StateManagerMemory
+from reflex.istate.manager.token import BaseStateToken
+
+os.environ["AUTH_FAKE_TOKENS"] = "1"
+# One session makes every save here: the per-user write rate must not refuse them.
+os.environ["WRITE_RATE"] = "0"
+
+import app.states.finance_state as finance_state  # noqa: E402
+from app.database import get_user_collection  # noqa: E402
+from app.fake_tokens import make_fake_token  # noqa: E402
+from app.finance_data import add_op, empty_data, new_item_id  # noqa: E402
+from app.sqlite_store import SqliteStore  # noqa: E402
+from app.states.auth_state import AuthState  # noqa: E402
+from app.states.finance_state import FinanceState  # noqa: E402
+from app.storage import DocumentStore  # noqa: E402
+
+EMAIL = "bench-bulk-{}@example.com"
+KINDS = ("remove", "recategorize", "move")
+
+
+class CountingStore:
+    """Counts the saves made through it; everything else goes to store."""
+
+    def __init__(self, store):
+        self.store = store
+        self.writes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def save(self, email, data, ops):
+        self.writes += 1
+        return self.store.save(email, data, ops)
+
+    def save_ops(self, email, ops, *args):
+        self.writes += 1
+        return self.store.save_ops(email, ops, *args)
+
+
+def seed(store, email: str, n: int):
+    data = empty_data()
+    data["monthly_expenses"] = [
+        {
+            "id": new_item_id(),
+            "name": f"Despesa {i}",
+            "amount": 10.0,
+            "category": "Outros",
+        }
+        for i in range(n)
+    ]
+    ops = [add_op("monthly_expenses", item) for item in data["monthly_expenses"]]
+    store.save(email, data, ops)
+
+
+async def call(finance: FinanceState, handler: str, *args):
+    result = FinanceState.event_handlers[handler].fn(finance, *args)
+    if asyncio.iscoroutine(result):
+        await result
+
+
+async def one_by_one(finance: FinanceState, kind: str):
+    """The per-item events, one save each (two for a move)."""
+    for _ in range(len(finance.monthly_expenses)):
+        if kind == "remove":
+            await call(finance, "remove_monthly_expense", 0)
+        elif kind == "recategorize":
+            index = next(
+                i
+                for i, item in enumerate(finance.monthly_expenses)
+                if item["category"] != "Lazer"
+            )
+            await call(finance, "start_edit_monthly_expense", index)
+            form = {**finance.editing_item_data, "category": "Lazer"}
+            await call(finance, "save_edit", form)
+        else:
+            item = finance.monthly_expenses[0]
+            form = {"name": item["name"], "amount": "10,00", "category": "Outros"}
+            await call(finance, "remove_monthly_expense", 0)
+            await call(finance, "add_annual_expense", form)
+
+
+async def bulk(finance: FinanceState, kind: str):
+    await call(finance, "select_all", "monthly_expenses")
+    if kind == "remove":
+        await call(finance, "bulk_remove", "monthly_expenses")
+    elif kind == "recategorize":
+        await call(finance, "bulk_recategorize", "monthly_expenses", "Lazer")
+    else:
+        await call(finance, "bulk_move", "monthly_expenses")
+
+
+def edited(store, email: str, kind: str, n: int) -> bool:
+    """Whether the stored items are all n of them, edited as kind says."""
+    data = store.load(email)
+    monthly, annual = data["monthly_expenses"], data["annual_expenses"]
+    if kind == "remove":
+        return not monthly and not annual
+    if kind == "recategorize":
+        return len(monthly) == n and all(i["category"] == "Lazer" for i in monthly)
+    return not monthly and len(annual) == n
+
+
+async def run(store: CountingStore, n: int, kind: str, plan) -> tuple[int, float, bool]:
+    email = EMAIL.format(f"{kind}-{n}-{plan.__name__}")
+    seed(store.store, email, n)
+    token = BaseStateToken(
+        ident=f"bench-bulk-{kind}-{n}-{plan.__name__}", cls=FinanceState
+    )
+    async with StateManagerMemory().modify_state(token) as root:
+        root.router_data = root._update_router_vars(
+            {"token": token.ident, "pathname": "/"}, {}
+        )
+        auth = await root.get_state(AuthState)
+        auth.token_response_json = json.dumps({"id_token": make_fake_token(email)})
+        finance = await root.get_state(FinanceState)
+        await call(finance, "load_data")
+        store.writes = 0
+        started = time.perf_counter()
+        await plan(finance, kind)
+        elapsed = time.perf_counter() - started
+    return store.writes, elapsed, edited(store.store, email, kind, n)
+
+
+async def measure(store: CountingStore, sizes: list[int]) -> list[str]:
+    failures = []
+    print(f"{'':<14}{'N':>6}{'one by one':>20}{'bulk':>20}")
+    for n in sizes:
+        for kind in KINDS:
+            single = await run(store, n, kind, one_by_one)
+            batched = await run(store, n, kind, bulk)
+            if batched[0] != 1:
+                failures.append(f"bulk {kind} of {n} made {batched[0]} saves")
+            if not (single[2] and batched[2]):
+                failures.append(f"{kind} of {n} left the wrong items stored")
+            print(
+                f"{kind:<14}{n:>6}"
+                f"{single[0]:>7} writes{single[1] * 1000:>7.1f}ms"
+                f"{batched[0]:>7} writes{batched[1] * 1000:>7.1f}ms"
+            )
+    return failures
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--mongodb", action="store_true")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.mongodb:
+            collection = get_user_collection()
+            if collection is None:
+                parser.error("MONGODB_URI is not set or the database is unreachable.")
+            collection.delete_many({"user_email": {"$regex": "^bench-bulk-"}})
+            inner = DocumentStore(collection)
+        else:
+            inner = SqliteStore(os.path.join(tmp, "bench.db"))
+        store = CountingStore(inner)
+        # The sessions save through the counting store.
+        finance_state.get_store = lambda: store
+        sizes = [int(size) for size in args.sizes.split(",")]
+        failures = asyncio.run(measure(store, sizes))
+        if args.mongodb:
+            collection.delete_many({"user_email": {"$regex": "^bench-bulk-"}})
+    if failures:
+        raise SystemExit("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
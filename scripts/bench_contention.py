@@ -0,0 +1,92 @@
+"""Contention benchmark: many sessions of one user saving at the same time.
+
+Each simulated session loads the document once, then keeps adding items and
+saving, always from whatever version it last saw, like several open tabs.
+"versioned" uses save_user_data (conditional update, merge on conflict);
+"blind" is the old replace_one of the whole document. Lost updates are items
+added by some session but missing from the final document.
+
+    python -m scripts.bench_contention --sessions 8 --writes 200
+
+Sessions are interleaved in one thread by default, which works on mongomock.
+Against a real server (MONGODB_URI) pass --threads for true parallelism.
+"""
+
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from app.database import get_user_collection
+from app.finance_data import empty_data, encrypt_data, new_item_id, add_op
+from app.storage import load_user_data, save_user_data
+
+EMAIL = "contention-bench@example.com"
+
+
+class Session:
+    def __init__(self, collection, mode: str):
+        self.collection = collection
+        self.mode = mode
+        self.data = load_user_data(collection, EMAIL) or empty_data()
+        self.added = []
+        self.merges = 0
+
+    def write(self):
+        item = {"id": new_item_id(), "name": "Item", "amount": 1.0}
+        self.data["monthly_income"].append(item)
+        self.added.append(item["id"])
+        if self.mode == "blind":
+            doc = {"user_email": EMAIL, **encrypt_data(self.data)}
+            self.collection.replace_one({"user_email": EMAIL}, doc, upsert=True)
+            return
+        ops = [add_op("monthly_income", item)]
+        self.data, merged = save_user_data(self.collection, EMAIL, self.data, ops)
+        self.merges += merged
+
+
+def run(collection, mode: str, sessions: int, writes: int, threads: bool) -> dict:
+    collection.delete_many({"user_email": EMAIL})
+    pool = [Session(collection, mode) for _ in range(sessions)]
+    started = time.perf_counter()
+    if threads:
+        with ThreadPoolExecutor(sessions) as executor:
+            for session in pool:
+                executor.submit(lambda s=session: [s.write() for _ in range(writes)])
+    else:
+        turns = [session for session in pool for _ in range(writes)]
+        random.shuffle(turns)
+        for session in turns:
+            session.write()
+    elapsed = time.perf_counter() - started
+    stored = load_user_data(collection, EMAIL) or empty_data()
+    stored_ids = {item["id"] for item in stored["monthly_income"]}
+    added = [item_id for session in pool for item_id in session.added]
+    return {
+        "mode": mode,
+        "saves_per_s": len(added) / elapsed,
+        "lost_updates": sum(1 for item_id in added if item_id not in stored_ids),
+        "merges": sum(session.merges for session in pool),
+        "total_writes": len(added),
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=100, help="per session")
+    parser.add_argument("--threads", action="store_true")
+    args = parser.parse_args(argv)
+    collection = get_user_collection()
+    if collection is None:
+        parser.error("Set MONGODB_URI (mongomock://localhost works).")
+    for mode in ("blind", "versioned"):
+        result = run(collection, mode, args.sessions, args.writes, args.threads)
+        print(
+            f"{result['mode']:<10} {result['saves_per_s']:>8.0f} saves/s  "
+            f"{result['lost_updates']:>5}/{result['total_writes']} lost  "
+            f"{result['merges']:>5} merges"
+        )
+
+
+if __name__ == "__main__":
+    main()
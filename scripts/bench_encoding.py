@@ -0,0 +1,106 @@
+"""Benchmark the compact storage encoding against the legacy one.
+
+Seeds one user with --items items under each encoding: legacy (full field
+names, base64 "kid:token" amounts), compact (field codes, category codes,
+one binary ciphertext per item) and, in the document layout with the
+zstandard package installed, compact with zstd-compressed sections. Reports
+the BSON size of what is stored and the best-of-rounds time of a full
+load, and of decoding an already fetched document or items alone. Every
+encoding must load back exactly the data that was saved; exits non-zero
+otherwise.
+
+    MONGODB_URI=mongodb://localhost:27017 python -m scripts.bench_encoding --items 20000
+"""
+
+import os
+import argparse
+import bson
+from app.compact import zstandard
+from app.database import get_user_collection, get_item_collection
+from app.finance_data import SECTIONS, add_op, decrypt_data, decrypt_item
+from app.key_cache import get_data_cipher
+from app.storage import DocumentStore, ItemStore, unpack_sections
+from scripts.bench_aggregation import sample_data
+from scripts.bench_data_keys import best_time
+
+EMAIL = "bench-encoding@example.com"
+
+ENCODINGS = {
+    "legacy": {"STORAGE_ENCODING": "legacy", "STORAGE_COMPRESSION": ""},
+    "compact": {"STORAGE_ENCODING": "compact", "STORAGE_COMPRESSION": ""},
+    "compact + zstd": {"STORAGE_ENCODING": "compact", "STORAGE_COMPRESSION": "zstd"},
+}
+
+
+def stored_docs(layout: str, collection, items) -> list[dict]:
+    if layout == "items":
+        return list(items.find({"user_email": EMAIL}))
+    return [collection.find_one({"user_email": EMAIL})]
+
+
+def decode(layout: str, docs: list[dict], data_key: str) -> dict | list[dict]:
+    if layout == "items":
+        cipher = get_data_cipher(data_key)
+        return [
+            decrypt_item(doc["kind"], {**doc, "id": doc["item_id"]}, cipher)
+            for doc in docs
+        ]
+    return decrypt_data(unpack_sections(docs[0]))
+
+
+def same_items(loaded: dict, data: dict) -> bool:
+    return all(loaded[section] == data[section] for section in SECTIONS)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--layout", choices=("document", "items"), default="document")
+    args = parser.parse_args(argv)
+    collection = get_user_collection()
+    items = get_item_collection()
+    if collection is None or items is None:
+        parser.error("MONGODB_URI is not set or the database is unreachable.")
+
+    data = sample_data(args.items)
+    ops = [add_op(section, item) for section in SECTIONS for item in data[section]]
+    print(f"{args.layout} layout, {args.items} items")
+    print(f"{'':<16}{'bytes':>12}{'B/item':>8}{'load ms':>10}{'decode ms':>11}")
+    base = None
+    failures = []
+    for name, env in ENCODINGS.items():
+        if env["STORAGE_COMPRESSION"] and (args.layout == "items" or zstandard is None):
+            print(f"{name:<16}skipped (document layout and zstandard only)")
+            continue
+        os.environ.update(env)
+        collection.delete_one({"user_email": EMAIL})
+        items.delete_many({"user_email": EMAIL})
+        if args.layout == "items":
+            store = ItemStore(collection, items)
+        else:
+            store = DocumentStore(collection)
+        saved, _ = store.save(EMAIL, data, ops)
+        docs = stored_docs(args.layout, collection, items)
+        size = sum(len(bson.encode(doc)) for doc in docs)
+        if not same_items(store.load(EMAIL), data):
+            failures.append(name)
+        load_ms = best_time(lambda: store.load(EMAIL), args.rounds) * 1000
+        decode_ms = (
+            best_time(lambda: decode(args.layout, docs, saved["data_key"]), args.rounds)
+            * 1000
+        )
+        base = base or (size, load_ms, decode_ms)
+        print(
+            f"{name:<16}{size:>12}{size / args.items:>8.0f}{load_ms:>10.1f}{decode_ms:>11.1f}"
+            f"   ({size / base[0]:.1%} of the bytes, {load_ms / base[1]:.1%} of the"
+            f" load time, {decode_ms / base[2]:.1%} of the decode time)"
+        )
+    collection.delete_one({"user_email": EMAIL})
+    items.delete_many({"user_email": EMAIL})
+    if failures:
+        raise SystemExit(f"Data did not load back as saved: {', '.join(failures)}.")
+
+
+if __name__ == "__main__":
+    main()
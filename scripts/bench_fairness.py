@@ -0,0 +1,92 @@
+"""Check that one user hammering saves does not slow everyone else down.
+
+Runs --users ordinary users of scripts/load_test.py at --rate for
+--duration, first alone and then alongside one heavy user: --heavy-tabs
+tabs of one account adding expenses back to back, as a script would.
+Reports the ordinary users' latencies in both phases and how many adds the
+heavy user got through; exits non-zero if the ordinary users' p99 grows
+past --max-ratio times what it was without the heavy user. Compare a
+backend with the default write limits against one started with WRITE_RATE=0:
+
+    AUTH_FAKE_TOKENS=1 MONGODB_URI=mongomock://localhost reflex run --backend-only
+    python -m scripts.bench_fairness --users 20 --heavy-tabs 4
+"""
+
+import time
+import asyncio
+import argparse
+from scripts.load_test import (
+    DEFAULT_MIX,
+    Stats,
+    VirtualUser,
+    finance_event,
+    parse_mix,
+)
+
+HEAVY_EMAIL = "fairness-heavy@example.com"
+
+
+async def connect(user: VirtualUser):
+    await user.connect()
+    await user.send(finance_event("load_data"))
+
+
+async def run_phase(args, heavy_tabs: int) -> tuple[dict, dict]:
+    """The ordinary users' report, and the heavy user's, for one phase."""
+    users = [
+        VirtualUser(args.url, f"fairness-{i}@example.com", args.timeout)
+        for i in range(args.users)
+    ]
+    tabs = [VirtualUser(args.url, HEAVY_EMAIL, args.timeout) for _ in range(heavy_tabs)]
+    for user in users + tabs:
+        await connect(user)
+    stats, heavy = Stats(), Stats()
+    weights = parse_mix(args.mix)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(
+        *(user.run(weights, args.rate, deadline, stats) for user in users),
+        *(tab.run({"add": 1}, 0, deadline, heavy) for tab in tabs),
+    )
+    elapsed = time.perf_counter() - started
+    await asyncio.gather(*(user.close() for user in users + tabs))
+    return stats.report(elapsed), heavy.report(elapsed)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20, help="ordinary users")
+    parser.add_argument("--rate", type=float, default=1.0, help="operations/s per user")
+    parser.add_argument("--heavy-tabs", type=int, default=4)
+    parser.add_argument(
+        "--duration", type=float, default=20.0, help="seconds per phase"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=10.0, help="per event, seconds"
+    )
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights")
+    parser.add_argument("--max-ratio", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    quiet, _ = asyncio.run(run_phase(args, 0))
+    loaded, heavy = asyncio.run(run_phase(args, args.heavy_tabs))
+    print(f"{'ordinary users':<22}{'ops':>7}{'errors':>8}{'ops/s':>8}{'p99':>10}")
+    for label, report in (("alone", quiet), ("with heavy user", loaded)):
+        print(
+            f"{label:<22}{report['completed']:>7}{report['errors']:>8}"
+            f"{report['throughput_ops_s']:>8.1f}{report['p99_ms']:>8.1f}ms"
+        )
+    print(
+        f"heavy user: {heavy['completed']} adds from {args.heavy_tabs} tabs"
+        f" ({heavy['throughput_ops_s']:.1f}/s), {heavy['refused']} refused,"
+        f" {heavy['errors']} errors"
+    )
+    ratio = loaded["p99_ms"] / quiet["p99_ms"] if quiet["p99_ms"] else 0.0
+    print(f"p99 with the heavy user: {ratio:.2f}x")
+    if ratio > args.max_ratio or loaded["errors"]:
+        raise SystemExit("The heavy user degraded the other users.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare the document and items layouts: bytes written per edit, load time.
+
+Seeds one user with --items items in each layout, then edits one item
+--rounds times and loads the data --rounds times, through the same stores
+FinanceState uses. Bytes written are the BSON size of the update payloads
+each store sends for a one-item edit; times are best of rounds.
+
+    MONGODB_URI=mongodb://localhost:27017 python -m scripts.bench_layouts --items 5000
+"""
+
+import time
+import argparse
+import bson
+from app.database import get_user_collection, get_item_collection
+from app.finance_data import (
+    SECTIONS,
+    ENCRYPTORS,
+    encrypt_data,
+    add_op,
+    update_op,
+)
+from app.key_cache import get_data_cipher
+from app.storage import DocumentStore, ItemStore, item_document
+from scripts.bench_aggregation import sample_data
+from scripts.bench_data_keys import best_time
+
+
+def seed(store, email: str, items: int) -> dict:
+    data = sample_data(items)
+    ops = [add_op(section, item) for section in SECTIONS for item in data[section]]
+    store.save(email, data, ops)
+    return store.load(email)
+
+
+def edit_bytes(layout: str, data: dict, item: dict) -> int:
+    """BSON bytes sent to save an edit of one monthly expense."""
+    if layout == "document":
+        return len(bson.encode({"$set": encrypt_data(data), "$inc": {"version": 1}}))
+    cipher = get_data_cipher(data["data_key"])
+    stored = ENCRYPTORS["monthly_expenses"](item, cipher)
+    doc = item_document("bench", "monthly_expenses", stored)
+    return len(bson.encode(doc)) + len(bson.encode({"$inc": {"version": 1}}))
+
+
+def measure(layout: str, store, email: str, args) -> dict:
+    data = seed(store, email, args.items)
+    item = dict(data["monthly_expenses"][0])
+
+    def edit():
+        nonlocal data
+        item["amount"] += 1
+        data, _ = store.save(email, data, [update_op("monthly_expenses", item)])
+
+    return {
+        "bytes per edit": edit_bytes(layout, data, item),
+        "save ms": best_time(edit, args.rounds) * 1000,
+        "load ms": best_time(lambda: store.load(email), args.rounds) * 1000,
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args(argv)
+    collection = get_user_collection()
+    items = get_item_collection()
+    if collection is None or items is None:
+        parser.error("MONGODB_URI is not set or the database is unreachable.")
+    stores = {
+        "document": (DocumentStore(collection), "bench-layout-doc@example.com"),
+        "items": (ItemStore(collection, items), "bench-layout-items@example.com"),
+    }
+    results = {}
+    for layout, (store, email) in stores.items():
+        collection.delete_one({"user_email": email})
+        items.delete_many({"user_email": email})
+        started = time.perf_counter()
+        results[layout] = measure(layout, store, email, args)
+        print(f"{layout}: measured in {time.perf_counter() - started:.1f}s", flush=True)
+        collection.delete_one({"user_email": email})
+        items.delete_many({"user_email": email})
+    print(f"{'':<16}{'document':>12}{'items':>12}")
+    for metric in results["document"]:
+        doc, per_item = results["document"][metric], results["items"][metric]
+        print(f"{metric:<16}{doc:>12.1f}{per_item:>12.1f}")
+    amplification = (
+        results["document"]["bytes per edit"] / results["items"]["bytes per edit"]
+    )
+    print(f"the document layout writes {amplification:.0f}x more per edit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark partial loads against loading a user's whole document.
+
+Seeds one user with --items items and compares, for the chosen layout, the
+full load FinanceState does by default with what lazy mode fetches: the
+fields the totals need, and the first page of one section. Bytes are the
+BSON size of what the database returns; times are best of rounds and
+include decryption.
+
+    MONGODB_URI=mongodb://localhost:27017 python -m scripts.bench_partial_load --items 20000
+"""
+
+import argparse
+import bson
+from app.compact import stored_fields
+from app.database import get_user_collection, get_item_collection
+from app.finance_data import SECTIONS, add_op
+from app.storage import (
+    SUMMARY_FIELDS,
+    DocumentStore,
+    ItemStore,
+    section_projection,
+)
+from app.states.finance_state import SECTION_PAGE_SIZE
+from scripts.bench_aggregation import sample_data
+from scripts.bench_data_keys import best_time
+
+EMAIL = "bench-partial@example.com"
+
+
+def document_bytes(collection, fields=None, sections=SECTIONS, page=None) -> int:
+    doc = collection.find_one(
+        {"user_email": EMAIL}, section_projection(sections, fields, page)
+    )
+    return len(bson.encode(doc))
+
+
+def item_bytes(items, fields=None, sections=SECTIONS, page=None) -> int:
+    projection = None
+    if fields:
+        projection = {
+            "kind": 1,
+            "item_id": 1,
+            **{field: 1 for field in stored_fields(fields)},
+        }
+    cursor = items.find(
+        {"user_email": EMAIL, "kind": {"$in": list(sections)}}, projection
+    )
+    if page:
+        cursor = cursor.skip(page[0]).limit(page[1])
+    return sum(len(bson.encode(doc)) for doc in cursor)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--layout", choices=("document", "items"), default="document")
+    args = parser.parse_args(argv)
+    collection = get_user_collection()
+    items = get_item_collection()
+    if collection is None or items is None:
+        parser.error("MONGODB_URI is not set or the database is unreachable.")
+    collection.delete_one({"user_email": EMAIL})
+    items.delete_many({"user_email": EMAIL})
+    if args.layout == "items":
+        store = ItemStore(collection, items)
+        measure_bytes = lambda **kw: item_bytes(items, **kw)  # noqa: E731
+    else:
+        store = DocumentStore(collection)
+        measure_bytes = lambda **kw: document_bytes(collection, **kw)  # noqa: E731
+    data = sample_data(args.items)
+    store.save(
+        EMAIL,
+        data,
+        [add_op(section, item) for section in SECTIONS for item in data[section]],
+    )
+    page = (0, SECTION_PAGE_SIZE + 1)
+    cases = {
+        "full load": ({}, lambda: store.load(EMAIL)),
+        "totals fields": (
+            {"fields": SUMMARY_FIELDS},
+            lambda: store.load_partial(EMAIL, fields=SUMMARY_FIELDS),
+        ),
+        "one section page": (
+            {"sections": ["monthly_expenses"], "page": page},
+            lambda: store.load_partial(EMAIL, ["monthly_expenses"], page=page),
+        ),
+    }
+    print(f"{args.layout} layout, {args.items} items")
+    print(f"{'':<18}{'bytes':>12}{'ms':>10}")
+    base_bytes = base_ms = None
+    for name, (projection, load) in cases.items():
+        size = measure_bytes(**projection)
+        ms = best_time(load, args.rounds) * 1000
+        base_bytes, base_ms = base_bytes or size, base_ms or ms
+        print(
+            f"{name:<18}{size:>12}{ms:>10.1f}"
+            f"   ({size / base_bytes:.1%} of the bytes, {ms / base_ms:.1%} of the time)"
+        )
+    collection.delete_one({"user_email": EMAIL})
+    items.delete_many({"user_email": EMAIL})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Measure what the MongoDB command profiler costs per command.
+
+Feeds app/mongo_profiler.py's listener --commands started/succeeded pairs
+shaped like the app's own: a user's document read by user_email, an item
+updated, a change inserted, a ledger aggregation. Reports the listener's
+time per command with sampling off (the default: histograms only), with
+every command sampled, and with every command explained (the explains
+themselves run in a background thread against a stub client). With
+MONGODB_URI set to a real server, also times --loads find_one calls on
+a client without the listener and on one with it, the whole overhead
+including the driver publishing its events. The histograms must count
+every command; exits non-zero otherwise.
+
+    python -m scripts.bench_profiler --commands 200000 --items 200
+    MONGODB_URI=mongodb://localhost:27017 python -m scripts.bench_profiler
+"""
+
+import os
+import time
+import argparse
+from types import SimpleNamespace
+from pymongo import MongoClient
+from app.finance_data import SECTIONS, encrypt_data, empty_data
+from app.encryption import create_data_key
+from app.mongo_profiler import CommandProfiler
+from scripts.bench_aggregation import sample_data
+from scripts.bench_backends import percentiles, timed
+
+EMAIL = "bench-profiler@example.com"
+
+
+class StubClient:
+    """Answers explains with a fixed plan, as a server without the data would."""
+
+    def __getitem__(self, database):
+        return self
+
+    def command(self, name, command, **kwargs):
+        plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "x"}}
+        return {"queryPlanner": {"winningPlan": plan}}
+
+
+def app_commands(items: int) -> list[tuple[dict, dict]]:
+    """(command, reply) pairs like those the stores send, one user's."""
+    document = encrypt_data({**sample_data(items), "data_key": create_data_key()})
+    document = {"user_email": EMAIL, "version": 1, **document}
+    item = next(item for section in SECTIONS for item in document.get(section, []))
+    return [
+        (
+            {"find": "user_finances", "filter": {"user_email": EMAIL}, "limit": 1},
+            {"cursor": {"firstBatch": [document], "id": 0}, "ok": 1},
+        ),
+        (
+            {
+                "update": "items",
+                "updates": [{"q": {"user_email": EMAIL, "item_id": "x"}, "u": item}],
+            },
+            {"n": 1, "nModified": 1, "ok": 1},
+        ),
+        (
+            {
+                "insert": "changes",
+                "documents": [{"user_email": EMAIL, "seq": 2, "ops": [item]}],
+            },
+            {"n": 1, "ok": 1},
+        ),
+        (
+            {
+                "aggregate": "ledger",
+                "pipeline": [
+                    {"$match": {"user_email": EMAIL}},
+                    {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
+                ],
+                "cursor": {},
+            },
+            {"cursor": {"firstBatch": [{"_id": "Outros", "total": 1.0}]}, "ok": 1},
+        ),
+    ]
+
+
+def events(commands: list[tuple[dict, dict]], count: int) -> list[tuple]:
+    pairs = []
+    for request_id in range(count):
+        command, reply = commands[request_id % len(commands)]
+        name = next(iter(command))
+        common = {
+            "command_name": name,
+            "request_id": request_id,
+            "connection_id": ("localhost", 27017),
+            "database_name": "finance_app",
+        }
+        pairs.append(
+            (
+                SimpleNamespace(command=command, **common),
+                SimpleNamespace(reply=reply, duration_micros=3000, **common),
+            )
+        )
+    return pairs
+
+
+def time_listener(profiler: CommandProfiler, pairs: list[tuple]) -> float:
+    """Microseconds per command the listener takes."""
+    started = time.perf_counter()
+    for start, success in pairs:
+        profiler.started(start)
+        profiler.succeeded(success)
+    return (time.perf_counter() - started) / len(pairs) * 1e6
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=200000)
+    parser.add_argument("--items", type=int, default=200, help="in the user's document")
+    parser.add_argument("--loads", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    pairs = events(app_commands(args.items), args.commands)
+    print(f"{args.commands} commands, {args.items} items per document")
+    print(f"{'listener':<28}{'us/command':>12}")
+    failures = []
+    for label, sample, explain_ms in (
+        ("histograms (sampling off)", 0.0, 0.0),
+        ("every command sampled", 1.0, 0.0),
+        ("every command explained", 0.0, 1.0),
+    ):
+        profiler = CommandProfiler(sample, explain_ms)
+        profiler.client = StubClient()
+        print(f"{label:<28}{time_listener(profiler, pairs):>12.2f}")
+        counted = sum(h.count for h in profiler.histograms.values())
+        if counted != args.commands:
+            failures.append(f"{label}: {counted} commands counted")
+    stats = profiler.stats()
+    print(f"explained: {len(stats['explains'])} (one per shape per minute)")
+
+    uri = os.getenv("MONGODB_URI", "")
+    if uri.startswith("mongodb"):
+        plain = MongoClient(uri, serverSelectionTimeoutMS=5000)
+        profiled = MongoClient(
+            uri, serverSelectionTimeoutMS=5000, event_listeners=[CommandProfiler()]
+        )
+        print(f"{'find_one on ' + uri:<40}{'p50 ms':>10}{'p99 ms':>10}")
+        for label, client in (("without listener", plain), ("with listener", profiled)):
+            collection = client["finance_app"]["bench_profiler"]
+            collection.replace_one(
+                {"user_email": EMAIL},
+                {"user_email": EMAIL, **empty_data()},
+                upsert=True,
+            )
+            samples = timed(
+                lambda: collection.find_one({"user_email": EMAIL}), args.loads
+            )
+            p50, p99 = percentiles(samples)
+            print(f"{label:<40}{p50:>10.3f}{p99:>10.3f}")
+        plain["finance_app"].drop_collection("bench_profiler")
+    if failures:
+        raise SystemExit("; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Benchmark the monthly rollover across many users, and check it is safe to rerun.
+
+Seeds --users users in a temporary SQLite store (or MongoDB with --mongodb
+and MONGODB_URI, e.g. mongomock://localhost), each with an income, two
+expenses and two installments, one of them on its last payment. Then:
+
+- closes a month for everyone and reports users/s;
+- closes it again, which must find every user done;
+- closes the next month, but cancels the run a quarter of the way
+  through and starts it over, as a restart would.
+
+Every user must end with the long installment paid twice and the last one
+archived. Exits non-zero otherwise.
+
+    python -m scripts.bench_rollover --users 100000
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+from app.database import get_user_collection, get_rollover_collection
+from app.finance_data import add_op, new_item_id
+from app.rollover import month_key, previous_month
+from app.scheduler import run_rollover
+from app.sqlite_store import SqliteStore
+from app.storage import DocumentStore
+
+EMAIL = "bench-rollover-{:06d}@example.com"
+
+
+def seed(store, users: int):
+    for i in range(users):
+        ops = [
+            add_op(
+                "monthly_income",
+                {"id": new_item_id(), "name": "Salário", "amount": 5000.0},
+            ),
+            add_op(
+                "monthly_expenses",
+                {
+                    "id": new_item_id(),
+                    "name": "Aluguel",
+                    "amount": 1500.0,
+                    "category": "Moradia",
+                },
+            ),
+            add_op(
+                "annual_expenses",
+                {
+                    "id": new_item_id(),
+                    "name": "IPVA",
+                    "amount": 1200.0,
+                    "category": "Transporte",
+                },
+            ),
+            add_op(
+                "installments",
+                {
+                    "id": "long",
+                    "name": "Notebook",
+                    "total_amount": 1200.0,
+                    "installments_count": 12,
+                    "installment_value": 100.0,
+                    "category": "Compras",
+                },
+            ),
+            add_op(
+                "installments",
+                {
+                    "id": "last",
+                    "name": "Celular",
+                    "total_amount": 80.0,
+                    "installments_count": 1,
+                    "installment_value": 80.0,
+                    "category": "Compras",
+                },
+            ),
+        ]
+        store.save_ops(EMAIL.format(i), ops)
+
+
+async def interrupted(store, month: str, args, users: int) -> dict:
+    """A run cancelled about a quarter of the way through, then run again."""
+    task = asyncio.create_task(run_rollover(store, month, args.batch, args.concurrency))
+    while not task.done() and len(store.rolled_over_so_far(month)) < users // 4:
+        await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return await run_rollover(store, month, args.batch, args.concurrency)
+
+
+def check(store, users: int) -> list[str]:
+    failures = []
+    for i in range(users):
+        data = store.load(EMAIL.format(i))
+        installments = {item["id"]: item for item in data["installments"]}
+        long = installments.get("long")
+        if (
+            long is None
+            or long["installments_count"] != 10
+            or long["total_amount"] != 1000.0
+        ):
+            failures.append(f"user {i}: long installment is {long}")
+        if "last" in installments:
+            failures.append(f"user {i}: last installment was not archived")
+    return failures
+
+
+class Progress:
+    """Wraps a store to count the users it has rolled over, per month."""
+
+    def __init__(self, store):
+        self.store = store
+        self.finished: dict[str, set[str]] = {}
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def finish_rollover(self, email: str, month: str):
+        self.store.finish_rollover(email, month)
+        self.finished.setdefault(month, set()).add(email)
+
+    def rolled_over_so_far(self, month: str) -> set[str]:
+        return self.finished.get(month, set())
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mongodb", action="store_true")
+    args = parser.parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.mongodb:
+            collection = get_user_collection()
+            if collection is None:
+                parser.error("MONGODB_URI is not set or the database is unreachable.")
+            rollovers = get_rollover_collection()
+            query = {"user_email": {"$regex": "^bench-rollover-"}}
+            collection.delete_many(query)
+            rollovers.delete_many(query)
+            inner = DocumentStore(collection, rollovers=rollovers)
+        else:
+            inner = SqliteStore(os.path.join(tmp, "bench.db"))
+        store = Progress(inner)
+        started = time.perf_counter()
+        seed(store, args.users)
+        print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+        first = previous_month(month_key())
+        second = month_key()
+        runs = [
+            (
+                f"close {first}",
+                lambda: run_rollover(store, first, args.batch, args.concurrency),
+            ),
+            (
+                f"close {first} again",
+                lambda: run_rollover(store, first, args.batch, args.concurrency),
+            ),
+            (
+                f"close {second}, interrupted",
+                lambda: interrupted(store, second, args, args.users),
+            ),
+        ]
+        for label, run in runs:
+            started = time.perf_counter()
+            counts = asyncio.run(run())
+            seconds = time.perf_counter() - started
+            print(
+                f"{label:<30}{seconds:>8.1f}s{args.users / seconds:>10.0f} users/s  {counts}"
+            )
+        failures = check(store, args.users)
+        if args.mongodb:
+            collection.delete_many(query)
+            rollovers.delete_many(query)
+    for failure in failures[:10]:
+        print(f"  {failure}")
+    if failures:
+        raise SystemExit(
+            f"{len(failures)} users were not rolled over exactly once per month."
+        )
+    print("every user rolled over exactly once per month")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark the per-session search index.
+
+Indexes --items items, then times queries of every kind the search panel
+sends: prefixes matching most items or a few, a category filter, and each
+sort order. Also times keeping the index up to date (an add and a remove)
+against rebuilding it. Latencies are p50/p99 over --rounds runs per query.
+
+    python -m scripts.bench_search --items 50000
+"""
+
+import time
+import argparse
+from app.finance_data import new_item_id
+from app.search_index import SearchIndex
+from scripts.bench_aggregation import sample_data
+from scripts.bench_backends import percentiles, timed
+
+QUERIES = [
+    ("d", "", "amount_desc"),
+    ("despesa", "", "name"),
+    ("despesa 4", "", "amount_desc"),
+    ("anual 12", "", "amount_asc"),
+    ("renda 49990", "", "amount_desc"),
+    ("", "Lazer", "amount_desc"),
+    ("parc", "Saúde", "category"),
+    ("xyz", "", "amount_desc"),
+]
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args(argv)
+    data = sample_data(args.items)
+    started = time.perf_counter()
+    index = SearchIndex.build(data)
+    print(f"{args.items} items, index built in {time.perf_counter() - started:.2f}s")
+    print(f"{'query':<28}{'matches':>9}{'p50':>10}{'p99':>10}")
+    for query, category, sort in QUERIES:
+        matches, _ = index.search(query, category, sort)
+        p50, p99 = percentiles(
+            timed(lambda: index.search(query, category, sort), args.rounds)
+        )
+        label = " ".join(part for part in (repr(query), category, sort) if part)
+        print(f"{label:<28}{matches:>9}{p50:>8.3f}ms{p99:>8.3f}ms")
+
+    item = {"name": "Café da manhã", "amount": 4.5, "category": "Alimentação"}
+
+    def update():
+        item["id"] = new_item_id()
+        index.add("monthly_expenses", item)
+        index.remove(item["id"])
+
+    p50, p99 = percentiles(timed(update, args.rounds))
+    print(f"{'add + remove':<28}{'':>9}{p50:>8.3f}ms{p99:>8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Report the memory idle sessions hold, and what evicting them gives back.
+
+Seeds --users users with --items items each, then opens --sessions
+sessions of them in turn, in a state manager run in this process the way
+the server runs it: each signed in with a fake token, loaded with
+load_data and hydrated, so their computed vars are cached too. Reports the
+traced size of the sessions and the worker's resident size once they are
+open, after every one is evicted (app/session_eviction.py), and after
+every one is rehydrated by its next event, half from the user cache and
+half from the database. Every session must get back exactly the lists it
+had; exits non-zero otherwise.
+
+    MONGODB_URI=mongodb://localhost:27017 python -m scripts.bench_sessions --sessions 1000
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import tracemalloc
+from reflex.istate.manager.memory import StateManagerMemory
+from reflex.istate.manager.token import BaseStateToken
+
+os.environ["AUTH_FAKE_TOKENS"] = "1"
+# A single process: nothing else writes behind the cache's back.
+os.environ.setdefault("USER_CACHE", "1")
+
+from app.fake_tokens import make_fake_token  # noqa: E402
+from app.finance_data import SECTIONS, add_op  # noqa: E402
+from app.session_eviction import (  # noqa: E402
+    SessionActivity,
+    SessionEvictor,
+    deep_size,
+    resident_bytes,
+    session_footprint,
+)
+from app.states.auth_state import AuthState  # noqa: E402
+from app.states.finance_state import FinanceState  # noqa: E402
+from app.storage import get_store  # noqa: E402
+from app.user_cache import get_user_cache  # noqa: E402
+from scripts.bench_aggregation import sample_data  # noqa: E402
+from scripts.bench_backends import percentiles  # noqa: E402
+
+
+def email_of(user: int) -> str:
+    return f"bench-sessions-{user}@example.com"
+
+
+def seed(store, users: int, items: int):
+    data = sample_data(items)
+    ops = [add_op(section, item) for section in SECTIONS for item in data[section]]
+    for user in range(users):
+        store.save(email_of(user), {**data, "version": 0, "data_key": None}, ops)
+
+
+def session_token(session: int) -> BaseStateToken:
+    return BaseStateToken(ident=f"bench-session-{session}", cls=FinanceState)
+
+
+def item_ids(finance: FinanceState) -> list[str]:
+    return [item["id"] for section in SECTIONS for item in getattr(finance, section)]
+
+
+async def open_session(manager, session: int, email: str) -> list[str]:
+    token = session_token(session)
+    async with manager.modify_state(token) as root:
+        root.router_data = root._update_router_vars(
+            {"token": token.ident, "pathname": "/"}, {}
+        )
+        auth = await root.get_state(AuthState)
+        auth.token_response_json = json.dumps({"id_token": make_fake_token(email)})
+        finance = await root.get_state(FinanceState)
+        await FinanceState.event_handlers["load_data"].fn(finance)
+        root.dict()
+        root._clean()
+        return item_ids(finance)
+
+
+async def footprints(manager, sessions: int) -> list[int]:
+    sizes = []
+    for session in range(sessions):
+        async with manager.modify_state(session_token(session)) as root:
+            sizes.append(session_footprint(await root.get_state(FinanceState)))
+    return sizes
+
+
+async def rehydrate(manager, activity, session: int) -> tuple[float, list[str]]:
+    async with manager.modify_state(session_token(session)) as root:
+        started = time.perf_counter()
+        await activity.preprocess(None, root, None)
+        elapsed = time.perf_counter() - started
+        return elapsed, item_ids(await root.get_state(FinanceState))
+
+
+def traced() -> int:
+    return tracemalloc.get_traced_memory()[0]
+
+
+def report(label: str, sessions: int, traced_bytes: int, sizes: list[int]):
+    rss = resident_bytes()
+    rss_mb = f"{rss / 1e6:>9.1f}" if rss is not None else f"{'n/a':>9}"
+    print(
+        f"{label:<22}{traced_bytes / 1e6:>10.1f}{traced_bytes / sessions / 1e3:>12.1f}"
+        f"{sum(sizes) / len(sizes) / 1e3:>12.1f}{rss_mb}"
+    )
+
+
+async def run(args, store) -> list[str]:
+    manager = StateManagerMemory()
+    evictor = SessionEvictor(idle=0, memory=0, min_idle=0)
+    activity = SessionActivity(evictor)
+    cache = get_user_cache()
+    failures = []
+
+    print(f"{args.sessions} sessions of {args.users} users, {args.items} items each")
+    print(f"{'':<22}{'traced MB':>10}{'KB/session':>12}{'lists KB':>12}{'RSS MB':>9}")
+    tracemalloc.start()
+    base = traced()
+    opened = [
+        await open_session(manager, session, email_of(session % args.users))
+        for session in range(args.sessions)
+    ]
+    cache_bytes = deep_size(cache._entries)
+    sessions_bytes = traced() - base - cache_bytes
+    report(
+        "open", args.sessions, sessions_bytes, await footprints(manager, args.sessions)
+    )
+
+    started = time.perf_counter()
+    for session in range(args.sessions):
+        await evictor.evict(manager, session_token(session).ident)
+        evictor.evicted.add(session_token(session).ident)
+    evict_seconds = time.perf_counter() - started
+    evicted_bytes = traced() - base - cache_bytes
+    report(
+        "evicted",
+        args.sessions,
+        evicted_bytes,
+        await footprints(manager, args.sessions),
+    )
+
+    latencies = {"cache": [], "database": []}
+    half = args.sessions // 2
+    for session in range(args.sessions):
+        if session == half:
+            cache.clear()
+        source = "cache" if session < half else "database"
+        elapsed, ids = await rehydrate(manager, activity, session)
+        latencies[source].append(elapsed)
+        if ids != opened[session]:
+            failures.append(session)
+    rehydrated_bytes = traced() - base - deep_size(cache._entries)
+    report(
+        "rehydrated",
+        args.sessions,
+        rehydrated_bytes,
+        await footprints(manager, args.sessions),
+    )
+    tracemalloc.stop()
+
+    print(f"user cache: {cache_bytes / 1e6:.1f} MB (USER_CACHE_SIZE bounds it)")
+    print(
+        f"evicted {evictor.evictions} sessions in {evict_seconds * 1000:.0f} ms,"
+        f" {evictor.bytes_dropped / 1e6:.1f} MB of lists dropped"
+    )
+    for source, samples in latencies.items():
+        p50, p99 = percentiles(samples)
+        print(f"rehydrate from {source:<9} p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+    return failures
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=100, help="per user")
+    args = parser.parse_args(argv)
+    store = get_store()
+    if store is None:
+        parser.error("MONGODB_URI is not set or the database is unreachable.")
+    seed(store, args.users, args.items)
+    failures = asyncio.run(run(args, store))
+    if failures:
+        raise SystemExit(f"{len(failures)} sessions did not get their lists back.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark rendering from the browser snapshot against loading from a store.
+
+Seeds one user with --items items in a temporary SQLite store (and in
+MongoDB, document layout, when MONGODB_URI is set), then times what
+load_data does before the first render: a full load from the store, or
+decoding the snapshot the browser sent. Also prints the snapshot's size,
+which bounds what fits in localStorage.
+
+    python -m scripts.bench_snapshot --items 2000
+"""
+
+import os
+import argparse
+import tempfile
+from app.client_snapshot import encode_snapshot, decode_snapshot
+from app.database import get_user_collection
+from app.finance_data import SECTIONS, add_op
+from app.sqlite_store import SqliteStore
+from app.storage import DocumentStore
+from scripts.bench_aggregation import sample_data
+from scripts.bench_data_keys import best_time
+
+EMAIL = "bench-snapshot@example.com"
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+    os.environ.setdefault("CLIENT_SNAPSHOT_MAX_BYTES", str(2**40))
+    data = sample_data(args.items)
+    ops = [add_op(section, item) for section in SECTIONS for item in data[section]]
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {"sqlite": SqliteStore(os.path.join(tmp, "bench.db"))}
+        collection = get_user_collection() if os.getenv("MONGODB_URI") else None
+        if collection is not None:
+            collection.delete_one({"user_email": EMAIL})
+            stores["mongodb"] = DocumentStore(collection)
+        for store in stores.values():
+            store.save(EMAIL, data, ops)
+        snapshot = encode_snapshot(EMAIL, stores["sqlite"].load(EMAIL))
+        print(f"{args.items} items, snapshot {len(snapshot)} bytes")
+        results = {
+            f"{name} load": best_time(lambda store=store: store.load(EMAIL), args.rounds)
+            for name, store in stores.items()
+        }
+        results["decode snapshot"] = best_time(
+            lambda: decode_snapshot(EMAIL, snapshot), args.rounds
+        )
+        for name, seconds in results.items():
+            print(f"{name:<18}{seconds * 1000:>10.1f} ms")
+        if collection is not None:
+            collection.delete_one({"user_email": EMAIL})
+
+
+if __name__ == "__main__":
+    main()
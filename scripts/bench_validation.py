@@ -0,0 +1,194 @@
+"""Fuzz and benchmark the form validation layer.
+
+Generates --samples random inputs, half of them well-formed amounts in
+every accepted notation ("1.234,56", "1234,56", "1234.56") and half noise
+over the characters people type in amount fields. Checks that:
+
+- parsing only ever raises ValidationError;
+- every well-formed amount parses back to the value it was written from;
+- the browser accepts exactly what the server does, when node is on the
+  PATH: each pattern is compiled the way browsers compile the HTML pattern
+  attribute and run over the same samples.
+
+Then reports parse throughput for a whole form against the float()/int()
+parsing the handlers did before.
+
+    python -m scripts.bench_validation --samples 100000
+"""
+
+import json
+import time
+import random
+import shutil
+import argparse
+import subprocess
+from app.validation import (
+    AMOUNT_PATTERN,
+    CATEGORY_NAME_PATTERN,
+    COUNT_PATTERN,
+    INTERVAL_PATTERN,
+    NAME_PATTERN,
+    ValidationError,
+    parse_amount,
+    parse_category_name,
+    parse_count,
+    parse_form,
+    parse_interval,
+    parse_name,
+)
+
+NOISE = "0123456789.,- R$e+/"
+PARSERS = (
+    (parse_name, NAME_PATTERN),
+    (parse_amount, AMOUNT_PATTERN),
+    (parse_count, COUNT_PATTERN),
+    (parse_interval, INTERVAL_PATTERN),
+    (parse_category_name, CATEGORY_NAME_PATTERN),
+)
+CATEGORIES = ["Lazer", "Outros"]
+
+# Runs in node: reads {"pattern", "samples"} on stdin and prints whether
+# each sample matches, compiled like an HTML pattern attribute.
+NODE_SCRIPT = """
+const input = JSON.parse(require("fs").readFileSync(0, "utf8"));
+const re = new RegExp("^(?:" + input.pattern + ")$", "v");
+console.log(JSON.stringify(input.samples.map((s) => re.test(s))));
+"""
+
+
+def written(cents: int, rng: random.Random) -> str:
+    """cents as a user might type it."""
+    units, rest = divmod(cents, 100)
+    notation = rng.choice(("grouped", "comma", "dot", "integer"))
+    if notation == "integer" and not rest:
+        return str(units)
+    decimals = f"{rest:02d}" if rng.random() < 0.5 or rest % 10 else str(rest // 10)
+    if notation == "dot":
+        return f"{units}.{decimals}"
+    if notation != "grouped":
+        return f"{units},{decimals}"
+    grouped = f"{units:,}".replace(",", ".")
+    return f"{grouped},{decimals}"
+
+
+def samples(n: int, seed: int) -> list[tuple[str, int | None]]:
+    """(text, cents) pairs; cents is None for noise."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n // 2):
+        cents = rng.choice(
+            (rng.randrange(100), rng.randrange(10**6), rng.randrange(10**14))
+        )
+        out.append((written(cents, rng), cents))
+        out.append(("".join(rng.choices(NOISE, k=rng.randrange(12))), None))
+    return out
+
+
+def fuzz(cases: list[tuple[str, int | None]]) -> list[str]:
+    failures = []
+    for text, cents in cases:
+        for parse, _ in PARSERS:
+            try:
+                value = parse(text)
+            except ValidationError:
+                value = None
+            except Exception as e:
+                failures.append(f"{parse.__name__}({text!r}) raised {e!r}")
+                continue
+            if parse is parse_amount and cents is not None:
+                if value is None or round(value * 100) != cents:
+                    failures.append(f"{text!r} parsed to {value!r}, not {cents / 100}")
+    return failures
+
+
+def server_matches(parse, texts: list[str]) -> list[bool]:
+    matches = []
+    for text in texts:
+        try:
+            parse(text)
+            matches.append(True)
+        except ValidationError:
+            matches.append(False)
+    return matches
+
+
+def browser_mismatches(texts: list[str]) -> list[str]:
+    failures = []
+    for parse, pattern in PARSERS:
+        result = subprocess.run(
+            ["node", "-e", NODE_SCRIPT],
+            input=json.dumps({"pattern": pattern, "samples": texts}),
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            # Browsers ignore a pattern they cannot compile: nothing is checked.
+            error = result.stderr.strip().splitlines()[-1]
+            failures.append(f"{parse.__name__}: browsers reject {pattern!r}: {error}")
+            continue
+        browser = json.loads(result.stdout)
+        for text, server, client in zip(texts, server_matches(parse, texts), browser):
+            if server != client:
+                failures.append(
+                    f"{parse.__name__}({text!r}): server {server}, browser {client}"
+                )
+    return failures
+
+
+def legacy_parse(form_data: dict) -> dict:
+    """What add_installment did before the validation layer."""
+    total_amount = float(form_data.get("total_amount", "0"))
+    count = int(form_data.get("count", "1"))
+    return {
+        "name": form_data.get("name", ""),
+        "total_amount": total_amount,
+        "installments_count": count,
+        "installment_value": total_amount / count,
+        "category": form_data.get("category", "Outros"),
+    }
+
+
+def throughput(fn, forms: list[dict]) -> float:
+    started = time.perf_counter()
+    for form in forms:
+        fn(form)
+    return len(forms) / (time.perf_counter() - started)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    cases = samples(args.samples, args.seed)
+    failures = fuzz(cases)
+    print(f"fuzzed {len(cases)} inputs: {len(failures)} failures")
+    if shutil.which("node"):
+        mismatches = browser_mismatches([text for text, _ in cases])
+        print(f"browser patterns: {len(mismatches)} disagreements with the server")
+        failures += mismatches
+    else:
+        print("node not found, browser patterns not checked")
+    for failure in failures[:20]:
+        print(f"  {failure}")
+
+    rng = random.Random(args.seed)
+    forms = [
+        {
+            "name": f"Compra {i}",
+            "total_amount": f"{rng.randrange(10**8) / 100:.2f}",
+            "count": str(rng.randrange(1, 49)),
+            "category": rng.choice(CATEGORIES),
+        }
+        for i in range(args.samples)
+    ]
+    legacy = throughput(legacy_parse, forms)
+    layer = throughput(lambda form: parse_form("installments", form, CATEGORIES), forms)
+    print(f"{'float()/int()':<18}{legacy:>12,.0f} forms/s")
+    print(f"{'parse_form':<18}{layer:>12,.0f} forms/s")
+    if failures:
+        raise SystemExit("Validation fuzzing found failures.")
+
+
+if __name__ == "__main__":
+    main()
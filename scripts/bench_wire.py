@@ -0,0 +1,135 @@
+"""Measure the bytes FinanceState updates put on the websocket, per event.
+
+Signs in one virtual user over Reflex's socket.io protocol (see
+scripts/load_test.py), sends each event and collects every frame the
+server sends back until --quiet seconds pass without one. Reports frames,
+vars and bytes per event, and the bytes permessage-deflate would send
+instead: one raw deflate stream kept across the connection, as the
+extension does with context takeover. The burst sends --burst adds
+without waiting for their updates, the way quick clicks do. Run it against
+a backend started with and without DELTA_BATCH_MS to compare:
+
+    AUTH_FAKE_TOKENS=1 MONGODB_URI=mongomock://localhost DELTA_BATCH_MS=16 reflex run --backend-only
+    python -m scripts.bench_wire --url http://localhost:8000
+"""
+
+import zlib
+import time
+import asyncio
+import argparse
+from scripts.load_test import EVENT_NAMESPACE, VirtualUser, finance_event
+
+
+class WireCounter:
+    """Counts what the server sends on a user's websocket."""
+
+    def __init__(self, user: VirtualUser):
+        self.frames = 0
+        self.bytes = 0
+        self.deflated = 0
+        self.vars = 0
+        self.last_frame = time.perf_counter()
+        self._deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        self.user = user
+        eio = user.sio.eio
+        receive = eio._receive_packet
+
+        async def counted(pkt):
+            data = pkt.encode()
+            if isinstance(data, str):
+                data = data.encode()
+            self.frames += 1
+            self.bytes += len(data)
+            # A flushed message ends in 00 00 ff ff, which the extension drops.
+            compressed = self._deflate.compress(data)
+            self.deflated += (
+                len(compressed + self._deflate.flush(zlib.Z_SYNC_FLUSH)) - 4
+            )
+            self.last_frame = time.perf_counter()
+            await receive(pkt)
+
+        eio._receive_packet = counted
+        user.sio.on("event", self._on_update, namespace=EVENT_NAMESPACE)
+
+    async def _on_update(self, update):
+        self.vars += sum(len(subdelta) for subdelta in update.get("delta", {}).values())
+        await self.user._on_update(update)
+
+    def totals(self) -> tuple[int, int, int, int]:
+        return self.frames, self.vars, self.bytes, self.deflated
+
+    async def wait_quiet(self, quiet: float):
+        await asyncio.sleep(quiet)
+        while time.perf_counter() - self.last_frame < quiet:
+            await asyncio.sleep(quiet)
+
+
+def scenarios(burst: int) -> list[tuple[str, list[dict]]]:
+    def add(i: int) -> dict:
+        form_data = {"name": f"Conta {i}", "amount": "120,50", "category": "Moradia"}
+        return finance_event("add_monthly_expense", form_data=form_data)
+
+    return [
+        ("load", [finance_event("load_data")]),
+        ("add expense", [add(0)]),
+        (
+            "add income",
+            [finance_event("add_income", form_data={"name": "Extra", "amount": "300"})],
+        ),
+        (
+            "edit expense",
+            [
+                finance_event("start_edit_monthly_expense", index=0),
+                finance_event(
+                    "save_edit",
+                    form_data={"name": "Conta", "amount": "99", "category": "Lazer"},
+                ),
+            ],
+        ),
+        ("toggle privacy", [finance_event("toggle_privacy")]),
+        ("search", [finance_event("set_search_query", query="conta")]),
+        ("clear search", [finance_event("clear_search")]),
+        (f"burst of {burst} adds", [add(i) for i in range(1, burst + 1)]),
+        ("remove expense", [finance_event("remove_monthly_expense", index=0)]),
+    ]
+
+
+async def run(args) -> list[tuple]:
+    user = VirtualUser(args.url, args.email, args.timeout)
+    counter = WireCounter(user)
+    await user.connect()
+    await counter.wait_quiet(args.quiet)
+    rows = []
+    for name, events in scenarios(args.burst):
+        before = counter.totals()
+        for event in events:
+            await user.sio.emit("event", event, namespace=EVENT_NAMESPACE)
+        await counter.wait_quiet(args.quiet)
+        after = counter.totals()
+        rows.append((name, len(events), *(b - a for a, b in zip(before, after))))
+    await user.close()
+    return rows
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", default="bench-wire@example.com")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--quiet", type=float, default=0.3, help="seconds")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds")
+    args = parser.parse_args(argv)
+    rows = asyncio.run(run(args))
+    print(
+        f"{'':<18}{'events':>7}{'frames':>7}{'vars':>6}{'bytes':>9}"
+        f"{'B/event':>9}{'deflate':>9}"
+    )
+    for name, events, frames, variables, size, deflated in rows:
+        print(
+            f"{name:<18}{events:>7}{frames:>7}{variables:>6}{size:>9}"
+            f"{size / events:>9.0f}{deflated:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Load-test harness driving FinanceState events over Reflex's websocket.
+
+Each virtual user signs in with a fake token (see app/fake_tokens.py), then
+issues load/add/edit/remove events at a fixed rate and waits for the state
+update of each one, or for the toast of each change. Changes the server
+turned away (over the write rate limit, or put off by a full write queue)
+are counted as refused, not as completed. Start the backend against a local
+database first:
+
+    AUTH_FAKE_TOKENS=1 MONGODB_URI=mongomock://localhost reflex run --backend-only
+
+and then, from the repository root (pip install -r requirements-dev.txt first):
+
+    python -m scripts.load_test --users 50 --rate 2 --duration 30
+
+To measure multi-worker scaling, start one backend per port with
+WORKER_MODE=multi and pass every URL; users are spread round-robin, the way a
+sticky load balancer would pin them:
+
+    python -m scripts.load_test --url http://localhost:8000,http://localhost:8001
+"""
+
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import socketio
+from reflex.utils import format
+from app.fake_tokens import make_fake_token
+from app.states.auth_state import AuthState
+from app.categories import CATEGORIES
+from app.states.finance_state import FinanceState
+
+EVENT_NAMESPACE = "/_event"
+DEFAULT_MIX = "load=1,add=4,edit=2,remove=2"
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        op, _, weight = part.partition("=")
+        weights[op.strip()] = int(weight or 1)
+    unknown = set(weights) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def make_event(handler, **payload) -> dict:
+    return {
+        "name": format.format_event_handler(handler),
+        "payload": payload,
+        "router_data": {"pathname": "/", "query": {}},
+    }
+
+
+def finance_event(handler: str, **payload) -> dict:
+    return make_event(getattr(FinanceState, handler), **payload)
+
+
+def op_load(user: "VirtualUser") -> list[dict]:
+    # A session already up to date gets no update from load_data; events of
+    # one session run in order, so the update from cancel_edit ends the load.
+    return [finance_event("load_data"), finance_event("cancel_edit")]
+
+
+def op_add(user: "VirtualUser") -> list[dict]:
+    form_data = {
+        "name": f"Despesa {user.item_count + 1}",
+        "amount": f"{random.uniform(10, 500):.2f}",
+        "category": random.choice(CATEGORIES),
+    }
+    return [finance_event("add_monthly_expense", form_data=form_data)]
+
+
+def op_edit(user: "VirtualUser") -> list[dict]:
+    if user.item_count == 0:
+        return op_add(user)
+    form_data = {
+        "name": f"Despesa editada {user.item_count}",
+        "amount": f"{random.uniform(10, 500):.2f}",
+        "category": random.choice(CATEGORIES),
+    }
+    return [
+        finance_event("start_edit_monthly_expense", index=0),
+        finance_event("save_edit", form_data=form_data),
+    ]
+
+
+def op_remove(user: "VirtualUser") -> list[dict]:
+    if user.item_count == 0:
+        return op_add(user)
+    return [finance_event("remove_monthly_expense", index=0)]
+
+
+# Events that may legitimately produce no state update.
+NO_UPDATE_EVENTS = {finance_event("load_data")["name"]}
+
+# Changes end with a toast, whether they were saved or not: it comes after
+# their state update, and tells which.
+TOAST_EVENTS = {
+    finance_event(handler)["name"]
+    for handler in ("add_monthly_expense", "save_edit", "remove_monthly_expense")
+}
+# Toasts for changes the server turned away or put off. The toasts' text
+# arrives JSON-escaped, so these are its ASCII parts.
+REFUSED_TOASTS = ("Muitas altera", "Servidor ocupado")
+SAVE_FAILED_TOAST = "salvar online"
+
+# The key of the monthly expenses in the state deltas.
+MONTHLY_EXPENSES = FinanceState.monthly_expenses._js_expr.rpartition(".")[2]
+
+OPERATIONS = {
+    "load": op_load,
+    "add": op_add,
+    "edit": op_edit,
+    "remove": op_remove,
+}
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {op: [] for op in OPERATIONS}
+        self.errors: dict[str, int] = {op: 0 for op in OPERATIONS}
+        self.refused: dict[str, int] = {op: 0 for op in OPERATIONS}
+        self.connect_errors = 0
+
+    def report(self, elapsed: float) -> dict:
+        ops = {}
+        for op, samples in self.latencies.items():
+            total = len(samples) + self.errors[op] + self.refused[op]
+            if not total:
+                continue
+            ops[op] = {
+                "count": total,
+                "errors": self.errors[op],
+                "error_rate": self.errors[op] / total,
+                "refused": self.refused[op],
+                "refusal_rate": self.refused[op] / total,
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p90_ms": percentile(samples, 90) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "max_ms": max(samples, default=0.0) * 1000,
+            }
+        completed = sum(len(s) for s in self.latencies.values())
+        all_samples = [x for s in self.latencies.values() for x in s]
+        return {
+            "elapsed_s": elapsed,
+            "completed": completed,
+            "throughput_ops_s": completed / elapsed if elapsed else 0.0,
+            "errors": sum(self.errors.values()),
+            "refused": sum(self.refused.values()),
+            "connect_errors": self.connect_errors,
+            "p99_ms": percentile(all_samples, 99) * 1000,
+            "operations": ops,
+        }
+
+
+class VirtualUser:
+    def __init__(self, url: str, email: str, timeout: float):
+        self.url = url
+        self.email = email
+        self.timeout = timeout
+        self.item_count = 0
+        self.updates: asyncio.Queue = asyncio.Queue()
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.sio.on("event", self._on_update, namespace=EVENT_NAMESPACE)
+
+    async def _on_update(self, update):
+        # item_count follows the server: refused adds and removes change nothing.
+        for substate in (update.get("delta") or {}).values():
+            if MONTHLY_EXPENSES in substate:
+                self.item_count = len(substate[MONTHLY_EXPENSES])
+        await self.updates.put(update)
+
+    async def connect(self):
+        await self.sio.connect(
+            f"{self.url}?token={uuid.uuid4()}",
+            socketio_path="/_event",
+            namespaces=[EVENT_NAMESPACE],
+            transports=["websocket"],
+            wait_timeout=self.timeout,
+        )
+        token = make_fake_token(self.email)
+        await self.send(
+            make_event(AuthState.on_success, response={"credential": token})
+        )
+
+    async def send(self, event: dict) -> str:
+        """Emit one event and wait for the state update it produces.
+
+        Events in NO_UPDATE_EVENTS are not waited for. Events in TOAST_EVENTS
+        are waited for up to their toast, which is returned (as the JavaScript
+        that shows it); other events return "".
+        """
+        while not self.updates.empty():
+            self.updates.get_nowait()
+        await self.sio.emit("event", event, namespace=EVENT_NAMESPACE)
+        if event["name"] in NO_UPDATE_EVENTS:
+            return ""
+        return await asyncio.wait_for(
+            self._next_update(event["name"] in TOAST_EVENTS), self.timeout
+        )
+
+    async def _next_update(self, toast: bool) -> str:
+        while True:
+            update = await self.updates.get()
+            if not toast:
+                return ""
+            for event in update.get("events") or []:
+                function = event.get("payload", {}).get("function") or ""
+                if "__toast" in function:
+                    return function
+
+    async def run(
+        self, weights: dict[str, int], rate: float, deadline: float, stats: Stats
+    ):
+        names = list(weights)
+        interval = 1 / rate if rate > 0 else 0
+        while time.perf_counter() < deadline:
+            op = random.choices(names, weights=[weights[n] for n in names])[0]
+            started = time.perf_counter()
+            try:
+                toasts = [await self.send(event) for event in OPERATIONS[op](self)]
+                if any(part in t for t in toasts for part in REFUSED_TOASTS):
+                    stats.refused[op] += 1
+                elif any(SAVE_FAILED_TOAST in t for t in toasts):
+                    stats.errors[op] += 1
+                else:
+                    stats.latencies[op].append(time.perf_counter() - started)
+            except Exception:
+                stats.errors[op] += 1
+                if not self.sio.connected:
+                    return
+            if interval:
+                await asyncio.sleep(
+                    max(0.0, interval - (time.perf_counter() - started))
+                )
+
+    async def close(self):
+        if self.sio.connected:
+            await self.sio.disconnect()
+
+
+async def run_load_test(args) -> dict:
+    weights = parse_mix(args.mix)
+    stats = Stats()
+    urls = args.url.split(",")
+    users = [
+        VirtualUser(urls[i % len(urls)], f"loadtest-{i}@example.com", args.timeout)
+        for i in range(args.users)
+    ]
+    connected = []
+    for user in users:
+        try:
+            await user.connect()
+            await user.send(finance_event("load_data"))
+            connected.append(user)
+        except Exception:
+            stats.connect_errors += 1
+        if args.ramp_up:
+            await asyncio.sleep(args.ramp_up / args.users)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(
+        *(user.run(weights, args.rate, deadline, stats) for user in connected)
+    )
+    elapsed = time.perf_counter() - started
+    await asyncio.gather(*(user.close() for user in connected))
+    return stats.report(elapsed)
+
+
+def print_report(report: dict):
+    print(
+        f"{report['completed']} ops in {report['elapsed_s']:.1f}s "
+        f"({report['throughput_ops_s']:.1f} ops/s), "
+        f"{report['errors']} errors, {report['refused']} refused, "
+        f"{report['connect_errors']} connect errors, "
+        f"p99 {report['p99_ms']:.1f} ms"
+    )
+    print(
+        f"{'op':<8}{'count':>8}{'err%':>8}{'ref%':>8}"
+        f"{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"
+    )
+    for op, row in report["operations"].items():
+        print(
+            f"{op:<8}{row['count']:>8}{row['error_rate'] * 100:>7.1f}%"
+            f"{row['refusal_rate'] * 100:>7.1f}%"
+            f"{row['p50_ms']:>8.1f}ms{row['p90_ms']:>8.1f}ms"
+            f"{row['p99_ms']:>8.1f}ms{row['max_ms']:>8.1f}ms"
+        )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--url", default="http://localhost:8000", help="comma-separated backend URLs"
+    )
+    parser.add_argument("--users", type=int, default=10, help="concurrent users")
+    parser.add_argument("--rate", type=float, default=1.0, help="operations/s per user")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds")
+    parser.add_argument(
+        "--timeout", type=float, default=10.0, help="per event, seconds"
+    )
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    report = asyncio.run(run_load_test(args))
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Convert user_finances documents to the items layout (one document per item).
+
+    MONGODB_URI=... python -m scripts.migrate_items --batch-size 200
+
+Documents are converted in _id order, in batches, throttled to
+--max-docs-per-sec. A converted document is marked with layout "items" and
+loses its item arrays, so it no longer matches the query: an interrupted
+run simply resumes on the next one, which also finishes any document left
+half converted. A document its user saves while it is being read is
+skipped and picked up by the next run. Amounts are copied still encrypted.
+
+Deploy with FINANCE_LAYOUT=items first: ItemStore reads both layouts and
+converts users on first access, while the document layout refuses to read
+converted users rather than show them empty lists. The job then converts
+the users who have not signed in.
+"""
+
+import time
+import argparse
+from app.database import get_user_collection, get_item_collection
+from app.storage import UNCONVERTED_QUERY, convert_document
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument(
+        "--max-docs-per-sec", type=float, default=200.0, help="0 disables throttling"
+    )
+    args = parser.parse_args(argv)
+    collection = get_user_collection()
+    items = get_item_collection()
+    if collection is None or items is None:
+        parser.error("MONGODB_URI is not set or the database is unreachable.")
+    query = UNCONVERTED_QUERY
+    remaining = collection.count_documents(query)
+    converted = skipped = 0
+    last_id = None
+    started = time.perf_counter()
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        docs = list(collection.find(batch_query).sort("_id", 1).limit(args.batch_size))
+        if not docs:
+            break
+        batch_started = time.perf_counter()
+        for doc in docs:
+            if convert_document(collection, items, doc):
+                converted += 1
+            else:
+                skipped += 1
+        last_id = docs[-1]["_id"]
+        if args.max_docs_per_sec > 0:
+            min_duration = len(docs) / args.max_docs_per_sec
+            time.sleep(max(0.0, min_duration - (time.perf_counter() - batch_started)))
+        elapsed = time.perf_counter() - started
+        print(
+            f"{converted + skipped}/{remaining} processed, {converted} converted, "
+            f"{skipped} skipped, {(converted + skipped) / elapsed:.0f} docs/s",
+            flush=True,
+        )
+    print(f"done: {converted} converted, {skipped} skipped (rerun to retry them)")
+
+
+if __name__ == "__main__":
+    main()
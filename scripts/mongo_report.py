@@ -0,0 +1,100 @@
+"""Report a worker's MongoDB command profile (see app/mongo_profiler.py).
+
+Fetches /metrics/mongo from a running backend started with
+MONGO_METRICS_TOKEN set, or reads a copy of it saved with --save, and
+prints each command's latency percentiles (the upper bound of the
+histogram bucket they fall in), the users reading and writing the most
+document bytes (with MONGO_PROFILE_SAMPLE above 0), and the plans of the
+slow commands explained (with MONGO_EXPLAIN_MS above 0), flagging
+collection scans.
+
+    MONGO_METRICS_TOKEN=secret python -m scripts.mongo_report --url http://localhost:8000
+"""
+
+import os
+import json
+import time
+import argparse
+import urllib.request
+from app.mongo_profiler import histogram_quantile
+
+
+def fetch(url: str, token: str) -> dict:
+    request = urllib.request.Request(
+        url.rstrip("/") + "/metrics/mongo",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)
+
+
+def ms(value: float) -> str:
+    return ">5000" if value == float("inf") else f"{value:g}"
+
+
+def megabytes(value: float) -> str:
+    return f"{value / 1e6:.2f}"
+
+
+def report(stats: dict, top: int):
+    uptime = time.time() - stats["since"]
+    print(
+        f"{sum(c['count'] for c in stats['commands'])} commands in {uptime:.0f} s,"
+        f" sample {stats['sample']:g}, explain over {stats['explain_ms']:g} ms"
+    )
+    print(
+        f"{'command':<16}{'collection':<20}{'count':>8}{'fail':>6}{'mean':>9}"
+        f"{'p50':>7}{'p95':>7}{'p99':>7}{'max':>10}"
+    )
+    commands = sorted(stats["commands"], key=lambda c: c["total_ms"], reverse=True)
+    for c in commands[:top]:
+        mean = c["total_ms"] / c["count"] if c["count"] else 0.0
+        p50, p95, p99 = (histogram_quantile(c["buckets"], q) for q in (0.5, 0.95, 0.99))
+        print(
+            f"{c['command']:<16}{c['collection']:<20}{c['count']:>8}{c['failures']:>6}"
+            f"{mean:>9.2f}{ms(p50):>7}{ms(p95):>7}{ms(p99):>7}{c['max_ms']:>10.2f}"
+        )
+
+    if stats["users"]:
+        print(f"\n{'user':<40}{'read MB':>10}{'written MB':>12}{'sampled':>9}")
+        for u in stats["users"][:top]:
+            print(
+                f"{u['user']:<40}{megabytes(u['read_bytes']):>10}"
+                f"{megabytes(u['written_bytes']):>12}{u['sampled_commands']:>9}"
+            )
+
+    if stats["explains"]:
+        print(f"\n{'slow command':<36}{'ms':>9}  plan")
+        for e in reversed(stats["explains"][-top:]):
+            label = f"{e['command']} {e['collection']} {','.join(e['shape'])}"
+            scan = "  <- collection scan" if "COLLSCAN" in e["plan"] else ""
+            print(f"{label:<36}{e['ms']:>9.2f}  {e['plan']}{scan}")
+    if stats["explains_dropped"]:
+        print(f"{stats['explains_dropped']} slow commands not explained: queue full")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", default=os.getenv("MONGO_METRICS_TOKEN", ""))
+    parser.add_argument("--file", help="read a saved profile instead of --url")
+    parser.add_argument("--save", help="also save the profile fetched to this file")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+    if args.file:
+        with open(args.file) as f:
+            stats = json.load(f)
+    else:
+        if not args.token:
+            parser.error("--token or MONGO_METRICS_TOKEN is required.")
+        stats = fetch(args.url, args.token)
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(stats, f)
+    if not stats:
+        raise SystemExit("The worker does not profile commands (MONGO_PROFILE=0).")
+    report(stats, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Re-encrypt stored amounts with the primary key after a key rotation.
+
+Rotate by putting the new key first and keeping the old ones for reading:
+
+    ENCRYPTION_KEYS="k2:<new key>,k1:<old key>" python -m scripts.reencrypt
+
+The job walks user_finances in _id order, then user_finance_items (the
+items of users in the items layout, see app/storage.py ItemStore), in
+batches written with one bulk_write each, throttled to --max-docs-per-sec
+so it can run alongside production traffic. Progress is checkpointed in
+finance_app.reencryption_jobs after every batch, so an interrupted run
+resumes where it stopped (--restart starts over) and the metrics can be
+read from there or with --status.
+
+Every rewritten document gets a new version, so sessions and caches holding
+it refetch it, with its data key as rewrapped, before they save again. A
+document saved by its user while the job runs is skipped (the version filter
+makes the bulk update miss) and still holds values under the old keys; so
+is an item written meanwhile (the update only matches the values read). So
+once a pass completes, both collections are checked, and passes are run
+again until nothing needs re-encrypting, up to --max-passes. Only when the job
+reports none left can the old keys be dropped.
+"""
+
+import sys
+import time
+import json
+import logging
+import argparse
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from cryptography.fernet import InvalidToken
+from app.database import bulk_write, get_db_client, get_item_collection, get_user_collection
+from app.encryption import needs_reencryption, reencrypt_value, primary_key_id
+from app.compact import compressed_field
+from app.finance_data import SECTIONS, ENCRYPTED_FIELDS
+from app.storage import is_converted, pack_sections, unpack_sections, version_filter
+
+JOB_COLLECTION = "reencryption_jobs"
+
+
+def get_job_collection():
+    client = get_db_client()
+    if client is None:
+        return None
+    return client.get_database("finance_app").get_collection(JOB_COLLECTION)
+
+
+def reencrypt_item(item: dict) -> dict:
+    """The item's amounts that are under an old key, re-encrypted."""
+    return {
+        field: reencrypt_value(item[field])
+        for field in ENCRYPTED_FIELDS
+        if field in item and needs_reencryption(item[field])
+    }
+
+
+def reencrypt_sections(doc: dict) -> dict | None:
+    """The doc's sections re-encrypted with the primary key, or None if current.
+
+    Amounts under a per-user data key are left alone; only the wrapped data
+    key itself is rewrapped. The header of a user in the items layout has
+    no sections, and is given none.
+    """
+    changed = False
+    sections = {}
+    for section in SECTIONS if not is_converted(doc) else ():
+        items = []
+        for item in doc.get(section) or []:
+            rotated = reencrypt_item(item)
+            changed |= bool(rotated)
+            items.append({**item, **rotated})
+        sections[section] = items
+    data_key = doc.get("data_key")
+    if data_key and needs_reencryption(data_key):
+        sections["data_key"] = reencrypt_value(data_key)
+        changed = True
+    return sections if changed else None
+
+
+DOCUMENT_PROJECTION = {
+    "version": 1,
+    "layout": 1,
+    "data_key": 1,
+    **{section: 1 for section in SECTIONS},
+    **{compressed_field(section): 1 for section in SECTIONS},
+}
+
+
+def stale_documents(collection, items=None) -> int:
+    """How many documents and items still hold a value or key under an old key."""
+    stale = 0
+    for doc in collection.find({}, DOCUMENT_PROJECTION):
+        try:
+            stale += reencrypt_sections(unpack_sections(doc)) is not None
+        except InvalidToken:
+            stale += 1
+    for item in items.find({}, ITEM_PROJECTION) if items is not None else ():
+        try:
+            stale += bool(reencrypt_item(item))
+        except InvalidToken:
+            stale += 1
+    return stale
+
+
+ITEM_PROJECTION = {field: 1 for field in ENCRYPTED_FIELDS}
+
+
+class ReencryptionJob:
+    def __init__(self, collection, jobs, name: str, batch_size: int, max_rate: float):
+        self.collection = collection
+        self.jobs = jobs
+        self.name = name
+        self.batch_size = batch_size
+        self.max_rate = max_rate
+        self.state = jobs.find_one({"_id": name}) or self._new_state()
+
+    def _new_state(self) -> dict:
+        return {
+            "_id": self.name,
+            "status": "pending",
+            "primary_key_id": primary_key_id(),
+            "last_id": None,
+            "total_estimate": self.collection.estimated_document_count(),
+            "scanned": 0,
+            "rotated": 0,
+            "unchanged": 0,
+            "conflicts": 0,
+            "failed": 0,
+            "elapsed_s": 0.0,
+            "docs_per_s": 0.0,
+        }
+
+    def _checkpoint(self):
+        self.state["updated_at"] = datetime.now(timezone.utc)
+        self.jobs.replace_one({"_id": self.name}, self.state, upsert=True)
+
+    def _next_batch(self) -> list[dict]:
+        query = {}
+        if self.state["last_id"] is not None:
+            query["_id"] = {"$gt": self.state["last_id"]}
+        cursor = self.collection.find(query, self.projection).sort("_id", 1)
+        return list(cursor.limit(self.batch_size))
+
+    projection = DOCUMENT_PROJECTION
+
+    def _update(self, doc: dict) -> UpdateOne | None:
+        """The write re-encrypting doc, or None if it is current."""
+        sections = reencrypt_sections(unpack_sections(doc))
+        if sections is None:
+            return None
+        to_set, to_unset = pack_sections(sections)
+        update = {"$set": to_set, "$inc": {"version": 1}}
+        if to_unset:
+            update["$unset"] = to_unset
+        return UpdateOne(
+            {"_id": doc["_id"], "version": version_filter(doc.get("version", 0))},
+            update,
+        )
+
+    def _process(self, docs: list[dict]):
+        requests = []
+        for doc in docs:
+            try:
+                request = self._update(doc)
+            except InvalidToken as e:
+                logging.error(f"Skipping document {doc['_id']}: {e}")
+                self.state["failed"] += 1
+                continue
+            if request is None:
+                self.state["unchanged"] += 1
+                continue
+            requests.append(request)
+        if requests:
+            result = bulk_write(self.collection, requests, ordered=False)
+            self.state["rotated"] += result.modified_count
+            self.state["conflicts"] += len(requests) - result.matched_count
+        self.state["scanned"] += len(docs)
+        self.state["last_id"] = docs[-1]["_id"]
+
+    def run(self, on_progress=None):
+        if self.state["status"] == "completed":
+            return self.state
+        if self.state["primary_key_id"] != primary_key_id():
+            raise RuntimeError(
+                f"Job '{self.name}' was started for key '{self.state['primary_key_id']}', "
+                f"but the primary key is now '{primary_key_id()}'. Use --restart."
+            )
+        self.state["status"] = "running"
+        resumed_elapsed = self.state["elapsed_s"]
+        resumed_scanned = self.state["scanned"]
+        started = time.perf_counter()
+        while docs := self._next_batch():
+            batch_started = time.perf_counter()
+            self._process(docs)
+            if self.max_rate > 0:
+                min_duration = len(docs) / self.max_rate
+                time.sleep(
+                    max(0.0, min_duration - (time.perf_counter() - batch_started))
+                )
+            elapsed = time.perf_counter() - started
+            self.state["elapsed_s"] = resumed_elapsed + elapsed
+            self.state["docs_per_s"] = (
+                self.state["scanned"] - resumed_scanned
+            ) / elapsed
+            self._checkpoint()
+            if on_progress:
+                on_progress(self.state)
+        self.state["status"] = "completed"
+        self._checkpoint()
+        return self.state
+
+
+class ItemReencryptionJob(ReencryptionJob):
+    """The same job over user_finance_items, one document per item.
+
+    Items carry no version: an item is only updated if it still holds the
+    values read, so one its user wrote meanwhile is left for the next pass.
+    Its user's header keeps its version, as no session holds ciphertext.
+    """
+
+    projection = ITEM_PROJECTION
+
+    def _update(self, item: dict) -> UpdateOne | None:
+        rotated = reencrypt_item(item)
+        if not rotated:
+            return None
+        read = {field: item[field] for field in rotated}
+        return UpdateOne({"_id": item["_id"], **read}, {"$set": rotated})
+
+
+def print_progress(state: dict):
+    total = max(state["total_estimate"], state["scanned"], 1)
+    print(
+        f"{state['scanned']}/{total} ({state['scanned'] / total:.0%}) scanned, "
+        f"{state['rotated']} rotated, {state['conflicts']} conflicts, "
+        f"{state['failed']} failed, {state['docs_per_s']:.0f} docs/s",
+        flush=True,
+    )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--job", default="reencrypt", help="checkpoint name")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument(
+        "--max-docs-per-sec", type=float, default=200.0, help="0 disables throttling"
+    )
+    parser.add_argument("--restart", action="store_true", help="discard the checkpoint")
+    parser.add_argument(
+        "--max-passes", type=int, default=5, help="passes run until none is stale"
+    )
+    parser.add_argument("--status", action="store_true", help="print metrics and exit")
+    args = parser.parse_args(argv)
+    collection = get_user_collection()
+    items = get_item_collection()
+    jobs = get_job_collection()
+    if collection is None or items is None or jobs is None:
+        parser.error("MONGODB_URI is not set or the database is unreachable.")
+    # Each collection is walked under its own checkpoint.
+    names = {args.job: collection, f"{args.job}-items": items}
+    if args.status:
+        states = [jobs.find_one({"_id": name}) for name in names]
+        json.dump(states, sys.stdout, indent=2, default=str)
+        print()
+        return
+    if args.restart:
+        jobs.delete_many({"_id": {"$in": list(names)}})
+    for _ in range(args.max_passes):
+        for job_class, name in zip((ReencryptionJob, ItemReencryptionJob), names):
+            job = job_class(
+                names[name], jobs, name, args.batch_size, args.max_docs_per_sec
+            )
+            state = job.run(on_progress=print_progress)
+            print_progress(state)
+        stale = stale_documents(collection, items)
+        if not stale:
+            print("Nothing needs re-encrypting: the old keys can be dropped.")
+            return
+        print(f"{stale} documents still need re-encrypting; running another pass.")
+        jobs.delete_many({"_id": {"$in": list(names)}})
+    raise SystemExit(
+        f"Documents still need re-encrypting after {args.max_passes} passes:"
+        " keep the old keys and run the job again."
+    )
+
+
+if __name__ == "__main__":
+    main()